@@ -6,11 +6,16 @@ from __future__ import annotations
 import argparse
 import json
 import os
-from datetime import datetime
+import sqlite3
+import sys
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterable
 import uuid
 
-from jsonschema import validate
+import memory_index as index_mod
+import memory_storage as storage
+import memory_trace as trace
 
 DEFAULT_MEMORY_DIR = Path(__file__).resolve().parent
 
@@ -20,6 +25,100 @@ def load_schema(schema_path: Path) -> dict:
         return json.load(f)
 
 
+def build_entry(
+    context: str,
+    observation: str,
+    reflection: str,
+    tags: list[str],
+    task_id: str | None = None,
+) -> dict:
+    entry = {
+        "ts": datetime.utcnow().isoformat(),
+        "agent": os.getenv("CODEX_AGENT", "codex"),
+        "run_id": str(uuid.uuid4()),
+        "context": context,
+        "observation": observation,
+        "reflection": reflection,
+        "tags": tags,
+    }
+    if task_id:
+        entry["task_id"] = task_id
+    return entry
+
+
+def write_entries(
+    entries_dir: Path,
+    entries: list[dict],
+    schema_path: Path = storage.SCHEMA_PATH,
+    period: str | None = None,
+    fsync: bool = False,
+) -> list[Path]:
+    """Persist entries validated against ``schema_path`` and update the index."""
+    with trace.phase("append"):
+        files = storage.append_entries(
+            entries_dir, entries, schema_path, period, fsync
+        )
+    try:
+        index_mod.update_index(entries_dir, changed=files)
+    except sqlite3.Error as e:
+        print(f"Failed to update index: {e}", file=sys.stderr)
+    return files
+
+
+def fill_defaults(entry: dict, run_id: str) -> dict:
+    """Complete an imported entry with the fields ``build_entry`` would set."""
+    entry.pop(storage.CHECK_FIELD, None)
+    entry.setdefault("ts", datetime.utcnow().isoformat())
+    entry.setdefault("agent", os.getenv("CODEX_AGENT", "codex"))
+    entry.setdefault("run_id", run_id)
+    entry.setdefault("tags", [])
+    return entry
+
+
+def naive_utc(ts: str) -> str:
+    """Return ``ts`` as a naive UTC timestamp like those ``add`` writes.
+
+    Raises ``ValueError`` if ``ts`` is not an ISO timestamp.
+    """
+    dt = datetime.fromisoformat(ts)
+    if dt.tzinfo is None:
+        return ts
+    return dt.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def add_batch(
+    entries_dir: Path, lines: Iterable[str], schema_path: Path = storage.SCHEMA_PATH
+) -> tuple[int, list[str]]:
+    """Validate JSON lines and append them with one synced write per segment.
+
+    Entries missing ``run_id`` share one generated for the batch, and
+    timestamps with a UTC offset are converted to naive UTC. Batches are
+    always written to segments, in the layout's period or daily. Returns the
+    number of entries written and an error message for each rejected line.
+    """
+    run_id = str(uuid.uuid4())
+    entries = []
+    errors = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            if not isinstance(entry, dict):
+                raise ValueError("expected a JSON object")
+            fill_defaults(entry, run_id)
+            storage.validate_entry(entry, schema_path)
+            entry["ts"] = naive_utc(entry["ts"])
+        except ValueError as e:
+            errors.append(f"line {number}: {e}")
+            continue
+        entries.append(entry)
+    if entries:
+        period = storage.load_layout(entries_dir).get("period", "daily")
+        write_entries(entries_dir, entries, schema_path, period, fsync=True)
+    return len(entries), errors
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Append an agent memory entry")
     parser.add_argument("context", help="Short description of files or task")
@@ -40,24 +139,12 @@ def main() -> None:
     entries_dir.mkdir(parents=True, exist_ok=True)
     schema_path = memory_dir / "schema.json"
 
-    entry = {
-        "ts": datetime.utcnow().isoformat(),
-        "agent": os.getenv("CODEX_AGENT", "codex"),
-        "run_id": str(uuid.uuid4()),
-        "context": args.context,
-        "observation": args.observation,
-        "reflection": args.reflection,
-        "tags": args.tags,
-    }
-    if args.task_id:
-        entry["task_id"] = args.task_id
-
-    schema = load_schema(schema_path)
-    validate(instance=entry, schema=schema)
+    entry = build_entry(
+        args.context, args.observation, args.reflection, args.tags, args.task_id
+    )
 
-    filename = entries_dir / f"{entry['ts']}.jsonl"
-    with filename.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(entry) + "\n")
+    storage.load_validator(schema_path).validate(entry)
+    write_entries(entries_dir, [entry], schema_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Advisory locking and atomic replacement for small JSON state files."""
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Iterator
+
+
+def lock_path(path: Path) -> Path:
+    return path.with_name(path.name + ".lock")
+
+
+@contextlib.contextmanager
+def locked(path: Path, shared: bool = False) -> Iterator[None]:
+    """Hold an exclusive lock for a read-modify-write of ``path``.
+
+    With ``shared`` the lock only excludes writers, for consistent reads. The
+    lock is taken on a ``.lock`` sidecar rather than on ``path`` itself,
+    because ``write_json`` replaces ``path`` with a new inode.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path(path).open("a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_json(path: Path, data: Any) -> None:
+    """Write ``data`` to a temporary file and atomically move it over ``path``.
+
+    Readers see either the old or the new content, never a partial file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
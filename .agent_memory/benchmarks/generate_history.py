@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Generate a synthetic memory directory for benchmarks.
+
+The output depends only on the entry count, seed and layout, so runs on
+different machines or commits measure the same data. Tags, agents and words
+follow Zipf-like distributions, entries cluster in working hours, and about
+one entry in eight references a task, which is roughly what real histories
+look like.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import random
+import shutil
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import memory_storage as storage  # noqa: E402
+
+SIZES = {"small": 1_000, "medium": 100_000, "large": 1_000_000}
+LAYOUTS = ("files", "segments", "partitioned")
+ENTRIES_PER_DAY = 40
+START = datetime(2024, 1, 1)
+CHUNK = 10_000
+
+_TAGS = [
+    "bugfix", "refactor", "tests", "perf", "docs", "ci", "parser", "cli",
+    "index", "storage", "api", "deps", "security", "ux", "release", "infra",
+    "db", "cache", "logging", "config", "auth", "network", "build", "lint",
+    "memory", "search", "export", "summary", "tasks", "notes", "daemon",
+    "migration", "flaky", "timeout", "unicode", "windows", "macos", "linux",
+    "python", "review",
+]
+_AGENTS = ["codex", "codex-v2", "reviewer", "planner", "ci-bot", "triage"]
+_DOMAIN_WORDS = [
+    "parser", "timeout", "cache", "index", "query", "schema", "segment",
+    "retry", "lock", "fixture", "regression", "latency", "memory", "crash",
+    "encoding", "handler", "config", "token", "socket", "thread", "commit",
+    "branch", "merge", "test", "failure", "error", "warning", "path", "file",
+    "import", "module", "function", "class", "field", "entry", "task", "note",
+]
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "pe", "zu", "da", "fo"]
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> list[float]:
+    return list(itertools.accumulate(1 / (rank**s) for rank in range(1, n + 1)))
+
+
+def _vocabulary(rng: random.Random, size: int = 2000) -> list[str]:
+    words = list(_DOMAIN_WORDS)
+    while len(words) < size:
+        words.append("".join(rng.choices(_SYLLABLES, k=rng.randint(2, 4))))
+    return words
+
+
+def iter_entries(count: int, seed: int = 0) -> Iterator[dict]:
+    """Yield ``count`` entries in timestamp order."""
+    rng = random.Random(seed)
+    words = _vocabulary(rng)
+    word_weights = _zipf_weights(len(words))
+    tag_weights = _zipf_weights(len(_TAGS))
+    agent_weights = _zipf_weights(len(_AGENTS), 1.5)
+
+    def text(lo: int, hi: int) -> str:
+        k = rng.randint(lo, hi)
+        return " ".join(rng.choices(words, cum_weights=word_weights, k=k))
+
+    day_seconds = 24 * 3600
+    days = max(1, count // ENTRIES_PER_DAY)
+    per_day = [0] * days
+    for _ in range(count):
+        per_day[rng.randrange(days)] += 1
+    for day, n in enumerate(per_day):
+        base = START + timedelta(days=day)
+        # Mostly between 08:00 and 20:00 UTC, with a thin tail at night.
+        offsets = sorted(
+            int(rng.triangular(0, day_seconds, day_seconds / 2)) * 1_000_000
+            + rng.randrange(1_000_000)
+            for _ in range(n)
+        )
+        for micros in offsets:
+            ts = base + timedelta(microseconds=micros)
+            n_tags = rng.choices((0, 1, 2, 3), weights=(10, 45, 35, 10))[0]
+            entry = {
+                "ts": ts.isoformat(timespec="microseconds"),
+                "agent": rng.choices(_AGENTS, cum_weights=agent_weights)[0],
+                "run_id": f"{rng.getrandbits(64):016x}",
+                "context": text(3, 8),
+                "observation": text(8, 40),
+                "reflection": text(5, 25),
+                "tags": sorted(
+                    set(rng.choices(_TAGS, cum_weights=tag_weights, k=n_tags))
+                ),
+            }
+            if rng.random() < 0.125:
+                entry["task_id"] = f"task-{rng.randrange(max(1, count // 50))}"
+            yield entry
+
+
+def generate(
+    memory_dir: Path, count: int, seed: int = 0, layout: str = "segments"
+) -> Path:
+    """Write a memory directory with ``count`` entries and return it."""
+    entries_dir = memory_dir / "entries"
+    entries_dir.mkdir(parents=True, exist_ok=True)
+    schema_path = memory_dir / "schema.json"
+    shutil.copy(storage.SCHEMA_PATH, schema_path)
+    if layout == "segments":
+        storage.save_layout(entries_dir, {"layout": "segments", "period": "daily"})
+    elif layout == "partitioned":
+        storage.save_layout(entries_dir, {"layout": "partitioned"})
+    entries = iter_entries(count, seed)
+    while True:
+        chunk = list(itertools.islice(entries, CHUNK))
+        if not chunk:
+            break
+        storage.append_entries(entries_dir, chunk, schema_path)
+    return memory_dir
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", type=Path, help="Memory directory to create")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--size", choices=sorted(SIZES), default="small")
+    size.add_argument("--entries", type=int, help="Exact number of entries")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--layout", choices=LAYOUTS, default="segments")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    count = args.entries if args.entries is not None else SIZES[args.size]
+    if args.output.exists() and any(args.output.iterdir()):
+        raise SystemExit(f"{args.output} is not empty")
+    generate(args.output, count, args.seed, args.layout)
+    print(f"Wrote {count} entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
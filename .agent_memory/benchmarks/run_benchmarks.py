@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""Time the memory layer on generated histories and write JSON results.
+
+Every benchmark runs ``--repeat`` times and reports each run's wall time plus
+the minimum and median. Read-only benchmarks share one generated directory;
+``add``, ``prune`` and the task/note benchmarks work on fresh copies so they
+do not disturb each other. Generated directories are cached under
+``--cache-dir`` by size, seed and layout. Pass ``--baseline`` with an earlier
+result file to print how each median changed.
+
+The ``*_parallel`` benchmarks repeat ``reindex`` and ``scan_load_filter`` with
+``--jobs`` worker processes (one per CPU by default); their ratio to the
+sequential runs is the speedup.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(Path(__file__).resolve().parent)]
+
+import export_memory_markdown as export_mod  # noqa: E402
+import generate_history  # noqa: E402
+import manage_notes  # noqa: E402
+import manage_tasks  # noqa: E402
+import memory_cli  # noqa: E402
+import memory_columns  # noqa: E402
+import memory_parallel  # noqa: E402
+import prune_memory_entries as prune_mod  # noqa: E402
+import query_memory_entries as query_mod  # noqa: E402
+import summarize_memory_entries as summary_mod  # noqa: E402
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".cache"
+DEFAULT_RESULTS_DIR = Path(__file__).resolve().parent / "results"
+MUTATIONS = 50
+
+
+def _cli(memory_dir: Path, *argv: str) -> None:
+    with contextlib.redirect_stdout(io.StringIO()):
+        memory_cli.main([*argv, "--memory-dir", str(memory_dir)])
+
+
+def _time(
+    fn: Callable[[], object], repeat: int, setup: Callable[[], object] | None = None
+) -> list[float]:
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def history(cache_dir: Path, count: int, seed: int, layout: str) -> Path:
+    """Return a cached generated memory directory, creating it if needed."""
+    path = cache_dir / f"{layout}-{count}-{seed}"
+    if not (path / ".complete").exists():
+        shutil.rmtree(path, ignore_errors=True)
+        generate_history.generate(path, count, seed, layout)
+        (path / ".complete").touch()
+    return path
+
+
+def _window(count: int) -> tuple[str, str]:
+    """Return a one-week window in the middle of the generated history."""
+    days = max(1, count // generate_history.ENTRIES_PER_DAY)
+    start = generate_history.START + timedelta(days=days // 2)
+    return start.isoformat(), (start + timedelta(days=7)).isoformat()
+
+
+def benchmarks(
+    memory_dir: Path, work_dir: Path, count: int, jobs: int = 1
+) -> dict[str, tuple]:
+    """Return ``name -> (fn, setup)`` for every benchmark."""
+    entries_dir = memory_dir / "entries"
+    since, until = _window(count)
+    copy_dir = work_dir / "copy"
+    state_dir = work_dir / "state"
+
+    def fresh_copy() -> None:
+        shutil.rmtree(copy_dir, ignore_errors=True)
+        shutil.copytree(memory_dir, copy_dir)
+        _cli(copy_dir, "reindex")
+
+    def fresh_state() -> None:
+        shutil.rmtree(state_dir, ignore_errors=True)
+        state_dir.mkdir(parents=True)
+
+    def add() -> None:
+        for i in range(MUTATIONS):
+            _cli(copy_dir, "add", f"bench {i}", "obs", "refl", "--tags", "perf")
+
+    def prune() -> None:
+        policy = prune_mod.RetentionPolicy(
+            keep_last=count // 2, max_per_tag=count // 10
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            prune_mod.prune(copy_dir / "entries", policy, dry_run=False)
+
+    def tasks() -> None:
+        task_file = state_dir / "tasks.json"
+        ids = [
+            manage_tasks.add_task(f"task {i}", task_file=task_file)["id"]
+            for i in range(MUTATIONS)
+        ]
+        for task_id in ids:
+            manage_tasks.update_task(task_id, "finished", task_file=task_file)
+        for task_id in ids:
+            manage_tasks.remove_task(task_id, task_file=task_file)
+
+    def notes() -> None:
+        note_file = state_dir / "notes.json"
+        ids = [
+            manage_notes.add_note(f"note {i}", note_file=note_file)["id"]
+            for i in range(MUTATIONS)
+        ]
+        for note_id in ids:
+            manage_notes.remove_note(note_id, note_file=note_file)
+
+    def scan_filter() -> None:
+        entries = query_mod.load_entries(entries_dir)
+        list(query_mod.filter_entries(entries, ["perf"], since, until, "timeout"))
+
+    def scan_filter_parallel() -> None:
+        where = memory_parallel.Filter(["perf"], since, until, "timeout")
+        list(memory_parallel.iter_records(entries_dir, jobs, where=where))
+
+    def summarize_scan() -> None:
+        entries = summary_mod.load_entries(entries_dir, since=since, until=until)
+        entries = summary_mod.filter_entries(entries, since, until)
+        summary_mod.summarize(entries, since, until)
+
+    def columns_build() -> None:
+        shutil.rmtree(memory_columns.columns_dir(entries_dir), ignore_errors=True)
+        memory_columns.sync(entries_dir)
+
+    def columns(method: str, *args: str) -> Callable[[], None]:
+        def run() -> None:
+            with memory_columns.open_snapshot(entries_dir) as snapshot:
+                getattr(snapshot, method)(*args)
+
+        return run
+
+    def export() -> None:
+        entries = export_mod.load_entries(entries_dir, since=since, until=until)
+        entries = export_mod.filter_entries(entries, None, since, until)
+        export_mod.entries_to_markdown(entries)
+
+    def export_stream() -> None:
+        entries = export_mod.iter_records(
+            entries_dir,
+            newest_first=False,
+            since=datetime.fromisoformat(since),
+            until=datetime.fromisoformat(until),
+        )
+        entries = export_mod.filter_entries(entries, None, since, until)
+        with (work_dir / "export.md").open("w", encoding="utf-8") as f:
+            export_mod.write_markdown(entries, f)
+
+    def cli(*argv: str) -> Callable[[], None]:
+        return lambda: _cli(memory_dir, *argv)
+
+    summary = str(work_dir / "summary.json")
+    return {
+        "reindex": (cli("reindex"), None),
+        "reindex_parallel": (cli("reindex", "--jobs", str(jobs)), None),
+        "query_last": (cli("query", "--last", "10"), None),
+        "query_tags": (cli("query", "--tags", "security", "--last", "50"), None),
+        "query_search": (cli("query", "--search", "timeout", "--last", "50"), None),
+        "query_words": (
+            cli("query", "--search", "timeout", "--words", "--last", "50"),
+            None,
+        ),
+        "query_window": (cli("query", "--since", since, "--until", until), None),
+        "scan_load_filter": (scan_filter, None),
+        "scan_load_filter_parallel": (scan_filter_parallel, None),
+        "summarize": (
+            cli("summarize", "--since", since, "--until", until, "--output", summary),
+            None,
+        ),
+        "summarize_scan": (summarize_scan, None),
+        "stats": (cli("stats", "--since", since, "--until", until), None),
+        "stats_tag": (cli("stats", "--tag", "security", "--top", "10"), None),
+        "columns_build": (columns_build, None),
+        "columns_summarize": (columns("summarize", since, until), None),
+        "columns_tag_counts": (columns("tag_counts"), None),
+        "columns_count_range": (columns("count_range", since, until), None),
+        "export_window": (export, None),
+        "export_stream": (export_stream, None),
+        "add": (add, fresh_copy),
+        "prune": (prune, fresh_copy),
+        "task_mutations": (tasks, fresh_state),
+        "note_mutations": (notes, fresh_state),
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def run(
+    count: int,
+    seed: int = 0,
+    layout: str = "segments",
+    repeat: int = 3,
+    cache_dir: Path = DEFAULT_CACHE_DIR,
+    only: list[str] | None = None,
+    jobs: int = 0,
+) -> dict:
+    """Run the benchmarks and return the results document."""
+    jobs = memory_parallel.resolve_jobs(jobs)
+    memory_dir = history(cache_dir, count, seed, layout)
+    results = {}
+    # Time the in-process code even if a daemon is serving the default dir.
+    no_daemon = mock.patch.dict(os.environ, {memory_cli.NO_DAEMON_ENV: "1"})
+    with no_daemon, tempfile.TemporaryDirectory() as tmp:
+        cases = benchmarks(memory_dir, Path(tmp), count, jobs)
+        for name, (fn, setup) in cases.items():
+            if only and name not in only:
+                continue
+            runs = _time(fn, repeat, setup)
+            results[name] = {
+                "runs": runs,
+                "min": min(runs),
+                "median": statistics.median(runs),
+            }
+            median = results[name]["median"] * 1000
+            print(f"{name:<26} {median:10.1f} ms", file=sys.stderr)
+    return {
+        "meta": {
+            "created": datetime.utcnow().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "entries": count,
+            "seed": seed,
+            "layout": layout,
+            "repeat": repeat,
+            "jobs": jobs,
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict) -> list[tuple[str, float, float, float]]:
+    """Return ``(name, baseline, current, ratio)`` medians for shared benchmarks."""
+    rows = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None or not old["median"]:
+            continue
+        new = result["median"]
+        rows.append((name, old["median"], new, new / old["median"]))
+    return rows
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument(
+        "--size", choices=sorted(generate_history.SIZES), default="small"
+    )
+    size.add_argument("--entries", type=int, help="Exact number of entries")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--layout", choices=generate_history.LAYOUTS, default="segments"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Worker processes for the *_parallel benchmarks (default: one per CPU)",
+    )
+    parser.add_argument("--only", nargs="*", help="Run only these benchmarks")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Result file (default: results/<time>-<layout>-<entries>.json)",
+    )
+    parser.add_argument(
+        "--baseline", type=Path, help="Earlier result file to compare with"
+    )
+    parser.add_argument(
+        "--fail-over",
+        type=float,
+        help="Exit with status 1 if a median exceeds this multiple of the baseline",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    count = args.entries
+    if count is None:
+        count = generate_history.SIZES[args.size]
+    result = run(
+        count,
+        args.seed,
+        args.layout,
+        args.repeat,
+        args.cache_dir,
+        args.only,
+        args.jobs,
+    )
+
+    output = args.output
+    if output is None:
+        stamp = result["meta"]["created"].replace(":", "")
+        output = DEFAULT_RESULTS_DIR / f"{stamp}-{args.layout}-{count}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Wrote results to {output}")
+
+    if args.baseline is None:
+        return
+    with args.baseline.open("r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressed = False
+    for name, old, new, ratio in compare(result, baseline):
+        print(f"{name:<26} {old * 1000:10.1f} -> {new * 1000:10.1f} ms  x{ratio:.2f}")
+        if args.fail_over is not None and ratio > args.fail_over:
+            regressed = True
+    if regressed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
-"""Export agent memory entries to a Markdown file."""
+"""Export agent memory entries to a Markdown file.
+
+Entries are written oldest first as they are read, so the document is never
+held in memory. With ``--append-since-last`` only entries newer than the last
+export are appended. The sidecar ``<name>.export.json`` next to the output
+records the newest exported ``ts`` and the size of the output after that
+export. A larger file has its unrecorded tail, left by an interrupted
+append, cut off before appending. A smaller file, or one without a sidecar,
+is exported again in full.
+"""
 from __future__ import annotations
 
 import argparse
 import json
+import os
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, Iterator, List, TextIO
 
-from jsonschema import ValidationError, validate
+from atomic_files import locked, write_json
+from memory_storage import iter_records
 
 DEFAULT_MEMORY_DIR = Path(__file__).resolve().parent / "entries"
 SCHEMA_PATH = Path(__file__).resolve().parent / "schema.json"
@@ -22,33 +34,53 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--tags", nargs="*", help="Filter by tags")
     parser.add_argument("--since", help="Start ISO timestamp")
     parser.add_argument("--until", help="End ISO timestamp")
-    parser.add_argument(
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
         "--last", type=int, help="Only export the N most recent entries"
     )
+    mode.add_argument(
+        "--append-since-last",
+        action="store_true",
+        help="Append entries logged after the newest one in the previous export",
+    )
     parser.add_argument(
         "--memory-dir",
         type=Path,
         default=DEFAULT_MEMORY_DIR,
         help="Memory entries directory",
     )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Validate every entry against the schema",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for parsing entry files (0 for one per CPU)",
+    )
     return parser.parse_args()
 
 
-def load_entries(memory_dir: Path) -> List[dict]:
-    entries: List[dict] = []
-    with SCHEMA_PATH.open("r", encoding="utf-8") as sf:
-        schema = json.load(sf)
-    for file in sorted(memory_dir.glob("*.jsonl")):
-        with file.open("r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    record = json.loads(line)
-                    validate(instance=record, schema=schema)
-                    entries.append(record)
-                except (json.JSONDecodeError, ValidationError):
-                    continue
-    entries.sort(key=lambda e: e["ts"], reverse=True)
-    return entries
+def load_entries(
+    memory_dir: Path,
+    strict: bool = False,
+    since: str | None = None,
+    until: str | None = None,
+    jobs: int = 1,
+) -> List[dict]:
+    since_dt = datetime.fromisoformat(since) if since else None
+    until_dt = datetime.fromisoformat(until) if until else None
+    if jobs > 1:
+        import memory_parallel
+
+        return list(
+            memory_parallel.iter_records(
+                memory_dir, jobs, strict, since=since_dt, until=until_dt
+            )
+        )
+    return list(iter_records(memory_dir, strict, since=since_dt, until=until_dt))
 
 
 def filter_entries(
@@ -56,8 +88,7 @@ def filter_entries(
     tags: list[str] | None,
     since: str | None,
     until: str | None,
-) -> List[dict]:
-    result: List[dict] = []
+) -> Iterator[dict]:
     since_dt = datetime.fromisoformat(since) if since else None
     until_dt = datetime.fromisoformat(until) if until else None
     for e in entries:
@@ -68,36 +99,140 @@ def filter_entries(
             continue
         if tags and not set(tags).intersection(e.get("tags", [])):
             continue
-        result.append(e)
-    return result
+        yield e
+
+
+def mark_path(output: Path) -> Path:
+    """Return the sidecar recording how far ``output`` has been exported."""
+    return output.with_name(output.stem + ".export.json")
+
+
+def format_entry(e: dict) -> str:
+    lines = [
+        f"## {e['ts']} - {e.get('context', '')}",
+        "",
+        f"- Observation: {e.get('observation','')}",
+        f"- Reflection: {e.get('reflection','')}",
+    ]
+    if e.get("tags"):
+        lines.append(f"- Tags: {', '.join(e['tags'])}")
+    return "\n".join(lines) + "\n"
 
 
 def entries_to_markdown(entries: Iterable[dict]) -> str:
-    lines = []
-    for e in reversed(list(entries)):
-        ts = e["ts"]
-        context = e.get("context", "")
-        lines.append(f"## {ts} - {context}")
-        lines.append("")
-        lines.append(f"- Observation: {e.get('observation','')}")
-        lines.append(f"- Reflection: {e.get('reflection','')}")
-        if e.get("tags"):
-            lines.append(f"- Tags: {', '.join(e['tags'])}")
-        lines.append("")
-    return "\n".join(lines)
+    """Return ``entries``, given newest first, as one document oldest first."""
+    return "\n".join(format_entry(e) for e in reversed(list(entries)))
+
+
+def write_markdown(
+    entries: Iterable[dict], out: TextIO, separate: bool = False
+) -> tuple[int, str | None]:
+    """Write ``entries`` to ``out`` in the given order, one at a time.
+
+    Returns the number written and the ``ts`` of the last one. With
+    ``separate`` the first entry is preceded by a blank line as well, for
+    appending to a non-empty document.
+    """
+    count = 0
+    last = None
+    for e in entries:
+        if count or separate:
+            out.write("\n")
+        out.write(format_entry(e))
+        count += 1
+        last = e["ts"]
+    return count, last
+
+
+def iter_selected(
+    args: argparse.Namespace, newest_first: bool, since: str | None
+) -> Iterator[dict]:
+    """Yield the entries matching the filters of ``args`` from ``since``."""
+    since_dt = datetime.fromisoformat(since) if since else None
+    until = datetime.fromisoformat(args.until) if args.until else None
+    if args.jobs != 1:
+        import memory_parallel
+
+        return memory_parallel.iter_records(
+            args.memory_dir,
+            memory_parallel.resolve_jobs(args.jobs),
+            args.strict,
+            newest_first,
+            since=since_dt,
+            until=until,
+            where=memory_parallel.Filter(args.tags, since, args.until),
+        )
+    entries = iter_records(
+        args.memory_dir, args.strict, newest_first, since=since_dt, until=until
+    )
+    return filter_entries(entries, args.tags, since, args.until)
+
+
+def export(args: argparse.Namespace) -> int:
+    """Write the selected entries to ``args.output``; return how many."""
+    if args.last is not None:
+        newest = islice(iter_selected(args, True, args.since), args.last)
+        entries: Iterable[dict] = reversed(list(newest))
+    else:
+        entries = iter_selected(args, False, args.since)
+    with args.output.open("w", encoding="utf-8") as f:
+        count, _ = write_markdown(entries, f)
+    return count
+
+
+def _load_mark(path: Path) -> dict | None:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def append_since_last(args: argparse.Namespace) -> int:
+    """Append entries newer than the recorded mark; return how many.
+
+    Without a usable mark this writes the whole export and records one.
+    """
+    mark = _load_mark(mark_path(args.output))
+    try:
+        size = args.output.stat().st_size
+    except FileNotFoundError:
+        size = -1
+    if mark is None or size < mark["size"]:
+        # Nothing recorded to append to; start the export over.
+        mark = {"ts": None, "size": 0}
+    if size > mark["size"]:
+        os.truncate(args.output, mark["size"])
+    since = args.since
+    if mark["ts"] is not None:
+        high = datetime.fromisoformat(mark["ts"])
+        if since is None or datetime.fromisoformat(since) < high:
+            since = mark["ts"]
+    entries = iter_selected(args, False, since)
+    if mark["ts"] is not None:
+        # ``since`` is inclusive; entries at the mark were already exported.
+        entries = (e for e in entries if datetime.fromisoformat(e["ts"]) > high)
+    with args.output.open("a", encoding="utf-8") as f:
+        count, last = write_markdown(entries, f, separate=mark["size"] > 0)
+        f.flush()
+        os.fsync(f.fileno())
+    end = args.output.stat().st_size
+    write_json(mark_path(args.output), {"ts": last or mark["ts"], "size": end})
+    return count
 
 
 def main() -> None:
     args = parse_args()
-    entries = load_entries(args.memory_dir)
-    entries = filter_entries(entries, args.tags, args.since, args.until)
-    if args.last is not None:
-        entries = entries[: args.last]
-    md = entries_to_markdown(entries)
     args.output.parent.mkdir(parents=True, exist_ok=True)
-    with args.output.open("w", encoding="utf-8") as f:
-        f.write(md)
-    print(f"Wrote {len(entries)} entries to {args.output}")
+    with locked(mark_path(args.output)):
+        if args.append_since_last:
+            count = append_since_last(args)
+            print(f"Appended {count} entries to {args.output}")
+            return
+        count = export(args)
+        # The rewritten file no longer matches a recorded mark.
+        mark_path(args.output).unlink(missing_ok=True)
+    print(f"Wrote {count} entries to {args.output}")
 
 
 if __name__ == "__main__":
@@ -10,52 +10,74 @@ from datetime import datetime
 from pathlib import Path
 import uuid
 
+import op_log
+from atomic_files import locked, write_json
+
 DEFAULT_MEMORY_DIR = Path(__file__).resolve().parent
 NOTE_FILE = DEFAULT_MEMORY_DIR / "notes.json"
+# Number of most recent notes shown by ``list``; older notes are kept on disk.
+DEFAULT_LIMIT = 10
 
 logger = logging.getLogger(__name__)
 
 
-def load_notes(note_file: Path = NOTE_FILE) -> list[dict]:
+def _load_snapshot(note_file: Path) -> list[dict]:
+    notes: list[dict] = []
     if note_file.exists():
         try:
             with note_file.open("r", encoding="utf-8") as f:
-                return json.load(f)
+                notes = json.load(f)
         except json.JSONDecodeError:
             logger.warning("Failed to decode JSON from %s; returning empty list.", note_file)
-    return []
+    return notes
+
+
+def load_notes(note_file: Path = NOTE_FILE) -> list[dict]:
+    return op_log.replay(_load_snapshot(note_file), note_file)
+
+
+def _exists(note_id: str, note_file: Path) -> bool:
+    return op_log.contains(note_file, note_id, lambda: _load_snapshot(note_file))
 
 
 def save_notes(notes: list[dict], note_file: Path = NOTE_FILE) -> None:
-    note_file.parent.mkdir(parents=True, exist_ok=True)
-    with note_file.open("w", encoding="utf-8") as f:
-        json.dump(notes, f, indent=2)
+    write_json(note_file, notes)
+    op_log.clear(note_file)
+
+
+def _record(op: dict, note_file: Path) -> None:
+    if op_log.append(note_file, op) > op_log.COMPACT_BYTES:
+        save_notes(load_notes(note_file), note_file)
 
 
 def add_note(content: str, note_file: Path = NOTE_FILE) -> dict:
-    notes = load_notes(note_file)
     note = {
         "id": str(uuid.uuid4()),
         "content": content,
         "created_at": datetime.utcnow().isoformat(),
     }
-    notes.append(note)
-    notes = notes[-10:]
-    save_notes(notes, note_file)
+    with locked(note_file):
+        _record({"op": "add", "item": note}, note_file)
     return note
 
 
 def remove_note(note_id: str, note_file: Path = NOTE_FILE) -> bool:
-    notes = load_notes(note_file)
-    new_notes = [n for n in notes if n["id"] != note_id]
-    if len(new_notes) == len(notes):
-        return False
-    save_notes(new_notes, note_file)
-    return True
+    with locked(note_file):
+        if not _exists(note_id, note_file):
+            return False
+        _record({"op": "remove", "id": note_id}, note_file)
+        return True
 
 
-def list_notes(note_file: Path = NOTE_FILE) -> list[dict]:
-    return load_notes(note_file)
+def list_notes(
+    note_file: Path = NOTE_FILE, limit: int | None = DEFAULT_LIMIT
+) -> list[dict]:
+    """Return the ``limit`` most recently added notes, or all if ``None`` or 0."""
+    if limit is not None and limit < 0:
+        raise ValueError(f"limit must not be negative, got {limit}")
+    with locked(note_file, shared=True):
+        notes = load_notes(note_file)
+    return notes[-limit:] if limit else notes
 
 
 def parse_args() -> argparse.Namespace:
@@ -71,12 +93,21 @@ def parse_args() -> argparse.Namespace:
     add_p = sub.add_parser("add")
     add_p.add_argument("content")
 
-    sub.add_parser("list")
+    list_p = sub.add_parser("list")
+    list_p.add_argument(
+        "--limit",
+        type=int,
+        default=DEFAULT_LIMIT,
+        help="Show the N most recent notes (0 for all)",
+    )
 
     remove_p = sub.add_parser("remove")
     remove_p.add_argument("id")
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.command == "list" and args.limit < 0:
+        parser.error("--limit must not be negative")
+    return args
 
 
 def main() -> None:
@@ -86,7 +117,7 @@ def main() -> None:
         note = add_note(args.content, note_file=note_file)
         print(note["id"])
     elif args.command == "list":
-        notes = list_notes(note_file=note_file)
+        notes = list_notes(note_file=note_file, limit=args.limit)
         print(json.dumps(notes, indent=2))
     elif args.command == "remove":
         if not remove_note(args.id, note_file=note_file):
@@ -10,39 +10,56 @@ from datetime import datetime
 from pathlib import Path
 import uuid
 
+import op_log
+from atomic_files import locked, write_json
+
 DEFAULT_MEMORY_DIR = Path(__file__).resolve().parent
 TASK_FILE = DEFAULT_MEMORY_DIR / "tasks.json"
+# Number of most recent tasks shown by ``list``; older tasks are kept on disk.
+DEFAULT_LIMIT = 10
+STATUSES = {"open", "in_progress", "finished"}
 
 logger = logging.getLogger(__name__)
 
 
-def load_tasks(task_file: Path = TASK_FILE) -> list[dict]:
+def _load_snapshot(task_file: Path) -> list[dict]:
+    tasks: list[dict] = []
     if task_file.exists():
         try:
             with task_file.open("r", encoding="utf-8") as f:
-                return json.load(f)
+                tasks = json.load(f)
         except json.JSONDecodeError:
             logger.warning("Failed to decode JSON from %s; returning empty list.", task_file)
-    return []
+    return tasks
+
+
+def load_tasks(task_file: Path = TASK_FILE) -> list[dict]:
+    return op_log.replay(_load_snapshot(task_file), task_file)
+
+
+def _exists(task_id: str, task_file: Path) -> bool:
+    return op_log.contains(task_file, task_id, lambda: _load_snapshot(task_file))
 
 
 def save_tasks(tasks: list[dict], task_file: Path = TASK_FILE) -> None:
-    task_file.parent.mkdir(parents=True, exist_ok=True)
-    with task_file.open("w", encoding="utf-8") as f:
-        json.dump(tasks, f, indent=2)
+    write_json(task_file, tasks)
+    op_log.clear(task_file)
+
+
+def _record(op: dict, task_file: Path) -> None:
+    if op_log.append(task_file, op) > op_log.COMPACT_BYTES:
+        save_tasks(load_tasks(task_file), task_file)
 
 
 def add_task(description: str, task_file: Path = TASK_FILE) -> dict:
-    tasks = load_tasks(task_file)
     task = {
         "id": str(uuid.uuid4()),
         "description": description,
         "status": "open",
         "created_at": datetime.utcnow().isoformat(),
     }
-    tasks.append(task)
-    tasks = tasks[-10:]
-    save_tasks(tasks, task_file)
+    with locked(task_file):
+        _record({"op": "add", "item": task}, task_file)
     return task
 
 
@@ -52,34 +69,44 @@ def update_task(
     description: str | None = None,
     task_file: Path = TASK_FILE,
 ) -> bool:
-    tasks = load_tasks(task_file)
-    updated = False
-    for t in tasks:
-        if t["id"] == task_id:
-            if status:
-                if status not in {"open", "in_progress", "finished"}:
-                    raise ValueError("Invalid status")
-                t["status"] = status
-            if description is not None:
-                t["description"] = description
-            updated = True
-            break
-    if updated:
-        save_tasks(tasks, task_file)
-    return updated
+    fields: dict = {}
+    if status:
+        if status not in STATUSES:
+            raise ValueError("Invalid status")
+        fields["status"] = status
+    if description is not None:
+        fields["description"] = description
+    with locked(task_file):
+        if not _exists(task_id, task_file):
+            return False
+        if fields:
+            _record({"op": "update", "id": task_id, "fields": fields}, task_file)
+        return True
 
 
 def remove_task(task_id: str, task_file: Path = TASK_FILE) -> bool:
-    tasks = load_tasks(task_file)
-    new_tasks = [t for t in tasks if t["id"] != task_id]
-    if len(new_tasks) == len(tasks):
-        return False
-    save_tasks(new_tasks, task_file)
-    return True
+    with locked(task_file):
+        if not _exists(task_id, task_file):
+            return False
+        _record({"op": "remove", "id": task_id}, task_file)
+        return True
 
 
-def list_tasks(task_file: Path = TASK_FILE) -> list[dict]:
-    return load_tasks(task_file)
+def get_task(task_id: str, task_file: Path = TASK_FILE) -> dict | None:
+    with locked(task_file, shared=True):
+        tasks = load_tasks(task_file)
+    return next((t for t in tasks if t["id"] == task_id), None)
+
+
+def list_tasks(
+    task_file: Path = TASK_FILE, limit: int | None = DEFAULT_LIMIT
+) -> list[dict]:
+    """Return the ``limit`` most recently added tasks, or all if ``None`` or 0."""
+    if limit is not None and limit < 0:
+        raise ValueError(f"limit must not be negative, got {limit}")
+    with locked(task_file, shared=True):
+        tasks = load_tasks(task_file)
+    return tasks[-limit:] if limit else tasks
 
 
 def parse_args() -> argparse.Namespace:
@@ -100,12 +127,21 @@ def parse_args() -> argparse.Namespace:
     update_p.add_argument("--status", choices=["open", "in_progress", "finished"])
     update_p.add_argument("--description")
 
-    sub.add_parser("list")
+    list_p = sub.add_parser("list")
+    list_p.add_argument(
+        "--limit",
+        type=int,
+        default=DEFAULT_LIMIT,
+        help="Show the N most recent tasks (0 for all)",
+    )
 
     remove_p = sub.add_parser("remove")
     remove_p.add_argument("id")
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.command == "list" and args.limit < 0:
+        parser.error("--limit must not be negative")
+    return args
 
 
 def main() -> None:
@@ -118,7 +154,7 @@ def main() -> None:
         if not update_task(args.id, args.status, args.description, task_file=task_file):
             print("Task not found")
     elif args.command == "list":
-        tasks = list_tasks(task_file=task_file)
+        tasks = list_tasks(task_file=task_file, limit=args.limit)
         print(json.dumps(tasks, indent=2))
     elif args.command == "remove":
         if not remove_task(args.id, task_file=task_file):
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Compressed cold storage for old memory entries.
+
+``archive`` moves entry files into ``archive/<first day>_<last day>.jsonl.gz``
+next to ``entries/``. An archive is a sequence of independently gzipped blocks
+of up to ``BLOCK_ENTRIES`` entry lines in timestamp order, so the whole file is
+still readable with ``zcat``. A JSON sidecar (``.idx.json``) records the byte
+range, time span and tags of every block, which lets readers decompress only
+the blocks that can match a query.
+
+The standard library has no zstd codec, so blocks use gzip.
+"""
+from __future__ import annotations
+
+import gzip
+import heapq
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from atomic_files import write_json
+from memory_storage import parse_line, remove_entry_file
+
+ARCHIVE_DIRNAME = "archive"
+INDEX_SUFFIX = ".idx.json"
+BLOCK_ENTRIES = 256
+
+
+def archive_dir(entries_dir: Path) -> Path:
+    root = entries_dir.parent if entries_dir.name == "entries" else entries_dir
+    return root / ARCHIVE_DIRNAME
+
+
+def _index_path(archive: Path) -> Path:
+    return archive.with_name(archive.name[: -len(".jsonl.gz")] + INDEX_SUFFIX)
+
+
+def _read_file(path: Path) -> list[tuple[datetime, bytes, list[str]]] | None:
+    """Return ``(ts, line, tags)`` for every entry of ``path``.
+
+    Returns ``None`` if any line is invalid, so the file is left in place.
+    """
+    lines = []
+    with path.open("rb") as f:
+        for raw in f:
+            if not raw.strip():
+                continue
+            try:
+                record = parse_line(raw)
+                ts = datetime.fromisoformat(record["ts"])
+            except ValueError as e:
+                print(f"Leaving {path} in place: {e}", file=sys.stderr)
+                return None
+            lines.append((ts, raw.rstrip(b"\n") + b"\n", record.get("tags", [])))
+    return lines
+
+
+def _new_archive_path(directory: Path, first: datetime, last: datetime) -> Path:
+    stem = f"{first.date().isoformat()}_{last.date().isoformat()}"
+    path = directory / f"{stem}.jsonl.gz"
+    n = 1
+    while path.exists():
+        n += 1
+        path = directory / f"{stem}.{n}.jsonl.gz"
+    return path
+
+
+def archive_files(entries_dir: Path, files: Iterable[Path]) -> tuple[int, Path | None]:
+    """Pack the entries of ``files`` into a new archive and delete the files.
+
+    Returns the number of archived entries and the archive path.
+    """
+    records = []
+    archived = []
+    for path in files:
+        lines = _read_file(path)
+        if lines is None:
+            continue
+        records.extend(lines)
+        archived.append(path)
+    if not records:
+        return 0, None
+    records.sort(key=lambda r: r[0])
+
+    directory = archive_dir(entries_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = _new_archive_path(directory, records[0][0], records[-1][0])
+    blocks = []
+    tmp = path.with_name(f".{path.name}.tmp")
+    with tmp.open("wb") as f:
+        for i in range(0, len(records), BLOCK_ENTRIES):
+            chunk = records[i : i + BLOCK_ENTRIES]
+            data = gzip.compress(b"".join(line for _, line, _ in chunk), mtime=0)
+            blocks.append(
+                {
+                    "offset": f.tell(),
+                    "length": len(data),
+                    "count": len(chunk),
+                    "start": chunk[0][0].isoformat(),
+                    "end": chunk[-1][0].isoformat(),
+                    "tags": sorted({tag for _, _, tags in chunk for tag in tags}),
+                }
+            )
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    write_json(_index_path(path), {"blocks": blocks})
+    os.replace(tmp, path)
+    for file in archived:
+        remove_entry_file(file)
+    return len(records), path
+
+
+def _block_matches(
+    block: dict,
+    since: datetime | None,
+    until: datetime | None,
+    tags: list[str] | None,
+) -> bool:
+    if since is not None and datetime.fromisoformat(block["end"]) < since:
+        return False
+    if until is not None and datetime.fromisoformat(block["start"]) > until:
+        return False
+    return not tags or bool(set(tags).intersection(block["tags"]))
+
+
+def _iter_archive(
+    path: Path,
+    since: datetime | None,
+    until: datetime | None,
+    tags: list[str] | None,
+    newest_first: bool,
+) -> Iterator[dict]:
+    try:
+        with _index_path(path).open("r", encoding="utf-8") as f:
+            blocks = json.load(f)["blocks"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
+        print(f"Skipping archive {path}: unreadable index ({e})", file=sys.stderr)
+        return
+    blocks = [b for b in blocks if _block_matches(b, since, until, tags)]
+    if newest_first:
+        blocks.reverse()
+    with path.open("rb") as f:
+        for block in blocks:
+            f.seek(block["offset"])
+            lines = gzip.decompress(f.read(block["length"])).splitlines()
+            if newest_first:
+                lines.reverse()
+            for line in lines:
+                try:
+                    yield parse_line(line)
+                except ValueError as e:
+                    print(f"Skipping invalid entry in {path}: {e}", file=sys.stderr)
+
+
+def iter_archived(
+    entries_dir: Path,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    tags: list[str] | None = None,
+    newest_first: bool = True,
+) -> Iterator[dict]:
+    """Yield archived entries in timestamp order.
+
+    Only blocks overlapping ``since``/``until`` and sharing a tag with
+    ``tags`` are decompressed; entries still need exact filtering.
+    """
+    streams = [
+        _iter_archive(path, since, until, tags, newest_first)
+        for path in sorted(archive_dir(entries_dir).glob("*.jsonl.gz"))
+    ]
+    return heapq.merge(
+        *streams,
+        key=lambda e: datetime.fromisoformat(e["ts"]),
+        reverse=newest_first,
+    )
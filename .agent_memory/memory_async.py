@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""asyncio facade over ``MemoryStore``.
+
+``AsyncMemoryStore`` runs all file I/O on a bounded thread pool so that an
+event loop shared by many agents is never blocked by memory operations.
+Concurrent calls to ``query`` or ``summarize`` with the same arguments share
+one lookup, and entries added while a write is pending or in progress are
+written together by the next ``add_entries`` call::
+
+    async with AsyncMemoryStore(".agent_memory") as store:
+        steps = [store.add(f"step {i}", "obs", "refl") for i in range(50)]
+        await asyncio.gather(*steps)
+        recent = await store.query(last=5)
+
+A lookup that starts after a write has finished never shares the result of
+one that started before it.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+import add_memory_entry as add_mod
+import memory_storage as storage
+from memory_store import MemoryStore
+from prune_memory_entries import PrunePlan, RetentionPolicy
+
+DEFAULT_WORKERS = 4
+
+
+class AsyncMemoryStore:
+    """Awaitable versions of the ``MemoryStore`` methods."""
+
+    def __init__(
+        self,
+        memory_dir: Path | str,
+        poll_interval: float = 1.0,
+        max_workers: int = DEFAULT_WORKERS,
+    ) -> None:
+        self.store = MemoryStore(memory_dir, poll_interval)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="memory"
+        )
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._flush_task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> AsyncMemoryStore:
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Wait for pending writes and stop the worker threads."""
+        if self._flush_task is not None:
+            await self._flush_task
+        self._executor.shutdown(wait=False)
+
+    def _run(self, fn: Callable, *args: Any, **kwargs: Any) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def _shared(self, key: tuple, fn: Callable, *args: Any) -> Any:
+        """Run ``fn(*args)`` once for all concurrent callers with the same key."""
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._run(fn, *args)
+            self._inflight[key] = future
+
+            def forget(_: asyncio.Future) -> None:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+            future.add_done_callback(forget)
+        return await asyncio.shield(future)
+
+    async def _write(self, fn: Callable, *args: Any) -> Any:
+        try:
+            return await self._run(fn, *args)
+        finally:
+            self._inflight.clear()
+
+    # Entries
+
+    async def query(
+        self,
+        tags: list[str] | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        search: str | None = None,
+        last: int | None = None,
+        task_id: str | None = None,
+        words: bool = False,
+    ) -> list[dict]:
+        key = ("query", tuple(tags or ()), since, until, search, last, task_id, words)
+        return await self._shared(
+            key, self.store.query, tags, since, until, search, last, task_id, words
+        )
+
+    async def summarize(self, since: str, until: str) -> dict:
+        return await self._shared(
+            ("summarize", since, until), self.store.summarize, since, until
+        )
+
+    async def add(
+        self,
+        context: str,
+        observation: str,
+        reflection: str,
+        tags: Iterable[str] = (),
+        task_id: str | None = None,
+    ) -> dict:
+        """Queue one entry for the next batched write and wait until it is written."""
+        entry = add_mod.build_entry(
+            context, observation, reflection, list(tags), task_id
+        )
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((entry, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        await future
+        return entry
+
+    def _write_batch(self, entries: list[dict]) -> list[ValueError | None]:
+        """Write the valid ``entries`` at once; return each entry's error."""
+        errors: list[ValueError | None] = []
+        valid = []
+        for entry in entries:
+            try:
+                storage.validate_entry(entry, self.store.schema_path)
+            except ValueError as e:
+                errors.append(e)
+                continue
+            errors.append(None)
+            valid.append(entry)
+        if valid:
+            self.store.add_entries(valid)
+        return errors
+
+    async def _flush(self) -> None:
+        try:
+            # Let the coroutines that are already runnable queue their adds.
+            await asyncio.sleep(0)
+            while self._pending:
+                batch, self._pending = self._pending, []
+                entries = [entry for entry, _ in batch]
+                try:
+                    errors = await self._write(self._write_batch, entries)
+                except Exception as e:
+                    # The write itself failed; every caller in the batch gets it.
+                    errors = [e] * len(batch)
+                for (_, future), error in zip(batch, errors):
+                    if future.done():
+                        continue
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+        finally:
+            self._flush_task = None
+
+    async def prune(
+        self, policy: RetentionPolicy, dry_run: bool = False
+    ) -> PrunePlan:
+        return await self._write(self.store.prune, policy, dry_run)
+
+    # Tasks and notes
+
+    async def tasks(self, limit: int | None = None) -> list[dict]:
+        return await self._shared(("tasks", limit), self.store.tasks, limit)
+
+    async def task(self, task_id: str) -> dict | None:
+        return await self._run(self.store.task, task_id)
+
+    async def add_task(self, description: str) -> dict:
+        return await self._write(self.store.add_task, description)
+
+    async def update_task(
+        self,
+        task_id: str,
+        status: str | None = None,
+        description: str | None = None,
+    ) -> bool:
+        return await self._write(self.store.update_task, task_id, status, description)
+
+    async def remove_task(self, task_id: str) -> bool:
+        return await self._write(self.store.remove_task, task_id)
+
+    async def notes(self, limit: int | None = None) -> list[dict]:
+        return await self._shared(("notes", limit), self.store.notes, limit)
+
+    async def add_note(self, content: str) -> dict:
+        return await self._write(self.store.add_note, content)
+
+    async def remove_note(self, note_id: str) -> bool:
+        return await self._write(self.store.remove_note, note_id)
@@ -5,25 +5,55 @@ from __future__ import annotations
 import argparse
 import json
 import os
-from datetime import datetime
+import sys
 from pathlib import Path
-import uuid
 
-from jsonschema import validate
-
-# Reuse helper functions from existing scripts
-import add_memory_entry as add_mod
-import query_memory_entries as query_mod
-import summarize_memory_entries as summary_mod
-import prune_memory_entries as prune_mod
-import manage_tasks as task_mod
-import manage_notes as note_mod
+# Helper modules from the existing scripts are imported inside the command
+# handlers so that each invocation only pays for the command it runs.
 
 DEFAULT_MEMORY_DIR = Path(__file__).resolve().parent
+# Commands forwarded to a running ``serve`` daemon instead of run in-process.
+DAEMON_COMMANDS = {"add", "query", "recall", "similar", "stats", "task", "note"}
+NO_DAEMON_ENV = "AGENT_MEMORY_NO_DAEMON"
+# Same as memory_trace.TRACE_ENV.
+TRACE_ENV = "AGENT_MEMORY_TRACE"
+# Variables read by forwarded commands, sent along so the daemon applies the
+# client's values rather than its own.
+FORWARDED_ENV = ("CODEX_AGENT", TRACE_ENV)
+JOBS_HELP = "Worker processes for parsing entry files (0 for one per CPU)"
+
+# Memory directory -> MemoryStore while serving, so that task and note reads
+# replay only the log lines added since the previous request.
+_stores: dict[Path, object] | None = None
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def _non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative, got {number}")
+    return number
 
 
 def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Manage agent memory and notes")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Report per-phase timings and counters as JSON on stderr",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        type=Path,
+        metavar="FILE",
+        help="Also write cProfile statistics for the command to FILE",
+    )
     sub = parser.add_subparsers(dest="command", required=True)
 
     add_p = sub.add_parser("add", help="Append a memory entry")
@@ -34,28 +64,114 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     add_p.add_argument("--task-id", help="ID of related task")
     add_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
 
+    batch_p = sub.add_parser(
+        "add-batch", help="Append many entries from a JSON lines file"
+    )
+    batch_p.add_argument(
+        "--from",
+        dest="source",
+        required=True,
+        help="JSON lines file with one entry per line, or - for stdin",
+    )
+    batch_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
+
     query_p = sub.add_parser("query", help="Query memory entries")
     query_p.add_argument("--tags", nargs="*")
     query_p.add_argument("--since")
     query_p.add_argument("--until")
     query_p.add_argument("--last", type=int)
-    query_p.add_argument("--search")
+    query_p.add_argument(
+        "--search", help="Only include entries containing this text (ignoring case)"
+    )
+    query_p.add_argument(
+        "--words",
+        action="store_true",
+        help="Treat --search as a word query (AND, OR, prefix* and field:word)",
+    )
+    query_p.add_argument("--task-id", help="Only include entries linked to this task")
+    query_p.add_argument(
+        "--strict", action="store_true", help="Validate every entry against the schema"
+    )
+    query_p.add_argument(
+        "--include-archive",
+        action="store_true",
+        help="Also search entries moved to the compressed archive",
+    )
+    query_p.add_argument("--jobs", type=int, default=1, help=JOBS_HELP)
     query_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
 
+    recall_p = sub.add_parser(
+        "recall", help="Retrieve the entries most relevant to a question"
+    )
+    recall_p.add_argument("question")
+    recall_p.add_argument("--top-k", type=_positive_int, default=5)
+    recall_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
+
+    similar_p = sub.add_parser(
+        "similar", help="Find entries with similar text using local embeddings"
+    )
+    similar_p.add_argument("text")
+    similar_p.add_argument("--top-k", type=_positive_int, default=5)
+    similar_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
+
     sum_p = sub.add_parser("summarize", help="Summarize memory entries")
     sum_p.add_argument("--since", required=True)
     sum_p.add_argument("--until", required=True)
     sum_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
     sum_p.add_argument("--output", type=Path)
+    sum_p.add_argument(
+        "--strict", action="store_true", help="Validate every entry against the schema"
+    )
+    sum_p.add_argument("--jobs", type=int, default=1, help=JOBS_HELP)
+
+    stats_p = sub.add_parser(
+        "stats", help="Show tag, agent and per-day entry counts"
+    )
+    stats_p.add_argument("--since", help="First day (a date or ISO timestamp)")
+    stats_p.add_argument("--until", help="Last day (a date or ISO timestamp)")
+    stats_p.add_argument("--tag", help="Also count the tags that occur with TAG")
+    stats_p.add_argument("--top", type=int, help="Only list the N most frequent tags")
+    stats_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
 
     prune_p = sub.add_parser("prune", help="Prune memory entries")
     g = prune_p.add_mutually_exclusive_group()
     g.add_argument("--before")
     g.add_argument("--older-than", type=int)
-    g.add_argument("--keep-last", type=int)
+    prune_p.add_argument("--keep-last", type=int)
+    prune_p.add_argument("--max-bytes", type=int)
+    prune_p.add_argument("--max-per-tag", type=int)
+    prune_p.add_argument("--max-per-agent", type=int)
     prune_p.add_argument("--dry-run", action="store_true")
     prune_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
 
+    archive_p = sub.add_parser(
+        "archive", help="Move old entries into compressed archive files"
+    )
+    ag = archive_p.add_mutually_exclusive_group(required=True)
+    ag.add_argument("--before")
+    ag.add_argument("--older-than", type=int)
+    archive_p.add_argument("--dry-run", action="store_true")
+    archive_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
+
+    compact_p = sub.add_parser(
+        "compact", help="Migrate per-entry files into segment files"
+    )
+    # Same values as memory_storage.PERIODS, spelled out to keep startup cheap.
+    compact_p.add_argument("--period", choices=("daily", "weekly"), default="daily")
+    compact_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
+
+    partition_p = sub.add_parser(
+        "partition", help="Move per-entry files into YYYY/MM/DD directories"
+    )
+    partition_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
+
+    reindex_p = sub.add_parser("reindex", help="Rebuild the entry index")
+    reindex_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
+    reindex_p.add_argument(
+        "--strict", action="store_true", help="Validate every entry against the schema"
+    )
+    reindex_p.add_argument("--jobs", type=int, default=1, help=JOBS_HELP)
+
     task_p = sub.add_parser("task", help="Manage task list")
     task_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
     task_sub = task_p.add_subparsers(dest="task_cmd", required=True)
@@ -65,75 +181,239 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     t_upd.add_argument("id")
     t_upd.add_argument("--status", choices=["open", "in_progress", "finished"])
     t_upd.add_argument("--description")
-    task_sub.add_parser("list")
+    t_list = task_sub.add_parser("list")
+    t_list.add_argument(
+        "--limit",
+        type=_non_negative_int,
+        default=10,
+        help="Show the N most recent tasks (0 for all)",
+    )
     t_rm = task_sub.add_parser("remove")
     t_rm.add_argument("id")
+    t_show = task_sub.add_parser(
+        "show", help="Show a task and its linked entries, oldest first"
+    )
+    t_show.add_argument("id")
 
     note_p = sub.add_parser("note", help="Manage permanent notes")
     note_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
     note_sub = note_p.add_subparsers(dest="note_cmd", required=True)
     n_add = note_sub.add_parser("add")
     n_add.add_argument("content")
-    note_sub.add_parser("list")
+    n_list = note_sub.add_parser("list")
+    n_list.add_argument(
+        "--limit",
+        type=_non_negative_int,
+        default=10,
+        help="Show the N most recent notes (0 for all)",
+    )
     n_rm = note_sub.add_parser("remove")
     n_rm.add_argument("id")
 
+    serve_p = sub.add_parser(
+        "serve", help="Answer CLI requests from a long-running local daemon"
+    )
+    serve_p.add_argument("--memory-dir", type=Path, default=DEFAULT_MEMORY_DIR)
+
     return parser.parse_args(argv)
 
 
 def handle_add(args: argparse.Namespace) -> None:
+    import add_memory_entry as add_mod
+    import memory_storage as storage
+
     memory_dir = args.memory_dir
     entries_dir = memory_dir / "entries"
     entries_dir.mkdir(parents=True, exist_ok=True)
     schema_path = memory_dir / "schema.json"
 
-    entry = {
-        "ts": datetime.utcnow().isoformat(),
-        "agent": os.getenv("CODEX_AGENT", "codex"),
-        "run_id": str(uuid.uuid4()),
-        "context": args.context,
-        "observation": args.observation,
-        "reflection": args.reflection,
-        "tags": args.tags,
-    }
-    if args.task_id:
-        entry["task_id"] = args.task_id
-
-    schema = add_mod.load_schema(schema_path)
-    validate(instance=entry, schema=schema)
-    filename = entries_dir / f"{entry['ts']}.jsonl"
-    with filename.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(entry) + "\n")
-
-
-def resolve_entries_dir(memory_dir: Path) -> Path:
-    if memory_dir.name == "entries":
-        return memory_dir
-    entries_dir = memory_dir / "entries"
-    if entries_dir.exists():
-        return entries_dir
-    if any(memory_dir.glob("*.jsonl")):
-        return memory_dir
-    return entries_dir
+    entry = add_mod.build_entry(
+        args.context, args.observation, args.reflection, args.tags, args.task_id
+    )
+
+    storage.load_validator(schema_path).validate(entry)
+    add_mod.write_entries(entries_dir, [entry], schema_path)
+
+
+def handle_add_batch(args: argparse.Namespace) -> None:
+    import time
+
+    import add_memory_entry as add_mod
+
+    entries_dir = args.memory_dir / "entries"
+    entries_dir.mkdir(parents=True, exist_ok=True)
+    schema_path = args.memory_dir / "schema.json"
+    start = time.perf_counter()
+    if args.source == "-":
+        count, errors = add_mod.add_batch(entries_dir, sys.stdin, schema_path)
+    else:
+        with open(args.source, "r", encoding="utf-8") as f:
+            count, errors = add_mod.add_batch(entries_dir, f, schema_path)
+    elapsed = time.perf_counter() - start
+    for error in errors:
+        print(f"Skipped {error}", file=sys.stderr)
+    rate = count / elapsed if elapsed else 0.0
+    print(f"Added {count} entries in {elapsed:.2f}s ({rate:.0f} entries/s)")
+
+
+def _jobs(jobs: int) -> int:
+    if jobs == 1:
+        return 1
+    import memory_parallel
+
+    return memory_parallel.resolve_jobs(jobs)
 
 
 def handle_query(args: argparse.Namespace) -> None:
-    entries_dir = resolve_entries_dir(args.memory_dir)
-    entries = query_mod.load_entries(entries_dir)
-    entries = query_mod.filter_entries(
-        entries, args.tags, args.since, args.until, args.search
-    )
-    if args.last is not None:
-        entries = entries[: args.last]
+    import sqlite3
+    from datetime import datetime
+    from itertools import islice
+
+    import memory_index as index_mod
+    import memory_storage as storage
+    import query_memory_entries as query_mod
+
+    entries_dir = storage.resolve_entries_dir(args.memory_dir)
+    jobs = _jobs(args.jobs)
+    # With the archive, --last applies to the merged stream instead.
+    last = None if args.include_archive else args.last
+    try:
+        entries = index_mod.query_entries(
+            entries_dir,
+            args.tags,
+            args.since,
+            args.until,
+            args.search,
+            last,
+            args.strict,
+            args.task_id,
+            jobs,
+            args.words,
+        )
+    except sqlite3.Error:
+        if jobs > 1:
+            import memory_parallel
+
+            entries = memory_parallel.iter_records(
+                entries_dir,
+                jobs,
+                args.strict,
+                since=datetime.fromisoformat(args.since) if args.since else None,
+                until=datetime.fromisoformat(args.until) if args.until else None,
+                where=memory_parallel.Filter(
+                    args.tags,
+                    args.since,
+                    args.until,
+                    args.search,
+                    args.task_id,
+                    args.words,
+                ),
+            )
+        else:
+            entries = query_mod.iter_entries(
+                entries_dir, args.strict, args.since, args.until
+            )
+            entries = query_mod.filter_entries(
+                entries,
+                args.tags,
+                args.since,
+                args.until,
+                args.search,
+                args.task_id,
+                args.words,
+            )
+        if last is not None:
+            entries = islice(entries, last)
+    if args.include_archive:
+        import heapq
+
+        import memory_archive as archive_mod
+
+        archived = archive_mod.iter_archived(
+            entries_dir,
+            datetime.fromisoformat(args.since) if args.since else None,
+            datetime.fromisoformat(args.until) if args.until else None,
+            args.tags,
+        )
+        archived = query_mod.filter_entries(
+            archived,
+            args.tags,
+            args.since,
+            args.until,
+            args.search,
+            args.task_id,
+            args.words,
+        )
+        entries = heapq.merge(
+            entries,
+            archived,
+            key=lambda e: datetime.fromisoformat(e["ts"]),
+            reverse=True,
+        )
+        if args.last is not None:
+            entries = islice(entries, args.last)
     for e in entries:
         print(json.dumps(e, indent=2))
 
 
+def handle_recall(args: argparse.Namespace) -> None:
+    import sqlite3
+
+    import memory_index as index_mod
+    import memory_search as search_mod
+    import memory_storage as storage
+    import query_memory_entries as query_mod
+
+    entries_dir = storage.resolve_entries_dir(args.memory_dir)
+    try:
+        ranked = index_mod.recall_entries(entries_dir, args.question, args.top_k)
+    except sqlite3.Error:
+        ranked = search_mod.rank(
+            query_mod.iter_entries(entries_dir), args.question, args.top_k
+        )
+    for score, e in ranked:
+        print(json.dumps({"score": round(score, 4), **e}, indent=2))
+
+
+def handle_similar(args: argparse.Namespace) -> None:
+    import sqlite3
+
+    import memory_index as index_mod
+    import memory_storage as storage
+    import memory_vectors as vectors_mod
+    import query_memory_entries as query_mod
+
+    entries_dir = storage.resolve_entries_dir(args.memory_dir)
+    try:
+        ranked = index_mod.similar_entries(entries_dir, args.text, args.top_k)
+    except sqlite3.Error:
+        ranked = vectors_mod.rank(
+            query_mod.iter_entries(entries_dir), args.text, args.top_k
+        )
+    for score, e in ranked:
+        print(json.dumps({"similarity": round(score, 4), **e}, indent=2))
+
+
 def handle_summarize(args: argparse.Namespace) -> None:
-    entries_dir = resolve_entries_dir(args.memory_dir)
-    entries = summary_mod.load_entries(entries_dir)
-    entries = summary_mod.filter_entries(entries, args.since, args.until)
-    summary = summary_mod.summarize(entries, args.since, args.until)
+    import memory_columns as columns
+    import memory_storage as storage
+    import summarize_memory_entries as summary_mod
+
+    entries_dir = storage.resolve_entries_dir(args.memory_dir)
+    jobs = _jobs(args.jobs)
+    if args.strict:
+        entries = summary_mod.load_entries(
+            entries_dir, args.strict, args.since, args.until, jobs
+        )
+        entries = summary_mod.filter_entries(entries, args.since, args.until)
+        summary = summary_mod.summarize(entries, args.since, args.until)
+    else:
+        try:
+            summary = columns.summarize(entries_dir, args.since, args.until, jobs)
+        except OSError:
+            summary = summary_mod.summarize_range(
+                entries_dir, args.since, args.until, jobs
+            )
     output_path = args.output
     if output_path is None:
         start = args.since.split("T")[0]
@@ -147,23 +427,121 @@ def handle_summarize(args: argparse.Namespace) -> None:
     print(f"Wrote summary to {output_path}")
 
 
+def handle_stats(args: argparse.Namespace) -> None:
+    import sqlite3
+
+    import memory_index as index_mod
+    import memory_stats as stats_mod
+    import memory_storage as storage
+    import query_memory_entries as query_mod
+
+    entries_dir = storage.resolve_entries_dir(args.memory_dir)
+    since, until = stats_mod.day_range(args.since, args.until)
+    try:
+        totals = index_mod.entry_stats(entries_dir, since, until, args.tag)
+    except sqlite3.Error:
+        entries = query_mod.iter_entries(
+            entries_dir,
+            since=f"{since}T00:00:00" if since else None,
+            until=f"{until}T23:59:59.999999" if until else None,
+        )
+        totals = stats_mod.scan(entries, since, until, args.tag)
+    report = stats_mod.report(totals, since, until, args.tag, args.top)
+    print(json.dumps(report, indent=2))
+
+
 def handle_prune(args: argparse.Namespace) -> None:
-    entries_dir = resolve_entries_dir(args.memory_dir)
-    prune_args = argparse.Namespace(**vars(args))
-    prune_args.memory_dir = entries_dir
-    files = prune_mod.determine_files_to_delete(prune_args)
+    import memory_storage as storage
+    import prune_memory_entries as prune_mod
+
+    entries_dir = storage.resolve_entries_dir(args.memory_dir)
+    prune_mod.prune(entries_dir, prune_mod.policy_from_args(args), args.dry_run)
+
+
+def handle_archive(args: argparse.Namespace) -> None:
+    import sqlite3
+
+    import memory_archive as archive_mod
+    import memory_index as index_mod
+    import memory_storage as storage
+    import prune_memory_entries as prune_mod
+
+    entries_dir = storage.resolve_entries_dir(args.memory_dir)
+    select_args = argparse.Namespace(
+        before=args.before,
+        older_than=args.older_than,
+        memory_dir=entries_dir,
+    )
+    files = prune_mod.determine_files_to_delete(select_args)
     if not files:
-        print("No entries to delete")
+        print("No entries to archive")
         return
-    for f in files:
-        if args.dry_run:
-            print(f"Would delete {f}")
-        else:
-            f.unlink(missing_ok=True)
-            print(f"Deleted {f}")
+    if args.dry_run:
+        for f in files:
+            print(f"Would archive {f}")
+        return
+    count, path = archive_mod.archive_files(entries_dir, files)
+    try:
+        index_mod.update_index(entries_dir)
+    except sqlite3.Error as e:
+        print(f"Failed to update index: {e}", file=sys.stderr)
+    print(f"Archived {count} entries into {path}")
+
+
+def handle_compact(args: argparse.Namespace) -> None:
+    import sqlite3
+
+    import memory_index as index_mod
+    import memory_storage as storage
+
+    entries_dir = storage.resolve_entries_dir(args.memory_dir)
+    count, files, segments = storage.compact(entries_dir, args.period)
+    try:
+        index_mod.update_index(entries_dir)
+    except sqlite3.Error as e:
+        print(f"Failed to update index: {e}", file=sys.stderr)
+    print(f"Compacted {count} entries from {files} files into {segments} segments")
+
+
+def handle_partition(args: argparse.Namespace) -> None:
+    import sqlite3
+
+    import memory_index as index_mod
+    import memory_storage as storage
+
+    entries_dir = storage.resolve_entries_dir(args.memory_dir)
+    moved = storage.partition(entries_dir)
+    try:
+        index_mod.update_index(entries_dir)
+    except sqlite3.Error as e:
+        print(f"Failed to update index: {e}", file=sys.stderr)
+    print(f"Moved {moved} entry files into day partitions")
+
+
+def handle_reindex(args: argparse.Namespace) -> None:
+    import memory_index as index_mod
+    import memory_storage as storage
+
+    entries_dir = storage.resolve_entries_dir(args.memory_dir)
+    count = index_mod.rebuild_index(entries_dir, args.strict, _jobs(args.jobs))
+    print(f"Indexed {count} entries")
+
+
+def _store(memory_dir: Path):
+    """Return the daemon's cached store for ``memory_dir``, or None if not serving."""
+    if _stores is None:
+        return None
+    store = _stores.get(memory_dir)
+    if store is None:
+        import memory_store
+
+        store = _stores.setdefault(memory_dir, memory_store.MemoryStore(memory_dir))
+    return store
 
 
 def handle_task(args: argparse.Namespace) -> None:
+    import manage_tasks as task_mod
+
     task_file = args.memory_dir / "tasks.json"
     if args.task_cmd == "add":
         task = task_mod.add_task(args.description, task_file=task_file)
@@ -174,40 +552,173 @@ def handle_task(args: argparse.Namespace) -> None:
         ):
             print("Task not found")
     elif args.task_cmd == "list":
-        tasks = task_mod.list_tasks(task_file=task_file)
+        store = _store(args.memory_dir)
+        if store is None:
+            tasks = task_mod.list_tasks(task_file=task_file, limit=args.limit)
+        else:
+            tasks = store.tasks(args.limit)
         print(json.dumps(tasks, indent=2))
     elif args.task_cmd == "remove":
         if not task_mod.remove_task(args.id, task_file=task_file):
             print("Task not found")
+    elif args.task_cmd == "show":
+        store = _store(args.memory_dir)
+        if store is None:
+            task = task_mod.get_task(args.id, task_file=task_file)
+        else:
+            task = store.task(args.id)
+        entries = _task_entries(args.memory_dir, args.id)
+        if task is None and not entries:
+            print("Task not found")
+            return
+        print(json.dumps({"task": task, "entries": entries}, indent=2))
+
+
+def _task_entries(memory_dir: Path, task_id: str) -> list[dict]:
+    """Return the entries linked to ``task_id`` oldest first."""
+    import sqlite3
+
+    import memory_index as index_mod
+    import memory_storage as storage
+    import query_memory_entries as query_mod
+
+    entries_dir = storage.resolve_entries_dir(memory_dir)
+    try:
+        # Only the rows of this task are read, via the task_id index.
+        entries = list(index_mod.query_entries(entries_dir, task_id=task_id))
+    except sqlite3.Error:
+        entries = query_mod.iter_entries(entries_dir)
+        entries = query_mod.filter_entries(entries, None, None, None, None, task_id)
+        entries = list(entries)
+    entries.reverse()
+    return entries
 
 
 def handle_note(args: argparse.Namespace) -> None:
+    import manage_notes as note_mod
+
     note_file = args.memory_dir / "notes.json"
     if args.note_cmd == "add":
         note = note_mod.add_note(args.content, note_file=note_file)
         print(note["id"])
     elif args.note_cmd == "list":
-        notes = note_mod.list_notes(note_file=note_file)
+        store = _store(args.memory_dir)
+        if store is None:
+            notes = note_mod.list_notes(note_file=note_file, limit=args.limit)
+        else:
+            notes = store.notes(args.limit)
         print(json.dumps(notes, indent=2))
     elif args.note_cmd == "remove":
         if not note_mod.remove_note(args.id, note_file=note_file):
             print("Note not found")
 
 
-def main(argv: list[str] | None = None) -> None:
-    args = parse_args(argv)
+def handle_serve(args: argparse.Namespace) -> None:
+    import sqlite3
+
+    import memory_client
+    import memory_daemon as daemon_mod
+    import memory_index as index_mod
+    import memory_storage as storage
+
+    global _stores
+    path = memory_client.socket_path(args.memory_dir)
+    index_mod.keep_connections()
+    if _stores is None:
+        _stores = {}
+    try:
+        index_mod.update_index(storage.resolve_entries_dir(args.memory_dir))
+    except sqlite3.Error as e:
+        print(f"Failed to update index: {e}", file=sys.stderr)
+    print(f"Serving memory requests on {path}")
+    sys.stdout.flush()
+    daemon_mod.serve(path, run_argv)
+
+
+def _dispatch(args: argparse.Namespace) -> None:
     if args.command == "add":
         handle_add(args)
+    elif args.command == "add-batch":
+        handle_add_batch(args)
     elif args.command == "query":
         handle_query(args)
+    elif args.command == "recall":
+        handle_recall(args)
+    elif args.command == "similar":
+        handle_similar(args)
     elif args.command == "summarize":
         handle_summarize(args)
+    elif args.command == "stats":
+        handle_stats(args)
     elif args.command == "prune":
         handle_prune(args)
+    elif args.command == "archive":
+        handle_archive(args)
+    elif args.command == "compact":
+        handle_compact(args)
+    elif args.command == "partition":
+        handle_partition(args)
+    elif args.command == "reindex":
+        handle_reindex(args)
     elif args.command == "task":
         handle_task(args)
     elif args.command == "note":
         handle_note(args)
+    elif args.command == "serve":
+        handle_serve(args)
+
+
+def run(args: argparse.Namespace) -> None:
+    profile = args.profile or args.profile_dump is not None
+    # Checked here so that untraced commands that do not read entries, such as
+    # task and note, skip importing memory_trace.
+    if args.command == "serve" or not (profile or os.environ.get(TRACE_ENV)):
+        _dispatch(args)
+        return
+    import memory_trace as trace
+
+    target = trace.destination(profile)
+    if target is None:
+        _dispatch(args)
+        return
+    with trace.traced(args.command, target, args.profile_dump):
+        _dispatch(args)
+
+
+def run_argv(argv: list[str], cwd: str) -> None:
+    """Run a command on behalf of a daemon client working in ``cwd``."""
+    args = parse_args(argv)
+    if args.command not in DAEMON_COMMANDS:
+        raise SystemExit(f"{args.command} is not served by the daemon")
+    args.memory_dir = Path(cwd, args.memory_dir)
+    if args.profile_dump is not None:
+        args.profile_dump = Path(cwd, args.profile_dump)
+    run(args)
+
+
+def _forward(args: argparse.Namespace, argv: list[str]) -> bool:
+    if args.command not in DAEMON_COMMANDS or os.environ.get(NO_DAEMON_ENV):
+        return False
+    import memory_client
+
+    path = memory_client.socket_path(args.memory_dir)
+    env = {name: os.environ.get(name) for name in FORWARDED_ENV}
+    response = memory_client.request(path, argv, env=env)
+    if response is None:
+        return False
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    if response["code"]:
+        raise SystemExit(response["code"])
+    return True
+
+
+def main(argv: list[str] | None = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+    args = parse_args(argv)
+    if not _forward(args, argv):
+        run(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Client side of the memory daemon protocol.
+
+Kept separate from ``memory_daemon`` so that forwarding a command costs no
+more than importing ``json`` and ``socket``.
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+from pathlib import Path
+
+SOCKET_FILENAME = "daemon.sock"
+CONNECT_TIMEOUT = 0.5
+
+
+def socket_path(memory_dir: Path) -> Path:
+    root = memory_dir.parent if memory_dir.name == "entries" else memory_dir
+    return root / "index" / SOCKET_FILENAME
+
+
+def _read_line(sock: socket.socket) -> bytes:
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b"\n"):
+            break
+    return b"".join(chunks)
+
+
+def request(
+    path: Path,
+    argv: list[str],
+    cwd: str | None = None,
+    env: dict[str, str | None] | None = None,
+) -> dict | None:
+    """Send ``argv`` to the daemon at ``path``; ``None`` if none is running.
+
+    ``env`` maps variable names to the values the command should see, None
+    for unset. Once connected the command may already have run, so later
+    failures are reported as an error response rather than ``None``.
+    """
+    payload = {"argv": argv, "cwd": cwd or os.getcwd(), "env": env or {}}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(str(path))
+        except OSError:
+            return None
+        sock.settimeout(None)
+        try:
+            sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+            line = _read_line(sock)
+            return json.loads(line)
+        except (OSError, ValueError) as e:
+            error = f"No valid response from the memory daemon at {path}: {e}\n"
+            return {"stdout": "", "stderr": error, "code": 1}
@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+"""Columnar snapshot of entries for counting and summarizing.
+
+The snapshot lives in ``index/columns/`` and stores every entry in timestamp
+order, one file per column:
+
+* ``ts.i64``: microseconds since the epoch;
+* ``file.i32`` and ``agent.i32``: codes for the entry file and the agent;
+* ``tag_start.u64`` and ``tag.i32``: the tag codes of entry ``i`` are
+  ``tag[tag_start[i]:tag_start[i + 1]]``;
+* ``context_start.u64`` with ``context.txt`` and ``reflection_start.u64``
+  with ``reflection.txt``: the UTF-8 text of each entry followed by a NUL.
+
+Numbers are little-endian. ``meta.json`` holds the valid length of every
+column file, the tag and agent names behind the codes, and the size of each
+segment read; ``files.json`` holds the same for the other entry files.
+
+``sync`` only reads new entry files and the new tails of segments. Rows that
+sort before ones already stored, and the rows of removed or rewritten files,
+are handled by rewriting the columns from the first affected position, with
+the rows after it copied from the columns instead of parsed again. Columns
+are only truncated to their valid length and appended to, and ``meta.json``
+is replaced last, so an interrupted update leaves the previous snapshot in
+place.
+
+Readers map the columns into memory and answer range queries by binary
+search over ``ts`` and by counting slices of the code columns, without
+building a dict per entry.
+"""
+from __future__ import annotations
+
+import bisect
+import contextlib
+import heapq
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+from collections import Counter
+from operator import itemgetter
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import memory_storage as storage
+import memory_trace as trace
+from atomic_files import locked, write_json
+
+INDEX_DIRNAME = "index"
+COLUMNS_DIRNAME = "columns"
+META_FILENAME = "meta.json"
+FILES_FILENAME = "files.json"
+# Bump whenever the column files change so old snapshots are rebuilt.
+VERSION = 1
+# Column file -> array typecode.
+_ARRAYS = {
+    "ts.i64": "q",
+    "file.i32": "i",
+    "agent.i32": "i",
+    "tag_start.u64": "Q",
+    "tag.i32": "i",
+    "context_start.u64": "Q",
+    "reflection_start.u64": "Q",
+}
+_BLOBS = ("context.txt", "reflection.txt")
+_FILES = (*_ARRAYS, *_BLOBS)
+# Column files with one value per entry.
+_PER_ENTRY = tuple(name for name in _ARRAYS if name != "tag.i32")
+# Start column -> the column it indexes.
+_INDEXES = {
+    "tag_start.u64": "tag.i32",
+    "context_start.u64": "context.txt",
+    "reflection_start.u64": "reflection.txt",
+}
+_STARTS = {target: name for name, target in _INDEXES.items()}
+_SEP = b"\0"
+# Rows buffered between writes to the column files.
+_CHUNK = 4096
+
+# (ts key, file code, agent code, tag codes, context, reflection)
+Row = tuple[int, int, int, tuple[int, ...], bytes, bytes]
+
+
+def columns_dir(entries_dir: Path) -> Path:
+    root = entries_dir.parent if entries_dir.name == "entries" else entries_dir
+    return root / INDEX_DIRNAME / COLUMNS_DIRNAME
+
+
+def _itemsize(name: str) -> int:
+    return array(_ARRAYS[name]).itemsize
+
+
+def _empty_meta() -> dict:
+    return {
+        "version": VERSION,
+        "stamp": None,
+        "lengths": dict.fromkeys(_FILES, 0),
+        "tags": [],
+        "agents": [],
+        "segments": {},
+        "next_file": 0,
+        "generation": 0,
+    }
+
+
+def _load_json(path: Path) -> dict | None:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class _Names:
+    """Codes for the names of a dictionary-encoded column."""
+
+    def __init__(self, names: list[str]) -> None:
+        self.names = names
+        self._codes = {name: i for i, name in enumerate(names)}
+
+    def code(self, name: str) -> int:
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+class ColumnSnapshot:
+    """Read-only view of the column files described by ``meta``."""
+
+    def __init__(self, directory: Path, meta: dict) -> None:
+        self.meta = meta
+        self.tags: list[str] = meta["tags"]
+        self.agents: list[str] = meta["agents"]
+        lengths = meta["lengths"]
+        self.count = lengths["ts.i64"] // _itemsize("ts.i64")
+        self._maps: list = []
+        self._columns = {
+            name: self._map(directory / name, lengths[name], typecode)
+            for name, typecode in _ARRAYS.items()
+        }
+        self._blobs = {
+            name: self._map(directory / name, lengths[name]) for name in _BLOBS
+        }
+
+    def _map(self, path: Path, length: int, typecode: str | None = None):
+        if not length:
+            return b"" if typecode is None else array(typecode)
+        with path.open("rb") as f:
+            mapped = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+        if typecode is None:
+            self._maps.append(mapped)
+            return mapped
+        if sys.byteorder != "little":
+            values = array(typecode, mapped[:])
+            values.byteswap()
+            mapped.close()
+            return values
+        view = memoryview(mapped).cast(typecode)
+        self._maps.extend((view, mapped))
+        return view
+
+    def close(self) -> None:
+        for mapped in self._maps:
+            # Views of a slice still in use keep their map open until collected.
+            with contextlib.suppress(BufferError):
+                if isinstance(mapped, memoryview):
+                    mapped.release()
+                else:
+                    mapped.close()
+        self._maps = []
+
+    def __enter__(self) -> ColumnSnapshot:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _start(self, name: str, i: int) -> int:
+        """Return where entry ``i`` starts in the column that ``name`` indexes."""
+        if i < self.count:
+            return self._columns[name][i]
+        target = _INDEXES[name]
+        length = self.meta["lengths"][target]
+        return length // _itemsize(target) if target in _ARRAYS else length
+
+    def _range(self, since: str | None, until: str | None) -> tuple[int, int]:
+        ts = self._columns["ts.i64"]
+        lo = bisect.bisect_left(ts, storage.timestamp_key(since)) if since else 0
+        hi = self.count
+        if until:
+            hi = bisect.bisect_right(ts, storage.timestamp_key(until))
+        return lo, max(lo, hi)
+
+    def count_range(self, since: str | None = None, until: str | None = None) -> int:
+        """Return the number of entries with ``since <= ts <= until``."""
+        lo, hi = self._range(since, until)
+        return hi - lo
+
+    def _tag_counts(self, lo: int, hi: int) -> dict[str, int]:
+        codes = self._columns["tag.i32"]
+        start, end = self._start("tag_start.u64", lo), self._start("tag_start.u64", hi)
+        return {self.tags[code]: n for code, n in Counter(codes[start:end]).items()}
+
+    def tag_counts(
+        self, since: str | None = None, until: str | None = None
+    ) -> dict[str, int]:
+        """Return how often each tag occurs in entries from ``since`` to ``until``."""
+        return self._tag_counts(*self._range(since, until))
+
+    def agent_counts(
+        self, since: str | None = None, until: str | None = None
+    ) -> dict[str, int]:
+        lo, hi = self._range(since, until)
+        codes = Counter(self._columns["agent.i32"][lo:hi])
+        return {self.agents[code]: n for code, n in codes.items()}
+
+    def _texts(self, name: str, lo: int, hi: int) -> list[str]:
+        if lo >= hi:
+            return []
+        starts = _STARTS[name]
+        blob = self._blobs[name]
+        start, end = self._start(starts, lo), self._start(starts, hi)
+        texts = blob[start:end].decode("utf-8").split("\0")
+        if len(texts) == hi - lo + 1:
+            return texts[:-1]
+        # Some text contains a NUL itself; cut at the stored offsets instead.
+        bounds = [self._start(starts, i) for i in range(lo, hi + 1)]
+        return [
+            blob[a : b - 1].decode("utf-8") for a, b in zip(bounds, bounds[1:])
+        ]
+
+    def summarize(self, since: str, until: str) -> dict:
+        """Return the same summary as ``summarize_memory_entries.summarize``."""
+        lo, hi = self._range(since, until)
+        return {
+            "start": since,
+            "end": until,
+            "entry_count": hi - lo,
+            "tag_counts": self._tag_counts(lo, hi),
+            "contexts": self._texts("context.txt", lo, hi),
+            "reflections": self._texts("reflection.txt", lo, hi),
+        }
+
+    def lengths_at(self, i: int) -> dict[str, int]:
+        """Return the column lengths holding the first ``i`` entries."""
+        lengths = {name: i * _itemsize(name) for name in _PER_ENTRY}
+        lengths["tag.i32"] = self._start("tag_start.u64", i) * _itemsize("tag.i32")
+        for name in _BLOBS:
+            lengths[name] = self._start(_STARTS[name], i)
+        return lengths
+
+    def _span(self, name: str, i: int) -> slice:
+        return slice(self._start(name, i), self._start(name, i + 1))
+
+    def rows(self, lo: int, hi: int) -> Iterator[Row]:
+        """Yield the rows of entries ``lo`` to ``hi`` as ``sync`` writes them."""
+        c = self._columns
+        for i in range(lo, hi):
+            texts = []
+            for name in _BLOBS:
+                span = self._span(_STARTS[name], i)
+                texts.append(self._blobs[name][span.start : span.stop - 1])
+            yield (
+                c["ts.i64"][i],
+                c["file.i32"][i],
+                c["agent.i32"][i],
+                tuple(c["tag.i32"][self._span("tag_start.u64", i)]),
+                *texts,
+            )
+
+
+def _parse_file(
+    path: Path, start: int
+) -> tuple[list[tuple[int, str, list[str], bytes, bytes]], int]:
+    """Return the complete entries of ``path`` after byte ``start`` and its new size."""
+    rows = []
+    end = start
+    with path.open("rb") as f:
+        f.seek(start)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                # A writer is still appending this line; pick it up next sync.
+                break
+            end += len(raw)
+            if not raw.strip():
+                continue
+            try:
+                record = storage.parse_line(raw)
+                key = storage.timestamp_key(record["ts"])
+            except ValueError as e:
+                print(f"Skipping invalid entry in {path}: {e}", file=sys.stderr)
+                continue
+            rows.append(
+                (
+                    key,
+                    record.get("agent", ""),
+                    record.get("tags", []),
+                    record["context"].encode("utf-8"),
+                    record["reflection"].encode("utf-8"),
+                )
+            )
+    return rows, end
+
+
+def _read_rows(
+    reads: list[tuple[float, Path, str, int, int]],
+    jobs: int,
+    tags: _Names,
+    agents: _Names,
+    sizes: dict[str, list[int]],
+) -> Iterator[Row]:
+    """Yield the rows of ``reads`` in timestamp order.
+
+    ``reads`` holds ``(lower bound, path, relative path, file code, start)``
+    sorted by bound; a row is released once no later file can precede it.
+    The new size of each file is stored in ``sizes``.
+    """
+    tasks = [(path, start) for _, path, _, _, start in reads]
+    if jobs > 1 and len(tasks) > 1:
+        import memory_parallel
+
+        parsed = memory_parallel.imap(_parse_file, tasks, jobs)
+    else:
+        parsed = (_parse_file(*task) for task in tasks)
+    heap: list = []
+    seq = 0
+    for (lo, _, rel, code, _), (records, end) in zip(reads, parsed):
+        sizes[rel] = [code, end]
+        while heap and heap[0][0] < lo:
+            yield heapq.heappop(heap)[2]
+        for key, agent, tag_names, context, reflection in records:
+            row = (
+                key,
+                code,
+                agents.code(agent),
+                tuple(tags.code(tag) for tag in tag_names),
+                context,
+                reflection,
+            )
+            heapq.heappush(heap, (key, seq, row))
+            seq += 1
+    trace.count("column_rows_parsed", seq)
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+def _write(
+    directory: Path, rows: Iterable[Row], base: dict[str, int]
+) -> dict[str, int]:
+    """Write ``rows`` as new column files in ``directory``; return their sizes.
+
+    Start offsets continue from ``base``, the lengths of the columns that
+    the files will be appended to.
+    """
+    totals = {
+        "tag.i32": base["tag.i32"] // _itemsize("tag.i32"),
+        "context.txt": base["context.txt"],
+        "reflection.txt": base["reflection.txt"],
+    }
+    values = {name: array(typecode) for name, typecode in _ARRAYS.items()}
+    texts: dict[str, list[bytes]] = {name: [] for name in _BLOBS}
+    written = dict.fromkeys(_FILES, 0)
+    with contextlib.ExitStack() as stack:
+        out = {
+            name: stack.enter_context((directory / name).open("wb")) for name in _FILES
+        }
+
+        def flush() -> None:
+            for name, column in values.items():
+                if sys.byteorder != "little":
+                    column.byteswap()
+                out[name].write(column.tobytes())
+                written[name] += len(column) * column.itemsize
+                del column[:]
+            for name, parts in texts.items():
+                if parts:
+                    data = _SEP.join(parts) + _SEP
+                    out[name].write(data)
+                    written[name] += len(data)
+                    parts.clear()
+
+        for n, (key, file_code, agent, tag_codes, context, reflection) in enumerate(
+            rows, 1
+        ):
+            values["ts.i64"].append(key)
+            values["file.i32"].append(file_code)
+            values["agent.i32"].append(agent)
+            values["tag_start.u64"].append(totals["tag.i32"])
+            values["tag.i32"].extend(tag_codes)
+            totals["tag.i32"] += len(tag_codes)
+            for name, text in zip(_BLOBS, (context, reflection)):
+                values[_STARTS[name]].append(totals[name])
+                texts[name].append(text)
+                totals[name] += len(text) + 1
+            if n % _CHUNK == 0:
+                flush()
+        flush()
+    return written
+
+
+def _save(directory: Path, meta: dict, files: dict) -> None:
+    # Both files carry the generation, so a crash between the two writes
+    # shows up as a mismatch instead of stale sizes.
+    meta["generation"] += 1
+    write_json(directory / FILES_FILENAME, {"generation": meta["generation"], **files})
+    write_json(directory / META_FILENAME, meta)
+
+
+def _load(directory: Path) -> tuple[dict, dict]:
+    meta = _load_json(directory / META_FILENAME)
+    files = _load_json(directory / FILES_FILENAME)
+    if (
+        meta is None
+        or files is None
+        or meta.get("version") != VERSION
+        or meta.get("partial")
+        or files.pop("generation", None) != meta["generation"]
+    ):
+        return _empty_meta(), {}
+    return meta, files
+
+
+def sync(entries_dir: Path, jobs: int = 1) -> None:
+    """Bring the snapshot up to date with the entry files on disk.
+
+    With ``jobs`` above 1, files are parsed on that many processes.
+    """
+    if not entries_dir.exists():
+        return
+    directory = columns_dir(entries_dir)
+    with trace.phase("columns_sync"), locked(directory / META_FILENAME):
+        _sync(entries_dir, directory, jobs)
+
+
+def _sync(entries_dir: Path, directory: Path, jobs: int) -> None:
+    meta, files = _load(directory)
+    # Drop whatever an interrupted update appended after the valid lengths.
+    for name, length in meta["lengths"].items():
+        path = directory / name
+        path.touch()
+        if path.stat().st_size != length:
+            os.truncate(path, length)
+
+    stamp = storage.directory_stamp(entries_dir)
+    segments = meta["segments"]
+    known = {**files, **segments}
+    if stamp == meta["stamp"]:
+        # No file was created or removed, so only segments can have changed.
+        rels = list(segments)
+    else:
+        rels = [
+            path.relative_to(entries_dir).as_posix()
+            for path in storage.iter_entry_files(entries_dir)
+        ]
+    root = str(entries_dir)
+    seen = set()
+    dropped: set[int] = set()
+    inodes: dict[str, int] = {}
+    # (lower bound, path, relative path, file code, byte to read from)
+    reads: list[tuple[float, Path, str, int, int]] = []
+    for rel in rels:
+        try:
+            # Plain strings; most files are unchanged and only need a stat.
+            st = os.stat(os.path.join(root, rel))
+        except FileNotFoundError:
+            continue
+        seen.add(rel)
+        code, indexed, inode = known.get(rel, (None, 0, None))
+        if code is None:
+            code = meta["next_file"]
+            meta["next_file"] += 1
+        elif st.st_ino != inode or st.st_size < indexed:
+            # Rewritten by prune: replace all of its rows.
+            dropped.add(code)
+            indexed = 0
+        elif st.st_size == indexed:
+            continue
+        inodes[rel] = st.st_ino
+        path = entries_dir / rel
+        reads.append((storage.file_bounds(path)[0], path, rel, code, indexed))
+    if stamp != meta["stamp"]:
+        for rel in known.keys() - seen:
+            dropped.add(known[rel][0])
+            files.pop(rel, None)
+            segments.pop(rel, None)
+    elif not reads:
+        return
+    meta["stamp"] = stamp
+    if not reads and not dropped:
+        _save(directory, meta, files)
+        return
+
+    reads.sort(key=itemgetter(0))
+    tags, agents = _Names(meta["tags"]), _Names(meta["agents"])
+    sizes: dict[str, list[int]] = {}
+    new_rows: Iterable[Row] = _read_rows(reads, jobs, tags, agents, sizes)
+    old = ColumnSnapshot(directory, meta)
+    try:
+        start = old.count
+        if dropped:
+            codes = old._columns["file.i32"]
+            start = next((i for i, c in enumerate(codes) if c in dropped), start)
+        if old.count:
+            # An incremental update has few rows; find where the first one goes.
+            new_rows = list(new_rows)
+            if new_rows:
+                ts = old._columns["ts.i64"]
+                start = min(start, bisect.bisect_right(ts, new_rows[0][0]))
+        base = old.lengths_at(start)
+        tail = (row for row in old.rows(start, old.count) if row[1] not in dropped)
+        with tempfile.TemporaryDirectory(dir=directory) as tmp:
+            rows = heapq.merge(tail, new_rows, key=itemgetter(0))
+            added = _write(Path(tmp), rows, base)
+            rewrites = start < old.count
+            # The maps must go before their files are truncated.
+            old.close()
+            if rewrites:
+                # Valid rows are about to be cut off; rebuild if we stop here.
+                partial = {**meta, "lengths": base, "partial": True}
+                write_json(directory / META_FILENAME, partial)
+            for name in _FILES:
+                os.truncate(directory / name, base[name])
+                with (directory / name).open("ab") as f:
+                    with (Path(tmp) / name).open("rb") as src:
+                        shutil.copyfileobj(src, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+    finally:
+        old.close()
+    trace.count("column_rows_written", added["ts.i64"] // _itemsize("ts.i64"))
+    meta["lengths"] = {name: base[name] + added[name] for name in _FILES}
+    for rel, (code, size) in sizes.items():
+        target = segments if storage.is_segment(entries_dir / rel) else files
+        target[rel] = [code, size, inodes[rel]]
+    _save(directory, meta, files)
+
+
+@contextlib.contextmanager
+def open_snapshot(
+    entries_dir: Path, jobs: int = 1, update: bool = True
+) -> Iterator[ColumnSnapshot]:
+    """Sync the snapshot unless ``update`` is false, and map it for reading.
+
+    Writers are held off until the block ends.
+    """
+    if update:
+        sync(entries_dir, jobs)
+    directory = columns_dir(entries_dir)
+    with locked(directory / META_FILENAME, shared=True):
+        meta, _ = _load(directory)
+        with ColumnSnapshot(directory, meta) as snapshot:
+            yield snapshot
+
+
+def summarize(entries_dir: Path, since: str, until: str, jobs: int = 1) -> dict:
+    """Summarize entries with ``since <= ts <= until`` from the snapshot."""
+    with open_snapshot(entries_dir, jobs) as snapshot:
+        return snapshot.summarize(since, until)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Local socket server that runs memory CLI commands in a long-lived process.
+
+The daemon listens on a Unix domain socket at ``<memory dir>/index/daemon.sock``.
+Each connection carries one request and one response, each a single JSON
+line::
+
+    {"argv": ["query", "--last", "5"], "cwd": "/path/to/project",
+     "env": {"CODEX_AGENT": "planner", "AGENT_MEMORY_TRACE": null}}
+    {"stdout": "...", "stderr": "", "code": 0}
+
+``env`` carries the client's values of the variables that affect a command,
+``null`` for unset, and is applied for the duration of the request.
+
+Requests are handled one at a time, so commands never race each other inside
+the daemon. Clients (see ``memory_client``) fall back to running the command
+themselves whenever no daemon answers.
+"""
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import traceback
+from pathlib import Path
+from typing import Callable, Iterator
+
+Handler = Callable[[list[str], str], int]
+
+
+@contextlib.contextmanager
+def _environ(env: dict[str, str | None]) -> Iterator[None]:
+    saved = {name: os.environ.get(name) for name in env}
+
+    def apply(values: dict[str, str | None]) -> None:
+        for name, value in values.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    apply(env)
+    try:
+        yield
+    finally:
+        apply(saved)
+
+
+def execute(
+    handler: Handler,
+    argv: list[str],
+    cwd: str,
+    env: dict[str, str | None] | None = None,
+) -> dict:
+    """Run ``handler`` with ``env`` applied, capturing its output and status."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with _environ(env or {}):
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                code = handler(argv, cwd) or 0
+            except SystemExit as e:
+                if isinstance(e.code, int) or e.code is None:
+                    code = e.code or 0
+                else:
+                    print(e.code, file=stderr)
+                    code = 1
+            except Exception:
+                traceback.print_exc()
+                code = 1
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "code": code}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            payload = json.loads(self.rfile.readline())
+            argv = [str(a) for a in payload["argv"]]
+            cwd = str(payload.get("cwd") or os.getcwd())
+            env = {
+                str(name): None if value is None else str(value)
+                for name, value in (payload.get("env") or {}).items()
+            }
+        except (ValueError, KeyError, TypeError, AttributeError):
+            response = {"stdout": "", "stderr": "Malformed request\n", "code": 2}
+        else:
+            response = execute(self.server.handler, argv, cwd, env)
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class MemoryServer(socketserver.UnixStreamServer):
+    def __init__(self, path: Path, handler: Handler) -> None:
+        self.handler = handler
+        self.path = path
+        super().__init__(str(path), _RequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            self.path.unlink()
+
+
+def make_server(path: Path, handler: Handler) -> MemoryServer:
+    """Bind a server at ``path``, replacing a socket left by a dead daemon."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(path))
+            except OSError:
+                path.unlink()
+            else:
+                raise RuntimeError(f"A memory daemon is already listening on {path}")
+    return MemoryServer(path, handler)
+
+
+def serve(path: Path, handler: Handler) -> None:
+    server = make_server(path, handler)
+
+    def _stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,797 @@
+#!/usr/bin/env python3
+"""Persistent SQLite index over agent memory entries.
+
+The index lives in ``index/entries.sqlite3`` next to ``entries/`` and records,
+for every valid entry, the file and byte offset it was read from together with
+its timestamp, tags and task ID, plus an inverted index of the searchable text
+(see ``memory_search``). Queries resolve matching locations through the index
+and only read the lines they return.
+"""
+from __future__ import annotations
+
+import contextlib
+import heapq
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import memory_search as search_mod
+import memory_stats as stats_mod
+import memory_storage as storage
+import memory_trace as trace
+import memory_vectors as vectors_mod
+
+INDEX_DIRNAME = "index"
+INDEX_FILENAME = "entries.sqlite3"
+# Bump whenever _DDL or the indexed data changes so stale indexes are rebuilt.
+INDEX_VERSION = "6"
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    ino INTEGER NOT NULL DEFAULT 0,
+    mtime_ns INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    ts_key TEXT NOT NULL,
+    agent TEXT,
+    task_id TEXT,
+    doc_len INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_ts ON entries (ts_key);
+CREATE INDEX IF NOT EXISTS entries_task ON entries (task_id, ts_key);
+CREATE INDEX IF NOT EXISTS entries_file ON entries (file_id);
+CREATE TABLE IF NOT EXISTS entry_tags (
+    tag TEXT NOT NULL,
+    ts_key TEXT NOT NULL,
+    entry_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, ts_key, entry_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entry_tags_entry ON entry_tags (entry_id);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    field INTEGER NOT NULL,
+    entry_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, field, entry_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_entry ON postings (entry_id);
+CREATE TABLE IF NOT EXISTS term_stats (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS corpus (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    docs INTEGER NOT NULL,
+    tokens INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO corpus (id, docs, tokens) VALUES (0, 0, 0);
+CREATE TABLE IF NOT EXISTS tag_days (
+    day TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (day, tag)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS agent_days (
+    day TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (day, agent)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tag_pairs (
+    tag TEXT NOT NULL,
+    day TEXT NOT NULL,
+    other TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (tag, day, other)
+) WITHOUT ROWID;
+"""
+
+
+def index_path(entries_dir: Path) -> Path:
+    root = entries_dir.parent if entries_dir.name == "entries" else entries_dir
+    return root / INDEX_DIRNAME / INDEX_FILENAME
+
+
+def ts_key(ts: str) -> str:
+    """Normalize an ISO timestamp so that string order matches time order."""
+    return datetime.fromisoformat(ts).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def connect(entries_dir: Path) -> sqlite3.Connection:
+    path = index_path(entries_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_DDL)
+    if _get_meta(conn, "version") != INDEX_VERSION:
+        _reset(conn)
+        vectors_mod.remove_vectors(path.parent)
+    return conn
+
+
+# Index path -> (inode, connection) while ``keep_connections`` is in effect.
+_kept: dict[Path, tuple[int, sqlite3.Connection]] | None = None
+
+
+def keep_connections() -> None:
+    """Reuse one connection per index for the rest of the process.
+
+    The daemon calls this so that its requests skip opening the database and
+    checking its schema. A connection is reopened if the index file was
+    replaced or it raised an error.
+    """
+    global _kept
+    if _kept is None:
+        _kept = {}
+
+
+def _forget(path: Path) -> None:
+    if _kept is not None and path in _kept:
+        _kept.pop(path)[1].close()
+
+
+@contextlib.contextmanager
+def _open(entries_dir: Path) -> Iterator[sqlite3.Connection]:
+    if _kept is None:
+        conn = connect(entries_dir)
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+    path = index_path(entries_dir)
+    try:
+        ino = os.stat(path).st_ino
+    except FileNotFoundError:
+        ino = None
+    if path not in _kept or _kept[path][0] != ino:
+        _forget(path)
+        conn = connect(entries_dir)
+        _kept[path] = (os.stat(path).st_ino, conn)
+    conn = _kept[path][1]
+    try:
+        yield conn
+    except sqlite3.Error:
+        _forget(path)
+        raise
+
+
+def _reset(conn: sqlite3.Connection) -> None:
+    conn.execute("BEGIN IMMEDIATE")
+    tables = [
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "AND name NOT LIKE 'sqlite_%'"
+        )
+    ]
+    for table in tables:
+        conn.execute(f"DROP TABLE {table}")
+    conn.execute("COMMIT")
+    conn.executescript(_DDL)
+    _set_meta(conn, "version", INDEX_VERSION)
+
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> str | None:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: str) -> None:
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?) "
+        "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+        (key, value),
+    )
+
+
+def _insert_entry(
+    conn: sqlite3.Connection,
+    file_id: int,
+    offset: int,
+    length: int,
+    entry: dict,
+    postings: list[tuple[str, str, int]],
+) -> int:
+    key = ts_key(entry["ts"])
+    doc_len = sum(tf for _, _, tf in postings)
+    cur = conn.execute(
+        "INSERT INTO entries "
+        "(file_id, offset, length, ts_key, agent, task_id, doc_len) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            file_id,
+            offset,
+            length,
+            key,
+            entry.get("agent"),
+            entry.get("task_id"),
+            doc_len,
+        ),
+    )
+    entry_id = cur.lastrowid
+    conn.executemany(
+        "INSERT OR IGNORE INTO entry_tags (tag, ts_key, entry_id) VALUES (?, ?, ?)",
+        [(tag, key, entry_id) for tag in entry.get("tags", [])],
+    )
+    conn.executemany(
+        "INSERT INTO postings (term, field, entry_id, tf) VALUES (?, ?, ?, ?)",
+        [(term, field, entry_id, tf) for term, field, tf in postings],
+    )
+    conn.executemany(
+        "INSERT INTO term_stats (term, df) VALUES (?, 1) "
+        "ON CONFLICT (term) DO UPDATE SET df = df + 1",
+        [(term,) for term in {term for term, _, _ in postings}],
+    )
+    conn.execute(
+        "UPDATE corpus SET docs = docs + 1, tokens = tokens + ? WHERE id = 0",
+        (doc_len,),
+    )
+    return entry_id
+
+
+def _add_stats(conn: sqlite3.Connection, counts: stats_mod.Counts) -> None:
+    conn.executemany(
+        "INSERT INTO tag_days (tag, day, n) VALUES (?, ?, ?) "
+        "ON CONFLICT (day, tag) DO UPDATE SET n = n + excluded.n",
+        [(*key, n) for key, n in counts.tags.items()],
+    )
+    conn.executemany(
+        "INSERT INTO agent_days (agent, day, n) VALUES (?, ?, ?) "
+        "ON CONFLICT (day, agent) DO UPDATE SET n = n + excluded.n",
+        [(*key, n) for key, n in counts.agents.items()],
+    )
+    conn.executemany(
+        "INSERT INTO tag_pairs (tag, other, day, n) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (tag, day, other) DO UPDATE SET n = n + excluded.n",
+        [(*key, n) for key, n in counts.pairs.items()],
+    )
+
+
+# Subtract the counts of the entries of one file (the only parameter).
+_DROP_STATS = (
+    "UPDATE tag_days SET n = tag_days.n - gone.n FROM ("
+    "  SELECT substr(t.ts_key, 1, 10) AS day, t.tag, COUNT(*) AS n"
+    "  FROM entries e JOIN entry_tags t ON t.entry_id = e.id"
+    "  WHERE e.file_id = ? GROUP BY 1, 2"
+    ") AS gone WHERE tag_days.day = gone.day AND tag_days.tag = gone.tag",
+    "UPDATE agent_days SET n = agent_days.n - gone.n FROM ("
+    "  SELECT substr(ts_key, 1, 10) AS day, COALESCE(agent, '') AS agent,"
+    "  COUNT(*) AS n FROM entries WHERE file_id = ? GROUP BY 1, 2"
+    ") AS gone WHERE agent_days.day = gone.day AND agent_days.agent = gone.agent",
+    "UPDATE tag_pairs SET n = tag_pairs.n - gone.n FROM ("
+    "  SELECT a.tag, substr(a.ts_key, 1, 10) AS day, b.tag AS other,"
+    "  COUNT(*) AS n FROM entries e"
+    "  JOIN entry_tags a ON a.entry_id = e.id"
+    "  JOIN entry_tags b ON b.entry_id = e.id AND b.tag != a.tag"
+    "  WHERE e.file_id = ? GROUP BY 1, 2, 3"
+    ") AS gone WHERE tag_pairs.tag = gone.tag AND tag_pairs.day = gone.day"
+    "  AND tag_pairs.other = gone.other",
+)
+
+
+def _drop_file(conn: sqlite3.Connection, file_id: int) -> None:
+    for sql in _DROP_STATS:
+        conn.execute(sql, (file_id,))
+    for table in ("tag_days", "agent_days", "tag_pairs"):
+        conn.execute(f"DELETE FROM {table} WHERE n <= 0")
+    conn.execute(
+        "UPDATE term_stats SET df = term_stats.df - gone.n FROM ("
+        "  SELECT term, COUNT(DISTINCT entry_id) AS n FROM postings"
+        "  WHERE entry_id IN (SELECT id FROM entries WHERE file_id = ?)"
+        "  GROUP BY term"
+        ") AS gone WHERE term_stats.term = gone.term",
+        (file_id,),
+    )
+    conn.execute("DELETE FROM term_stats WHERE df <= 0")
+    conn.execute(
+        "UPDATE corpus SET docs = docs - d, tokens = tokens - t FROM ("
+        "  SELECT COUNT(*) AS d, COALESCE(SUM(doc_len), 0) AS t FROM entries"
+        "  WHERE file_id = ?"
+        ") WHERE id = 0",
+        (file_id,),
+    )
+    for table in ("entry_tags", "postings"):
+        conn.execute(
+            f"DELETE FROM {table} WHERE entry_id IN "
+            "(SELECT id FROM entries WHERE file_id = ?)",
+            (file_id,),
+        )
+    conn.execute("DELETE FROM entries WHERE file_id = ?", (file_id,))
+    conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+
+def _prepare_file(
+    file: Path, start: int, strict: bool
+) -> tuple[list[tuple[int, int, dict, list, object]], int, int, int]:
+    """Parse, tokenize and embed complete lines of ``file`` from byte ``start``.
+
+    Returns the rows ``(offset, length, record, postings, vector)``, the new
+    size and the numbers of lines read and skipped. Runs in a worker process
+    when indexing with several jobs.
+    """
+    timed = trace.active
+    # Seconds spent parsing, tokenizing and embedding.
+    spent = [0.0, 0.0, 0.0]
+    rows = []
+    lines = skipped = 0
+    end = start
+    with file.open("rb") as f:
+        f.seek(start)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                # A writer is still appending this line; pick it up next sync.
+                break
+            offset = end
+            end += len(raw)
+            if not raw.strip():
+                continue
+            lines += 1
+            if timed:
+                t0 = time.perf_counter()
+            try:
+                record = storage.parse_line(raw, strict)
+                ts_key(record["ts"])
+            except ValueError as e:
+                skipped += 1
+                print(f"Skipping invalid entry in {file}: {e}", file=sys.stderr)
+                continue
+            if timed:
+                t1 = time.perf_counter()
+                postings = search_mod.entry_postings(record)
+                t2 = time.perf_counter()
+                vector = vectors_mod.embed_entry(record)
+                t3 = time.perf_counter()
+                spent[0] += t1 - t0
+                spent[1] += t2 - t1
+                spent[2] += t3 - t2
+            else:
+                postings = search_mod.entry_postings(record)
+                vector = vectors_mod.embed_entry(record)
+            rows.append((offset, len(raw), record, postings, vector))
+    if timed:
+        for name, seconds in zip(("parse", "tokenize", "embed"), spent):
+            trace.add_time(name, seconds, lines)
+    return rows, end, lines, skipped
+
+
+def _store_file(
+    conn: sqlite3.Connection,
+    file_id: int,
+    start: int,
+    prepared: tuple[list[tuple[int, int, dict, list, object]], int, int, int],
+    pending: vectors_mod.PendingVectors,
+) -> None:
+    """Insert the rows returned by ``_prepare_file`` and record the new size."""
+    rows, end, lines, skipped = prepared
+    t0 = time.perf_counter()
+    # Counted per file so that each counter row is written once.
+    counts = stats_mod.new_counts()
+    for offset, length, record, postings, vector in rows:
+        entry_id = _insert_entry(conn, file_id, offset, length, record, postings)
+        pending.add_vector(entry_id, vector)
+        stats_mod.count_entry(counts, record)
+    _add_stats(conn, counts)
+    conn.execute("UPDATE files SET size = ? WHERE id = ?", (end, file_id))
+    trace.add_time("index_insert", time.perf_counter() - t0, len(rows))
+    trace.count("files_indexed")
+    trace.count("lines_read", lines)
+    trace.count("bytes_read", end - start)
+    trace.count("records_skipped", skipped)
+
+
+def sync_index(
+    conn: sqlite3.Connection,
+    entries_dir: Path,
+    force: bool = False,
+    changed: Iterable[Path] = (),
+    strict: bool = False,
+    jobs: int = 1,
+) -> None:
+    """Bring the index up to date with the entry files on disk.
+
+    Creating, removing or replacing an entry file changes the directory
+    stamp, so when it matches the recorded value the directory listing is
+    skipped. Otherwise every file is checked with ``stat``: a grown file only
+    has its new tail parsed, while a replaced, shrunk or otherwise modified
+    one is indexed again from the start. Given ``changed`` files, only those
+    are checked and the listing is left to a later call. With ``jobs`` above
+    1, files are parsed, tokenized and embedded on that many processes while
+    this one writes the rows.
+    """
+    with trace.phase("index_sync"):
+        _sync(conn, entries_dir, force, changed, strict, jobs)
+
+
+def _check_file(
+    conn: sqlite3.Connection,
+    file: Path,
+    rel: str,
+    known: tuple[int, int, int, int] | None,
+) -> tuple[Path, int, int] | None:
+    """Return ``(file, file_id, byte to index from)`` if ``file`` needs indexing.
+
+    ``known`` is the file's ``(id, size, ino, mtime_ns)`` row. Rows of files
+    that are gone or were rewritten are dropped.
+    """
+    try:
+        st = os.stat(file)
+    except FileNotFoundError:
+        if known is not None:
+            _drop_file(conn, known[0])
+        return None
+    if known is not None:
+        file_id, indexed, ino, mtime_ns = known
+        if st.st_ino == ino and st.st_size == indexed and st.st_mtime_ns == mtime_ns:
+            return None
+        conn.execute(
+            "UPDATE files SET ino = ?, mtime_ns = ? WHERE id = ?",
+            (st.st_ino, st.st_mtime_ns, file_id),
+        )
+        if st.st_ino == ino and st.st_size > indexed:
+            return file, file_id, indexed
+        _drop_file(conn, file_id)
+    file_id = conn.execute(
+        "INSERT INTO files (path, size, ino, mtime_ns) VALUES (?, 0, ?, ?)",
+        (rel, st.st_ino, st.st_mtime_ns),
+    ).lastrowid
+    return file, file_id, 0
+
+
+def _sync(
+    conn: sqlite3.Connection,
+    entries_dir: Path,
+    force: bool,
+    changed: Iterable[Path],
+    strict: bool,
+    jobs: int,
+) -> None:
+    if not entries_dir.exists():
+        return
+    changed_rel = {p.relative_to(entries_dir).as_posix() for p in changed}
+    listing = force or not changed_rel
+    if listing:
+        stamp = storage.directory_stamp(entries_dir)
+        if not force and _get_meta(conn, "entries_mtime") == stamp:
+            return
+    pending = vectors_mod.PendingVectors()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # (file, file_id, byte to index from)
+        work: list[tuple[Path, int, int]] = []
+        if not listing:
+            # Only the given files are checked. The stamp is left as it was, so
+            # files created by anyone else are still found by the next listing.
+            for rel in sorted(changed_rel):
+                row = conn.execute(
+                    "SELECT id, size, ino, mtime_ns FROM files WHERE path = ?", (rel,)
+                ).fetchone()
+                item = _check_file(conn, entries_dir / rel, rel, row)
+                if item is not None:
+                    work.append(item)
+        else:
+            known = {
+                row[1]: (row[0], *row[2:])
+                for row in conn.execute(
+                    "SELECT id, path, size, ino, mtime_ns FROM files"
+                )
+            }
+            for file in storage.iter_entry_files(entries_dir):
+                rel = file.relative_to(entries_dir).as_posix()
+                item = _check_file(conn, file, rel, known.pop(rel, None))
+                if item is not None:
+                    work.append(item)
+            for file_id, *_ in known.values():
+                _drop_file(conn, file_id)
+            _set_meta(conn, "entries_mtime", stamp)
+        tasks = [(file, start, strict) for file, _, start in work]
+        if jobs > 1 and len(tasks) > 1:
+            import memory_parallel
+
+            prepared = memory_parallel.imap(_prepare_file, tasks, jobs)
+        else:
+            prepared = (_prepare_file(*task) for task in tasks)
+        for (_, file_id, start), result in zip(work, prepared):
+            _store_file(conn, file_id, start, result, pending)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        pending.close()
+        raise
+    try:
+        pending.commit(index_path(entries_dir).parent)
+    finally:
+        pending.close()
+
+
+def update_index(entries_dir: Path, changed: Iterable[Path] = ()) -> None:
+    with _open(entries_dir) as conn:
+        sync_index(conn, entries_dir, changed=changed)
+
+
+def rebuild_index(entries_dir: Path, strict: bool = False, jobs: int = 1) -> int:
+    """Recreate the index from scratch and return the number of indexed entries."""
+    path = index_path(entries_dir)
+    _forget(path)
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    vectors_mod.remove_vectors(path.parent)
+    with _open(entries_dir) as conn:
+        sync_index(conn, entries_dir, force=True, strict=strict, jobs=jobs)
+        return conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+def _select_locations(
+    conn: sqlite3.Connection,
+    tags: list[str] | None,
+    since: str | None,
+    until: str | None,
+    search: str | None,
+    limit: int | None,
+    task_id: str | None = None,
+    words: bool = False,
+) -> sqlite3.Cursor:
+    where: list[str] = []
+    params: list = []
+    if task_id is not None:
+        # Served by the entries_task index.
+        where.append("e.task_id = ?")
+        params.append(task_id)
+    if since:
+        where.append("e.ts_key >= ?")
+        params.append(ts_key(since))
+    if until:
+        where.append("e.ts_key <= ?")
+        params.append(ts_key(until))
+    if tags:
+        where.append(
+            "e.id IN (SELECT entry_id FROM entry_tags WHERE tag IN (%s))"
+            % ", ".join("?" * len(tags))
+        )
+        params.extend(tags)
+    compiled = None
+    if search:
+        if words:
+            compiled = search_mod.compile_query(search)
+        else:
+            compiled = search_mod.compile_substring(search)
+    if compiled:
+        where.append(compiled[0])
+        params.extend(compiled[1])
+    sql = (
+        "SELECT f.path, e.offset, e.length FROM entries e "
+        "JOIN files f ON f.id = e.file_id"
+    )
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY e.ts_key DESC, e.id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params)
+
+
+def _locate(
+    conn: sqlite3.Connection, entry_id: int
+) -> tuple[str, int, int] | None:
+    return conn.execute(
+        "SELECT f.path, e.offset, e.length FROM entries e "
+        "JOIN files f ON f.id = e.file_id WHERE e.id = ?",
+        (entry_id,),
+    ).fetchone()
+
+
+def _read_located(
+    entries_dir: Path,
+    rows: list[tuple[str, int, int]],
+    strict: bool = False,
+    keep_failed: bool = False,
+) -> Iterator[dict | None]:
+    """Read the entries at ``rows`` in order, skipping any that fail to parse.
+
+    With ``keep_failed``, ``None`` is yielded in their place instead so that
+    callers can zip the entries with per-row data such as scores.
+    """
+    handles: dict[str, object] = {}
+    try:
+        for rel, offset, length in rows:
+            f = handles.get(rel)
+            if f is None:
+                f = handles[rel] = (entries_dir / rel).open("rb")
+                trace.count("files_opened")
+            f.seek(offset)
+            raw = f.read(length)
+            trace.count("bytes_read", length)
+            try:
+                if strict:
+                    entry = storage.parse_line(raw, strict=True)
+                else:
+                    entry = storage.loads_entry(raw)
+            except ValueError as e:
+                # Also reached when the file was rewritten behind the index's
+                # back; the next sync that sees the change reindexes it.
+                print(f"Skipping invalid entry in {rel}: {e}", file=sys.stderr)
+                if keep_failed:
+                    yield None
+                continue
+            yield entry
+    finally:
+        for f in handles.values():
+            f.close()
+
+
+def query_entries(
+    entries_dir: Path,
+    tags: list[str] | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    search: str | None = None,
+    last: int | None = None,
+    strict: bool = False,
+    task_id: str | None = None,
+    jobs: int = 1,
+    words: bool = False,
+) -> Iterator[dict]:
+    """Return matching entries newest first, resolved through the index.
+
+    ``search`` is a word query if ``words`` is true and a substring otherwise
+    (see ``memory_search``). Raises ``sqlite3.Error`` if the index cannot be
+    opened or updated so that callers can fall back to scanning the entry
+    files. ``jobs`` is passed on to ``sync_index``.
+    """
+    # Substring candidates are checked once read, so the limit applies after.
+    substring = search if search and not words else None
+    with _open(entries_dir) as conn:
+        sync_index(conn, entries_dir, jobs=jobs)
+        with trace.phase("index_select"):
+            cursor = _select_locations(
+                conn,
+                tags,
+                since,
+                until,
+                search,
+                None if substring else last,
+                task_id,
+                words,
+            )
+            rows = cursor.fetchall()
+        trace.count("index_rows", len(rows))
+    entries = _read_located(entries_dir, rows, strict)
+    if substring:
+        entries = (e for e in entries if search_mod.contains(e, substring))
+        if last is not None:
+            entries = islice(entries, last)
+    return entries
+
+
+def entry_stats(
+    entries_dir: Path,
+    since: str | None = None,
+    until: str | None = None,
+    tag: str | None = None,
+) -> dict:
+    """Return the tag, agent and co-occurrence totals of a range of days.
+
+    ``since`` and ``until`` are ``YYYY-MM-DD`` days and either may be None.
+    The totals have the shape of ``memory_stats.scan`` and are read from the
+    counters the index maintains. Raises ``sqlite3.Error`` like
+    ``query_entries``.
+    """
+    with _open(entries_dir) as conn:
+        sync_index(conn, entries_dir)
+        with trace.phase("index_select"):
+            where = "day >= ? AND day <= ?"
+            bounds = (since or "", until or "\uffff")
+            tags = dict(
+                conn.execute(
+                    f"SELECT tag, SUM(n) FROM tag_days WHERE {where} GROUP BY tag",
+                    bounds,
+                )
+            )
+            days: dict[str, dict[str, int]] = {}
+            for day, agent, n in conn.execute(
+                f"SELECT day, agent, n FROM agent_days WHERE {where}", bounds
+            ):
+                days.setdefault(day, {})[agent] = n
+            cooccurring = {}
+            if tag is not None:
+                cooccurring = dict(
+                    conn.execute(
+                        f"SELECT other, SUM(n) FROM tag_pairs WHERE tag = ? "
+                        f"AND {where} GROUP BY other",
+                        (tag, *bounds),
+                    )
+                )
+    return {"tags": tags, "days": days, "cooccurring": cooccurring}
+
+
+def recall_entries(
+    entries_dir: Path, question: str, top_k: int = 5
+) -> list[tuple[float, dict]]:
+    """Return the ``top_k`` entries most relevant to ``question`` by BM25.
+
+    Scores are computed from the precomputed postings, document lengths and
+    term document frequencies, so only the postings of the question's terms
+    and the winning entries are read.
+    """
+    with _open(entries_dir) as conn:
+        sync_index(conn, entries_dir)
+        doc_count, tokens = conn.execute(
+            "SELECT docs, tokens FROM corpus WHERE id = 0"
+        ).fetchone()
+        if not doc_count:
+            return []
+        avg_len = tokens / doc_count
+        scores: dict[int, float] = {}
+        for term in search_mod.question_terms(question):
+            row = conn.execute(
+                "SELECT df FROM term_stats WHERE term = ?", (term,)
+            ).fetchone()
+            if row is None:
+                continue
+            df = row[0]
+            for entry_id, tf, doc_len in conn.execute(
+                "SELECT p.entry_id, SUM(p.tf), e.doc_len FROM postings p "
+                "JOIN entries e ON e.id = p.entry_id "
+                "WHERE p.term = ? GROUP BY p.entry_id",
+                (term,),
+            ):
+                scores[entry_id] = scores.get(entry_id, 0.0) + search_mod.bm25(
+                    tf, df, doc_len, doc_count, avg_len
+                )
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        rows = []
+        for entry_id, _ in best:
+            rows.append(_locate(conn, entry_id))
+    entries = _read_located(entries_dir, rows, keep_failed=True)
+    return [
+        (score, entry)
+        for (_, score), entry in zip(best, entries)
+        if entry is not None
+    ]
+
+
+def similar_entries(
+    entries_dir: Path, text: str, top_k: int = 5
+) -> list[tuple[float, dict]]:
+    """Return the ``top_k`` entries whose embeddings are closest to ``text``."""
+    if top_k < 1:
+        return []
+    with _open(entries_dir) as conn:
+        sync_index(conn, entries_dir)
+        index_dir = index_path(entries_dir).parent
+        results = []
+        rows = []
+        # Rows of pruned entries stay in the matrix until the next reindex and
+        # are skipped here; the rest of the matrix is only sorted when the first
+        # candidates do not hold ``top_k`` live entries.
+        candidates = vectors_mod.iter_nearest(index_dir, text, 2 * top_k)
+        for score, entry_id in candidates:
+            row = _locate(conn, entry_id)
+            if row is None:
+                continue
+            results.append(score)
+            rows.append(row)
+            if len(rows) == top_k:
+                break
+    entries = _read_located(entries_dir, rows, keep_failed=True)
+    return [
+        (score, entry) for score, entry in zip(results, entries) if entry is not None
+    ]
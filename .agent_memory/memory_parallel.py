@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Parse entry files on several worker processes.
+
+Without an up-to-date index, loading entries means decoding and validating
+every line, which is CPU bound. ``iter_located`` splits the time-ordered file
+list into contiguous shards, lets worker processes parse, validate, filter
+and sort one shard each, and merges the sorted shards back into one stream.
+It yields the same records in the same order as
+``memory_storage.iter_located`` followed by the filter.
+
+Workers are started with the ``spawn`` method, which unlike ``fork`` is safe
+in processes that run threads, such as ``memory_async`` callers, but costs a
+fraction of a second per pool, so ``--jobs`` only pays off on large
+directories.
+"""
+from __future__ import annotations
+
+import heapq
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+import memory_storage as storage
+import memory_trace as trace
+import query_memory_entries as query_mod
+
+# Shards per worker; more and smaller shards even out uneven files.
+SHARDS_PER_JOB = 4
+# Results computed ahead of the consumer per worker.
+PREFETCH = 2
+
+
+class Filter(NamedTuple):
+    """Filters applied by the workers, as in ``query_memory_entries``."""
+
+    tags: list[str] | None = None
+    since: str | None = None
+    until: str | None = None
+    search: str | None = None
+    task_id: str | None = None
+    words: bool = False
+
+    def matches(self, entry: dict) -> bool:
+        return next(query_mod.filter_entries([entry], *self), None) is not None
+
+
+def resolve_jobs(jobs: int | None) -> int:
+    """Return the number of worker processes for ``--jobs``; 0 means one per CPU."""
+    if not jobs:
+        return os.cpu_count() or 1
+    return max(1, jobs)
+
+
+def imap(fn: Callable, items: Iterable[tuple], jobs: int) -> Iterator:
+    """Yield ``fn(*item)`` for each item in order, computed on ``jobs`` processes.
+
+    At most ``PREFETCH * jobs`` results are held ahead of the consumer, and
+    closing the iterator early cancels the work not yet started.
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(jobs, mp_context=context) as pool:
+        pending: deque[Future] = deque()
+        try:
+            for item in items:
+                pending.append(pool.submit(fn, *item))
+                if len(pending) >= PREFETCH * jobs:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _load_shard(
+    paths: list[Path], strict: bool, newest_first: bool, where: Filter | None
+) -> list[tuple[int, int, int, int, dict]]:
+    """Return ``(key, file, offset, length, record)`` rows of a shard, sorted.
+
+    ``file`` is the position of the record's file in ``paths``.
+    """
+    rows = []
+    for i, path in enumerate(paths):
+        for offset, length, record in storage.iter_file_records(path, strict):
+            if where is not None and not where.matches(record):
+                continue
+            try:
+                key = storage.timestamp_key(record["ts"])
+            except ValueError as e:
+                print(f"Skipping invalid entry in {path}: {e}", file=sys.stderr)
+                continue
+            rows.append((key, i, offset, length, record))
+    # Stable in both directions, so ties keep the order they were read in.
+    rows.sort(key=itemgetter(0), reverse=newest_first)
+    return rows
+
+
+def iter_located(
+    entries_dir: Path,
+    jobs: int,
+    strict: bool = False,
+    newest_first: bool = True,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    where: Filter | None = None,
+) -> Iterator[tuple[dict, Path, int, int]]:
+    """Yield ``(record, path, offset, length)`` of matching records in order.
+
+    With ``jobs`` of 1 this reads the files in-process.
+    """
+    if jobs <= 1:
+        for item in storage.iter_located(
+            entries_dir, strict, newest_first, since, until
+        ):
+            if where is None or where.matches(item[0]):
+                yield item
+        return
+    files = storage.ordered_files(entries_dir, newest_first, since, until)
+    if not files:
+        return
+    size = -(-len(files) // (jobs * SHARDS_PER_JOB))
+    shards = [files[i : i + size] for i in range(0, len(files), size)]
+    trace.count("shards", len(shards))
+    paths = [[path for _, _, path in shard] for shard in shards]
+    tasks = ((p, strict, newest_first, where) for p in paths)
+    sign = -1 if newest_first else 1
+    # One (sort key, shard, position, rows) item per shard with rows left.
+    heap: list = []
+
+    def pop() -> tuple[dict, Path, int, int]:
+        _, n, pos, rows = heap[0]
+        _, i, offset, length, record = rows[pos]
+        if pos + 1 < len(rows):
+            heapq.heapreplace(heap, (sign * rows[pos + 1][0], n, pos + 1, rows))
+        else:
+            heapq.heappop(heap)
+        return record, paths[n][i], offset, length
+
+    results = imap(_load_shard, tasks, jobs)
+    try:
+        for n, (shard, rows) in enumerate(zip(shards, results)):
+            # Shards come in the order of their first file's bound, so rows
+            # sorting before this shard's bound cannot be preceded by later ones.
+            bound = shard[0][1] if newest_first else shard[0][0]
+            while heap and heap[0][0] < sign * bound:
+                yield pop()
+            if rows:
+                heapq.heappush(heap, (sign * rows[0][0], n, 0, rows))
+        while heap:
+            yield pop()
+    finally:
+        results.close()
+
+
+def iter_records(
+    entries_dir: Path,
+    jobs: int,
+    strict: bool = False,
+    newest_first: bool = True,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    where: Filter | None = None,
+) -> Iterator[dict]:
+    located = iter_located(
+        entries_dir, jobs, strict, newest_first, since, until, where
+    )
+    for record, _, _, _ in located:
+        yield record
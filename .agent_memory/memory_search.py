@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Tokenizer, query language and BM25 ranking for memory entries.
+
+By default a search string matches entries whose context, observation or
+reflection contains it, ignoring case. The index narrows the candidates down
+to entries with terms containing each of its words, and ``contains`` decides.
+
+A word query (``query --words``) is a list of whitespace separated words that
+must all match. Words joined by ``OR`` match if any of them does. Each word
+may be restricted to one field with ``field:word`` and ends in ``*`` for
+prefix matching::
+
+    timeout retry*              both words, anywhere
+    context:parser OR bugfix    "parser" in the context, or "bugfix" anywhere
+
+Matching is on whole lowercase tokens. Unqualified words search the context,
+observation and reflection fields; ``tags:`` searches entry tags.
+
+``recall`` questions are free text: stopwords are dropped and the remaining
+words are scored with Okapi BM25 over all four fields.
+"""
+from __future__ import annotations
+
+import functools
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Iterable, NamedTuple
+
+FIELDS = ("context", "observation", "reflection", "tags")
+DEFAULT_FIELDS = (0, 1, 2)
+PREFIX_END = "\U0010ffff"
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Dropped from recall questions; they match most entries and carry no signal.
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from has have how i in is it of "
+    "on or that the this to was we were what when where which who why with".split()
+)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class Term(NamedTuple):
+    text: str
+    fields: tuple[int, ...]
+    prefix: bool
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def entry_fields(entry: dict) -> list[str]:
+    """Return the searchable text of ``entry`` in ``FIELDS`` order."""
+    return [
+        entry.get("context", ""),
+        entry.get("observation", ""),
+        entry.get("reflection", ""),
+        " ".join(entry.get("tags", [])),
+    ]
+
+
+def contains(entry: dict, text: str) -> bool:
+    """Return whether the text fields of ``entry`` contain ``text``, ignoring case."""
+    fields = entry_fields(entry)[: len(DEFAULT_FIELDS)]
+    return text.lower() in " ".join(fields).lower()
+
+
+def entry_postings(entry: dict) -> list[tuple[str, int, int]]:
+    """Return ``(term, field, frequency)`` triples for indexing ``entry``."""
+    postings = []
+    for field, text in enumerate(entry_fields(entry)):
+        for term, tf in Counter(tokenize(text)).items():
+            postings.append((term, field, tf))
+    return postings
+
+
+def _parse_word(word: str) -> list[Term]:
+    fields = DEFAULT_FIELDS
+    name, sep, rest = word.partition(":")
+    if sep and name.lower() in FIELDS:
+        fields = (FIELDS.index(name.lower()),)
+        word = rest
+    prefix = word.endswith("*")
+    tokens = tokenize(word)
+    # Only the last token of a word like ``error-hand*`` is a prefix.
+    return [
+        Term(token, fields, prefix and i == len(tokens) - 1)
+        for i, token in enumerate(tokens)
+    ]
+
+
+@functools.lru_cache(maxsize=256)
+def parse_query(search: str) -> tuple[tuple[tuple[Term, ...], ...], ...]:
+    """Parse ``search`` into AND-of-OR groups of term conjunctions."""
+    groups: list[list[tuple[Term, ...]]] = []
+    join_next = False
+    for word in search.split():
+        if word == "OR":
+            join_next = bool(groups)
+            continue
+        terms = tuple(_parse_word(word))
+        if not terms:
+            continue
+        if join_next:
+            groups[-1].append(terms)
+        else:
+            groups.append([terms])
+        join_next = False
+    return tuple(tuple(group) for group in groups)
+
+
+def _term_matches(term: Term, tokens_by_field: list[list[str]]) -> bool:
+    for field in term.fields:
+        tokens = tokens_by_field[field]
+        if term.prefix:
+            if any(token.startswith(term.text) for token in tokens):
+                return True
+        elif term.text in tokens:
+            return True
+    return False
+
+
+def matches(entry: dict, search: str) -> bool:
+    """Evaluate ``search`` against a single entry without using the index."""
+    query = parse_query(search)
+    if not query:
+        return True
+    tokens_by_field = [tokenize(text) for text in entry_fields(entry)]
+    return all(
+        any(all(_term_matches(t, tokens_by_field) for t in alt) for alt in group)
+        for group in query
+    )
+
+
+def _term_sql(term: Term) -> tuple[str, list]:
+    sql = "SELECT entry_id FROM postings WHERE "
+    if term.prefix:
+        sql += "term >= ? AND term < ?"
+        params: list = [term.text, term.text + PREFIX_END]
+    else:
+        sql += "term = ?"
+        params = [term.text]
+    sql += " AND field IN (%s)" % ", ".join("?" * len(term.fields))
+    params.extend(term.fields)
+    return sql, params
+
+
+def compile_query(search: str, column: str = "e.id") -> tuple[str, list] | None:
+    """Translate ``search`` into a SQL condition on ``column`` over ``postings``."""
+    query = parse_query(search)
+    if not query:
+        return None
+    group_sql = []
+    params: list = []
+    for group in query:
+        alternatives = []
+        for alt in group:
+            conditions = []
+            for term in alt:
+                sql, term_params = _term_sql(term)
+                conditions.append(f"{column} IN ({sql})")
+                params.extend(term_params)
+            alternatives.append("(" + " AND ".join(conditions) + ")")
+        group_sql.append("(" + " OR ".join(alternatives) + ")")
+    return " AND ".join(group_sql), params
+
+
+def compile_substring(text: str, column: str = "e.id") -> tuple[str, list] | None:
+    """Return a SQL condition on ``column`` met by every entry containing ``text``.
+
+    Some entries meeting it may not contain ``text``; check them with
+    ``contains``. Returns None if ``text`` has no words to look up.
+    """
+    lowered = text.lower()
+    conditions = []
+    params: list = []
+    fields = ", ".join(str(field) for field in DEFAULT_FIELDS)
+    for match in _TOKEN_RE.finditer(lowered):
+        token = match.group()
+        # A word with non-word characters on both sides is a whole term, one
+        # preceded by them starts a term and any other is part of a term.
+        bounded_left = match.start() > 0
+        bounded_right = match.end() < len(lowered)
+        if bounded_left and bounded_right:
+            terms = "?"
+            params.append(token)
+        elif bounded_left:
+            terms = "SELECT term FROM term_stats WHERE term >= ? AND term < ?"
+            params.extend([token, token + PREFIX_END])
+        else:
+            terms = "SELECT term FROM term_stats WHERE instr(term, ?) > 0"
+            params.append(token)
+        conditions.append(
+            f"{column} IN (SELECT entry_id FROM postings "
+            f"WHERE field IN ({fields}) AND term IN ({terms}))"
+        )
+    if not conditions:
+        return None
+    return " AND ".join(conditions), params
+
+
+def question_terms(question: str) -> list[str]:
+    terms = [t for t in dict.fromkeys(tokenize(question)) if t not in STOPWORDS]
+    return terms or list(dict.fromkeys(tokenize(question)))
+
+
+def bm25(tf: int, df: int, doc_len: int, doc_count: int, avg_len: float) -> float:
+    idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+    norm = 1 - BM25_B + BM25_B * doc_len / (avg_len or 1)
+    return idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+
+def rank(
+    entries: Iterable[dict], question: str, top_k: int
+) -> list[tuple[float, dict]]:
+    """Score ``entries`` against ``question`` with BM25 without using the index."""
+    terms = question_terms(question)
+    docs = []
+    df: Counter[str] = Counter()
+    total = 0
+    for entry in entries:
+        counts = Counter(tokenize(" ".join(entry_fields(entry))))
+        docs.append((entry, counts, sum(counts.values())))
+        df.update(t for t in terms if t in counts)
+        total += docs[-1][2]
+    if not docs:
+        return []
+    avg_len = total / len(docs)
+    scored = []
+    for entry, counts, length in docs:
+        score = sum(
+            bm25(counts[t], df[t], length, len(docs), avg_len)
+            for t in terms
+            if counts[t]
+        )
+        if score > 0:
+            scored.append((score, entry))
+    return heapq.nlargest(top_k, scored, key=lambda s: s[0])
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Tag, agent and day counters behind ``memory_cli.py stats``.
+
+Entries are counted per day: how often each tag occurs, how many entries
+each agent wrote and how often two tags occur on the same entry. The index
+keeps these counters next to its tables, adding an entry's counts when it
+is indexed and subtracting them when its file is pruned or removed, so a
+report costs one row per tag, agent or tag pair and day in the range rather
+than one per entry. ``scan`` computes the same counters from entries when
+the index is unavailable.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, NamedTuple
+
+
+class Counts(NamedTuple):
+    """Per-day counters keyed like the index tables."""
+
+    # (tag, day) -> entries with the tag
+    tags: Counter
+    # (agent, day) -> entries by the agent
+    agents: Counter
+    # (tag, other tag, day) -> entries with both; stored in both directions
+    pairs: Counter
+
+
+def new_counts() -> Counts:
+    return Counts(Counter(), Counter(), Counter())
+
+
+def day_of(ts: str) -> str:
+    """Return the ``YYYY-MM-DD`` day of an ISO timestamp, in its own offset."""
+    return datetime.fromisoformat(ts).date().isoformat()
+
+
+def count_entry(counts: Counts, entry: dict) -> None:
+    day = day_of(entry["ts"])
+    counts.agents[entry.get("agent") or "", day] += 1
+    tags = set(entry.get("tags", []))
+    for tag in tags:
+        counts.tags[tag, day] += 1
+        for other in tags:
+            if other != tag:
+                counts.pairs[tag, other, day] += 1
+
+
+def day_range(
+    since: str | None, until: str | None
+) -> tuple[str | None, str | None]:
+    """Return the first and last day touched by ``since`` and ``until``."""
+    return (day_of(since) if since else None, day_of(until) if until else None)
+
+
+def _in_range(day: str, since: str | None, until: str | None) -> bool:
+    return (since is None or day >= since) and (until is None or day <= until)
+
+
+def scan(
+    entries: Iterable[dict],
+    since: str | None = None,
+    until: str | None = None,
+    tag: str | None = None,
+) -> dict:
+    """Count ``entries`` on the days from ``since`` to ``until``.
+
+    Returns the same totals as ``memory_index.entry_stats``.
+    """
+    counts = new_counts()
+    for entry in entries:
+        if _in_range(day_of(entry["ts"]), since, until):
+            count_entry(counts, entry)
+    tags: Counter = Counter()
+    for (name, _), n in counts.tags.items():
+        tags[name] += n
+    days: dict[str, Counter] = {}
+    for (agent, day), n in counts.agents.items():
+        days.setdefault(day, Counter())[agent] += n
+    cooccurring: Counter = Counter()
+    for (name, other, _), n in counts.pairs.items():
+        if name == tag:
+            cooccurring[other] += n
+    return {"tags": tags, "days": days, "cooccurring": cooccurring}
+
+
+def _ranked(counts: dict[str, int], top: int | None) -> dict[str, int]:
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return dict(ranked[:top] if top else ranked)
+
+
+def report(
+    totals: dict,
+    since: str | None,
+    until: str | None,
+    tag: str | None = None,
+    top: int | None = None,
+) -> dict:
+    """Format ``scan`` or ``entry_stats`` totals, most frequent first.
+
+    ``top`` limits the tag and co-occurrence lists.
+    """
+    agents: Counter = Counter()
+    for per_agent in totals["days"].values():
+        agents.update(per_agent)
+    result = {
+        "since": since,
+        "until": until,
+        "entries": sum(agents.values()),
+        "tags": _ranked(totals["tags"], top),
+        "agents": _ranked(agents, None),
+        "days": {
+            day: _ranked(totals["days"][day], None) for day in sorted(totals["days"])
+        },
+    }
+    if tag is not None:
+        result["tag"] = tag
+        result["cooccurring"] = _ranked(totals["cooccurring"], top)
+    return result
@@ -0,0 +1,636 @@
+#!/usr/bin/env python3
+"""Storage layouts for agent memory entries.
+
+Three layouts are supported and can coexist in the same ``entries/`` directory:
+
+* ``files`` (the default): one ``<ts>.jsonl`` file per entry directly in
+  ``entries/``.
+* ``partitioned``: one ``<ts>.jsonl`` file per entry in a directory per day,
+  ``entries/YYYY/MM/DD/``, so that readers can skip whole days, months and
+  years outside a requested time range without listing them.
+* ``segments``: entries are appended to time-rolled segment files in
+  ``entries/segments/`` named after the period they cover, either a day
+  (``2025-05-26.jsonl``) or an ISO week (``2025-W22.jsonl``). Each segment has
+  an ``.idx`` sidecar holding the byte offset of every line as little-endian
+  unsigned 64-bit integers.
+
+The active layout is recorded in ``entries/layout.json``.
+
+Entries are validated against ``schema.json`` before they are written and are
+stored with a ``_chk`` marker holding the schema version and a CRC32 of the
+serialized record. Readers trust lines whose marker matches and only run the
+JSON schema validator on unmarked, legacy or tampered lines.
+"""
+from __future__ import annotations
+
+import fcntl
+import functools
+import heapq
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import memory_trace as trace
+
+SCHEMA_PATH = Path(__file__).resolve().parent / "schema.json"
+LAYOUT_FILE = "layout.json"
+CHECK_FIELD = "_chk"
+SEGMENTS_DIRNAME = "segments"
+PERIODS = ("daily", "weekly")
+
+_DAILY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_WEEKLY_RE = re.compile(r"^(\d{4})-W(\d{2})$")
+_YEAR_RE = re.compile(r"^\d{4}$")
+_MONTH_DAY_RE = re.compile(r"^\d{2}$")
+_CHECK_PREFIX = f', "{CHECK_FIELD}": "'
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class InvalidEntryError(ValueError):
+    """Raised when an entry line does not conform to ``schema.json``."""
+
+
+def resolve_entries_dir(memory_dir: Path) -> Path:
+    if memory_dir.name == "entries":
+        return memory_dir
+    entries_dir = memory_dir / "entries"
+    if entries_dir.exists():
+        return entries_dir
+    if any(memory_dir.glob("*.jsonl")):
+        return memory_dir
+    return entries_dir
+
+
+@functools.lru_cache(maxsize=None)
+def load_validator(schema_path: Path = SCHEMA_PATH):
+    """Return a compiled validator for ``schema_path``, built once per process."""
+    from jsonschema.validators import validator_for
+
+    with schema_path.open("r", encoding="utf-8") as f:
+        schema = json.load(f)
+    return validator_for(schema)(schema)
+
+
+def validate_entry(record: dict, schema_path: Path = SCHEMA_PATH) -> None:
+    """Raise ``InvalidEntryError`` if ``record`` does not match the schema."""
+    trace.count("records_validated")
+    with trace.phase("validate"):
+        validator = load_validator(schema_path)
+        valid = validator.is_valid(record)
+    if not valid:
+        from jsonschema.exceptions import best_match
+
+        raise InvalidEntryError(best_match(validator.iter_errors(record)).message)
+
+
+@functools.lru_cache(maxsize=None)
+def schema_version(schema_path: Path = SCHEMA_PATH) -> str:
+    return f"{zlib.crc32(schema_path.read_bytes()):08x}"
+
+
+def seal_entry(entry: dict, schema_path: Path = SCHEMA_PATH) -> str:
+    """Serialize an already validated entry with its ``_chk`` marker."""
+    body = json.dumps({k: v for k, v in entry.items() if k != CHECK_FIELD})
+    crc = zlib.crc32(body.encode("utf-8"))
+    marker = f"{schema_version(schema_path)}:{crc:08x}"
+    return f'{body[:-1]}{_CHECK_PREFIX}{marker}"}}\n'
+
+
+def _marker_matches(line: str, marker: str, schema_path: Path) -> bool:
+    cut = line.rfind(_CHECK_PREFIX)
+    if cut < 0:
+        return False
+    body = line[:cut] + "}"
+    crc = zlib.crc32(body.encode("utf-8"))
+    return marker == f"{schema_version(schema_path)}:{crc:08x}"
+
+
+def loads_entry(line: str | bytes) -> dict:
+    """Decode a line that is already known to be valid."""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("Entry is not a JSON object")
+    record.pop(CHECK_FIELD, None)
+    return record
+
+
+def parse_line(
+    line: str | bytes, strict: bool = False, schema_path: Path = SCHEMA_PATH
+) -> dict:
+    """Decode and, unless it carries a valid marker, validate one entry line.
+
+    Raises ``ValueError`` (``json.JSONDecodeError`` or ``InvalidEntryError``).
+    ``strict`` forces full schema validation of every line.
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise InvalidEntryError("entry is not a JSON object")
+    marker = record.pop(CHECK_FIELD, None)
+    if strict or marker is None:
+        validate_entry(record, schema_path)
+        return record
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    if not _marker_matches(line.rstrip("\n"), marker, schema_path):
+        validate_entry(record, schema_path)
+    return record
+
+
+def load_layout(entries_dir: Path) -> dict:
+    path = entries_dir / LAYOUT_FILE
+    if path.exists():
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"layout": "files"}
+
+
+def save_layout(entries_dir: Path, layout: dict) -> None:
+    entries_dir.mkdir(parents=True, exist_ok=True)
+    with (entries_dir / LAYOUT_FILE).open("w", encoding="utf-8") as f:
+        json.dump(layout, f, indent=2)
+
+
+def segment_name(ts: str, period: str) -> str:
+    dt = datetime.fromisoformat(ts)
+    if period == "weekly":
+        year, week, _ = dt.isocalendar()
+        return f"{year}-W{week:02d}.jsonl"
+    return f"{dt.date().isoformat()}.jsonl"
+
+
+def is_segment(path: Path) -> bool:
+    return path.parent.name == SEGMENTS_DIRNAME
+
+
+def partition_dir(entries_dir: Path, ts: str) -> Path:
+    dt = datetime.fromisoformat(ts)
+    return entries_dir / f"{dt.year:04d}" / f"{dt.month:02d}" / f"{dt.day:02d}"
+
+
+def _partition_day(path: Path) -> datetime | None:
+    parts = path.parent.parts[-3:]
+    if len(parts) != 3:
+        return None
+    year, month, day = parts
+    if not (
+        _YEAR_RE.match(year)
+        and _MONTH_DAY_RE.match(month)
+        and _MONTH_DAY_RE.match(day)
+    ):
+        return None
+    try:
+        return datetime(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def file_time_range(path: Path) -> tuple[datetime, datetime] | None:
+    """Return the time span an entry file covers according to its name."""
+    stem = path.stem
+    if is_segment(path):
+        if _DAILY_RE.match(stem):
+            start = datetime.fromisoformat(stem)
+            return start, start + timedelta(days=1) - timedelta(microseconds=1)
+        m = _WEEKLY_RE.match(stem)
+        if m:
+            start = datetime.fromisocalendar(int(m.group(1)), int(m.group(2)), 1)
+            return start, start + timedelta(days=7) - timedelta(microseconds=1)
+        return None
+    try:
+        ts = datetime.fromisoformat(stem)
+    except ValueError:
+        day = _partition_day(path)
+        if day is None:
+            return None
+        return day, day + timedelta(days=1) - timedelta(microseconds=1)
+    return ts, ts
+
+
+def _children(path: Path, pattern: re.Pattern) -> list[tuple[int, Path]]:
+    try:
+        names = os.listdir(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+    return sorted((int(n), path / n) for n in names if pattern.match(n))
+
+
+def iter_partitions(
+    entries_dir: Path,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> Iterator[Path]:
+    """Yield day partition directories, skipping those outside the range."""
+    lo = since.date() if since else None
+    hi = until.date() if until else None
+    for year, year_dir in _children(entries_dir, _YEAR_RE):
+        if (lo and year < lo.year) or (hi and year > hi.year):
+            continue
+        for month, month_dir in _children(year_dir, _MONTH_DAY_RE):
+            if (lo and (year, month) < (lo.year, lo.month)) or (
+                hi and (year, month) > (hi.year, hi.month)
+            ):
+                continue
+            for day, day_dir in _children(month_dir, _MONTH_DAY_RE):
+                key = (year, month, day)
+                if (lo and key < (lo.year, lo.month, lo.day)) or (
+                    hi and key > (hi.year, hi.month, hi.day)
+                ):
+                    continue
+                yield day_dir
+
+
+def iter_entry_files(
+    entries_dir: Path,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[Path]:
+    """Return every entry file in ``entries_dir`` across all layouts.
+
+    With ``since``/``until``, files whose names show they hold no entries in
+    that range are left out, and partitions outside it are not listed at all.
+    """
+    with trace.phase("list_files"):
+        files = sorted(entries_dir.glob("*.jsonl"))
+        segments_dir = entries_dir / SEGMENTS_DIRNAME
+        if segments_dir.is_dir():
+            files.extend(sorted(segments_dir.glob("*.jsonl")))
+        for day_dir in iter_partitions(entries_dir, since, until):
+            files.extend(sorted(day_dir.glob("*.jsonl")))
+    trace.count("files_listed", len(files))
+    if since is None and until is None:
+        return files
+    selected = []
+    for path in files:
+        span = file_time_range(path)
+        if span is not None and (
+            (since is not None and span[1] < since)
+            or (until is not None and span[0] > until)
+        ):
+            continue
+        selected.append(path)
+    return selected
+
+
+def directory_stamp(entries_dir: Path) -> str:
+    """Return a value that changes whenever an entry file is created or removed."""
+    parts = [str(entries_dir.stat().st_mtime_ns)]
+    segments_dir = entries_dir / SEGMENTS_DIRNAME
+    if segments_dir.is_dir():
+        parts.append(str(segments_dir.stat().st_mtime_ns))
+    # Files are added to day partitions, which leaves the mtimes of the
+    # directories above them unchanged.
+    partitions = []
+    for _, year_dir in _children(entries_dir, _YEAR_RE):
+        for _, month_dir in _children(year_dir, _MONTH_DAY_RE):
+            partitions.append(month_dir.stat().st_mtime_ns)
+            for _, day_dir in _children(month_dir, _MONTH_DAY_RE):
+                partitions.append(day_dir.stat().st_mtime_ns)
+    if partitions:
+        digest = zlib.crc32(array("q", partitions).tobytes())
+        parts.append(f"{len(partitions)}-{digest:08x}")
+    return ":".join(parts)
+
+
+def offsets_path(segment: Path) -> Path:
+    return segment.with_suffix(".idx")
+
+
+def read_offsets(segment: Path) -> array:
+    offsets = array("Q")
+    path = offsets_path(segment)
+    if path.exists():
+        offsets.frombytes(path.read_bytes())
+        if sys.byteorder != "little":
+            offsets.byteswap()
+    return offsets
+
+
+def _micros(dt: datetime) -> int:
+    return (dt.replace(tzinfo=None) - _EPOCH) // _MICROSECOND
+
+
+def timestamp_key(ts: str) -> int:
+    """Return an entry timestamp as microseconds since the epoch, for sorting."""
+    return _micros(datetime.fromisoformat(ts))
+
+
+def iter_file_records(
+    path: Path, strict: bool = False
+) -> Iterator[tuple[int, int, dict]]:
+    """Yield ``(offset, length, record)`` for each valid line of ``path``."""
+    timed = trace.active
+    offset = lines = skipped = 0
+    parse_time = 0.0
+    try:
+        with path.open("rb") as f:
+            for raw in f:
+                start = offset
+                offset += len(raw)
+                if not raw.strip():
+                    continue
+                lines += 1
+                try:
+                    if timed:
+                        t0 = time.perf_counter()
+                        record = parse_line(raw, strict)
+                        parse_time += time.perf_counter() - t0
+                    else:
+                        record = parse_line(raw, strict)
+                except ValueError as e:
+                    skipped += 1
+                    print(f"Skipping invalid entry in {path}: {e}", file=sys.stderr)
+                    continue
+                yield start, len(raw), record
+    finally:
+        if timed:
+            trace.add_time("parse", parse_time, lines)
+            trace.count("files_opened")
+            trace.count("lines_read", lines)
+            trace.count("bytes_read", offset)
+            trace.count("records_skipped", skipped)
+
+
+def file_bounds(path: Path) -> tuple[float, float]:
+    """Return the bounds of the timestamps in ``path`` in microseconds.
+
+    They come from the span encoded in the file name and are infinite for
+    files without one.
+    """
+    span = file_time_range(path)
+    if span is None:
+        return float("-inf"), float("inf")
+    return _micros(span[0]), _micros(span[1])
+
+
+def ordered_files(
+    entries_dir: Path,
+    newest_first: bool = True,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[tuple[float, float, Path]]:
+    """Return ``(lo, hi, path)`` for entry files in the order they are read.
+
+    ``lo`` and ``hi`` are the ``file_bounds`` of the file.
+    """
+    paths = iter_entry_files(entries_dir, since, until)
+    files = [(*file_bounds(path), path) for path in paths]
+    if newest_first:
+        files.sort(key=lambda f: f[1], reverse=True)
+    else:
+        files.sort(key=lambda f: f[0])
+    return files
+
+
+def iter_located(
+    entries_dir: Path,
+    strict: bool = False,
+    newest_first: bool = True,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> Iterator[tuple[dict, Path, int, int]]:
+    """Lazily yield ``(record, path, offset, length)`` in timestamp order.
+
+    Files are opened in the order given by the time span encoded in their
+    names, and an entry is released as soon as no unopened file can contain a
+    record that sorts before it. Stopping early therefore avoids reading the
+    rest of the history. ``since``/``until`` skip files that cannot hold
+    entries in that range; records are not filtered individually.
+    """
+    files = ordered_files(entries_dir, newest_first, since, until)
+    heap: list = []
+    seq = 0
+    timed = trace.active
+    ts_time = 0.0
+    try:
+        for lo, hi, path in files:
+            if newest_first:
+                while heap and -heap[0][0] > hi:
+                    yield heapq.heappop(heap)[2]
+            else:
+                while heap and heap[0][0] < lo:
+                    yield heapq.heappop(heap)[2]
+            for offset, length, record in iter_file_records(path, strict):
+                if timed:
+                    t0 = time.perf_counter()
+                try:
+                    key = timestamp_key(record["ts"])
+                except ValueError as e:
+                    print(f"Skipping invalid entry in {path}: {e}", file=sys.stderr)
+                    continue
+                item = (record, path, offset, length)
+                heapq.heappush(heap, (-key if newest_first else key, seq, item))
+                if timed:
+                    ts_time += time.perf_counter() - t0
+                seq += 1
+        while heap:
+            yield heapq.heappop(heap)[2]
+    finally:
+        if timed:
+            trace.add_time("order", ts_time, seq)
+
+
+def iter_records(
+    entries_dir: Path,
+    strict: bool = False,
+    newest_first: bool = True,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> Iterator[dict]:
+    located = iter_located(entries_dir, strict, newest_first, since, until)
+    for record, _, _, _ in located:
+        yield record
+
+
+def _open_locked(path: Path, mode: str):
+    """Open ``path`` and take its append lock.
+
+    ``rewrite_entry_file`` replaces files while holding the lock, so the lock
+    is retaken until it is held on the file currently at ``path``.
+    """
+    while True:
+        f = path.open(mode)
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                return f
+        except FileNotFoundError:
+            pass
+        f.close()
+
+
+def _append_lines(path: Path, lines: list[str], fsync: bool = False) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _open_locked(path, "ab") as f:
+        try:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            offsets = array("Q")
+            chunks = []
+            for line in lines:
+                data = line.encode("utf-8")
+                offsets.append(offset)
+                offset += len(data)
+                chunks.append(data)
+            f.write(b"".join(chunks))
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+            if is_segment(path):
+                if sys.byteorder != "little":
+                    offsets.byteswap()
+                with offsets_path(path).open("ab") as idx:
+                    idx.write(offsets.tobytes())
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def append_entries(
+    entries_dir: Path,
+    entries: Iterable[dict],
+    schema_path: Path = SCHEMA_PATH,
+    period: str | None = None,
+    fsync: bool = False,
+) -> list[Path]:
+    """Persist validated entries according to the directory layout.
+
+    ``period`` writes to segments of that period whatever the layout. Each
+    file is written with a single append. Returns the files that were written
+    so indexes can be updated.
+    """
+    layout = load_layout(entries_dir)
+    if period is None and layout["layout"] == "segments":
+        period = layout.get("period", "daily")
+    grouped: dict[Path, list[str]] = {}
+    for entry in entries:
+        if period is not None:
+            name = segment_name(entry["ts"], period)
+            path = entries_dir / SEGMENTS_DIRNAME / name
+        elif layout["layout"] == "partitioned":
+            path = partition_dir(entries_dir, entry["ts"]) / f"{entry['ts']}.jsonl"
+        else:
+            path = entries_dir / f"{entry['ts']}.jsonl"
+        grouped.setdefault(path, []).append(seal_entry(entry, schema_path))
+    for path, lines in grouped.items():
+        _append_lines(path, lines, fsync)
+    return list(grouped)
+
+
+def rewrite_entry_file(path: Path, drop: Iterable[tuple[int, int]]) -> int:
+    """Remove the lines starting at the ``(offset, length)`` pairs of ``drop``.
+
+    The remaining lines, including any appended since the offsets were read,
+    are written to a temporary file that replaces ``path`` while the append
+    lock is held. A segment's offsets sidecar is rebuilt to match. Returns the
+    number of bytes reclaimed.
+    """
+    skip = dict(drop)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with _open_locked(path, "rb") as f:
+        try:
+            offsets = array("Q")
+            offset = 0
+            with tmp.open("wb") as out:
+                for raw in f:
+                    start = offset
+                    offset += len(raw)
+                    if skip.get(start) == len(raw):
+                        continue
+                    if raw.strip():
+                        offsets.append(out.tell())
+                    out.write(raw)
+                out.flush()
+                os.fsync(out.fileno())
+                kept = out.tell()
+            os.replace(tmp, path)
+            if is_segment(path):
+                if sys.byteorder != "little":
+                    offsets.byteswap()
+                idx_tmp = offsets_path(tmp)
+                idx_tmp.write_bytes(offsets.tobytes())
+                os.replace(idx_tmp, offsets_path(path))
+        finally:
+            tmp.unlink(missing_ok=True)
+            fcntl.flock(f, fcntl.LOCK_UN)
+    return offset - kept
+
+
+def remove_entry_file(path: Path) -> None:
+    path.unlink(missing_ok=True)
+    if is_segment(path):
+        offsets_path(path).unlink(missing_ok=True)
+    elif _partition_day(path) is not None:
+        # Drop the day, month and year directories once they are empty.
+        parent = path.parent
+        for _ in range(3):
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+
+
+def partition(entries_dir: Path) -> int:
+    """Move per-entry files into day partitions and switch the layout.
+
+    Segments stay where they are. Returns the number of files moved.
+    """
+    moved = 0
+    for file in sorted(entries_dir.glob("*.jsonl")):
+        try:
+            target = partition_dir(entries_dir, file.stem)
+        except ValueError:
+            print(f"Leaving {file} in place: name is not a timestamp", file=sys.stderr)
+            continue
+        target.mkdir(parents=True, exist_ok=True)
+        os.replace(file, target / file.name)
+        moved += 1
+    save_layout(entries_dir, {"layout": "partitioned"})
+    return moved
+
+
+def compact(entries_dir: Path, period: str = "daily") -> tuple[int, int, int]:
+    """Move per-entry files into segments and switch the layout to segments.
+
+    Returns ``(entries, files, segments)`` counts. Files containing lines that
+    cannot be parsed are left in place.
+    """
+    grouped: dict[str, list[tuple[str, str]]] = {}
+    migrated: list[Path] = []
+    per_entry = [f for f in iter_entry_files(entries_dir) if not is_segment(f)]
+    for file in per_entry:
+        records: list[tuple[str, str, str]] = []
+        with file.open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    ts = json.loads(line)["ts"]
+                    name = segment_name(ts, period)
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                    print(f"Leaving {file} in place: {e}", file=sys.stderr)
+                    break
+                records.append((name, ts, line.rstrip("\n") + "\n"))
+            else:
+                for name, ts, line in records:
+                    grouped.setdefault(name, []).append((ts, line))
+                migrated.append(file)
+    for name, records in grouped.items():
+        records.sort(key=lambda r: r[0])
+        _append_lines(
+            entries_dir / SEGMENTS_DIRNAME / name,
+            [line for _, line in records],
+            fsync=True,
+        )
+    save_layout(entries_dir, {"layout": "segments", "period": period})
+    for file in migrated:
+        remove_entry_file(file)
+    count = sum(len(records) for records in grouped.values())
+    return count, len(migrated), len(grouped)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""In-process library API over a memory directory.
+
+``MemoryStore`` reads entries, tasks and notes once and then keeps them in
+memory, so an agent running in the same process can query them repeatedly
+without re-parsing files::
+
+    store = MemoryStore(".agent_memory")
+    store.add("parser", "timeout on large files", "stream the input", ["perf"])
+    recent = store.query(tags=["perf"], last=5)
+
+Writes go through the same functions as the CLI and are visible to other
+processes straight away. Changes made by other processes are picked up by
+polling at most every ``poll_interval`` seconds: the directory stamp shows
+created, removed and replaced entry files, segments are re-checked by size and
+inode and only their new lines are read, and task and note logs are replayed
+from the last offset seen.
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterable
+
+import add_memory_entry as add_mod
+import manage_notes
+import manage_tasks
+import memory_search as search_mod
+import memory_storage as storage
+import op_log
+import prune_memory_entries as prune_mod
+import summarize_memory_entries as summary_mod
+from atomic_files import locked
+
+logger = logging.getLogger(__name__)
+
+def _stat(path: Path) -> tuple[int, int, int] | None:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class _LogCache:
+    """A task or note list kept current by replaying new log lines."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.items: list[dict] = []
+        self._snapshot: tuple[int, int, int] | None = None
+        self._offset = 0
+        self._loaded = False
+
+    def _reload(self) -> None:
+        items: list[dict] = []
+        self._snapshot = _stat(self.path)
+        if self._snapshot is not None:
+            try:
+                with self.path.open("r", encoding="utf-8") as f:
+                    items = json.load(f)
+            except json.JSONDecodeError:
+                logger.warning(
+                    "Failed to decode JSON from %s; returning empty list.", self.path
+                )
+        self.items = items
+        self._offset = op_log.replay_from(items, self.path)
+        self._loaded = True
+
+    def sync(self) -> list[dict]:
+        with locked(self.path, shared=True):
+            log = _stat(op_log.log_path(self.path))
+            size = log[2] if log else 0
+            if not self._loaded or _stat(self.path) != self._snapshot:
+                self._reload()
+            elif size < self._offset:
+                self._reload()
+            elif size > self._offset:
+                self._offset = op_log.replay_from(self.items, self.path, self._offset)
+        return self.items
+
+
+class MemoryStore:
+    """Cached access to the entries, tasks and notes of one memory directory.
+
+    Methods are safe to call from several threads. Returned entries, tasks
+    and notes are shared with the cache and must not be modified.
+    """
+
+    def __init__(self, memory_dir: Path | str, poll_interval: float = 1.0) -> None:
+        self.memory_dir = Path(memory_dir)
+        self.entries_dir = storage.resolve_entries_dir(self.memory_dir)
+        self.schema_path = self.memory_dir / "schema.json"
+        if not self.schema_path.exists():
+            self.schema_path = storage.SCHEMA_PATH
+        self.poll_interval = poll_interval
+        self._lock = threading.RLock()
+        self._checked = float("-inf")
+        self._stamp: str | None = None
+        # path -> (inode, bytes consumed, whole file consumed, [(key, entry)])
+        self._files: dict[Path, tuple[int, int, bool, list[tuple[int, dict]]]] = {}
+        self._keys: list[int] = []
+        self._entries: list[dict] = []
+        self._tasks = _LogCache(self.memory_dir / "tasks.json")
+        self._notes = _LogCache(self.memory_dir / "notes.json")
+
+    # Entries
+
+    def _read(self, path: Path) -> tuple[list[tuple[int, dict]], bool]:
+        """Read the new lines of ``path``; return them and whether to rebuild."""
+        ino, consumed, _, records = self._files.get(path, (None, 0, False, []))
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self._files.pop(path, None)
+            return [], True
+        size = st.st_size
+        # A different inode means the file was replaced, e.g. by prune.
+        rebuild = ino not in (None, st.st_ino) or size < consumed
+        if rebuild:
+            consumed, records = 0, []
+        elif size == consumed:
+            self._files[path] = (st.st_ino, consumed, True, records)
+            return [], False
+        added = []
+        end = consumed
+        with path.open("rb") as f:
+            f.seek(consumed)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                end += len(raw)
+                if not raw.strip():
+                    continue
+                try:
+                    entry = storage.parse_line(raw, schema_path=self.schema_path)
+                    added.append((storage.timestamp_key(entry["ts"]), entry))
+                except ValueError as e:
+                    print(f"Skipping invalid entry in {path}: {e}", file=sys.stderr)
+        records.extend(added)
+        self._files[path] = (st.st_ino, end, end == size, records)
+        return added, rebuild
+
+    def _sync_entries(self) -> None:
+        if not self.entries_dir.exists():
+            return
+        stamp = storage.directory_stamp(self.entries_dir)
+        listed = stamp != self._stamp
+        if listed:
+            self._stamp = stamp
+            current = storage.iter_entry_files(self.entries_dir)
+            rebuild = bool(self._files.keys() - set(current))
+            for path in self._files.keys() - set(current):
+                del self._files[path]
+        else:
+            current = list(self._files)
+            rebuild = False
+        added = []
+        for path in current:
+            known = self._files.get(path)
+            # Per-entry files are only replaced once fully written, and
+            # replacing a file changes the stamp.
+            if known and known[2] and not listed and not storage.is_segment(path):
+                continue
+            new, changed = self._read(path)
+            added.extend(new)
+            rebuild = rebuild or changed
+        added.sort(key=lambda r: r[0])
+        if not rebuild and added and self._keys and added[0][0] < self._keys[-1]:
+            # Entries older than the newest cached one; inserting many of
+            # them one by one would be quadratic.
+            rebuild = len(added) > 64
+            if not rebuild:
+                for key, entry in added:
+                    i = bisect.bisect_right(self._keys, key)
+                    self._keys.insert(i, key)
+                    self._entries.insert(i, entry)
+                return
+        if rebuild:
+            merged = [r for *_, records in self._files.values() for r in records]
+            merged.sort(key=lambda r: r[0])
+            self._keys = [key for key, _ in merged]
+            self._entries = [entry for _, entry in merged]
+            return
+        self._keys.extend(key for key, _ in added)
+        self._entries.extend(entry for _, entry in added)
+
+    def refresh(self, force: bool = False) -> None:
+        """Pick up changes on disk if ``poll_interval`` has passed, or now."""
+        with self._lock:
+            now = time.monotonic()
+            if force or now - self._checked >= self.poll_interval:
+                self._sync_entries()
+                self._checked = now
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._entries)
+
+    def _range(self, since: str | None, until: str | None) -> tuple[int, int]:
+        key = storage.timestamp_key
+        lo = bisect.bisect_left(self._keys, key(since)) if since else 0
+        hi = bisect.bisect_right(self._keys, key(until)) if until else len(self._keys)
+        return lo, hi
+
+    def query(
+        self,
+        tags: list[str] | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        search: str | None = None,
+        last: int | None = None,
+        task_id: str | None = None,
+        words: bool = False,
+    ) -> list[dict]:
+        """Return matching entries newest first, like ``memory_cli.py query``.
+
+        ``search`` is a word query if ``words`` is true and a substring
+        otherwise, as with ``--words``.
+        """
+        self.refresh()
+        with self._lock:
+            lo, hi = self._range(since, until)
+            wanted = set(tags) if tags else None
+            matches = search_mod.matches if words else search_mod.contains
+            result = []
+            for i in range(hi - 1, lo - 1, -1):
+                if last is not None and len(result) >= last:
+                    break
+                entry = self._entries[i]
+                if task_id is not None and entry.get("task_id") != task_id:
+                    continue
+                if wanted and wanted.isdisjoint(entry.get("tags", [])):
+                    continue
+                if search and not matches(entry, search):
+                    continue
+                result.append(entry)
+            return result
+
+    def summarize(self, since: str, until: str) -> dict:
+        """Return the same summary as ``memory_cli.py summarize``."""
+        self.refresh()
+        with self._lock:
+            lo, hi = self._range(since, until)
+            return summary_mod.summarize(self._entries[lo:hi], since, until)
+
+    def add(
+        self,
+        context: str,
+        observation: str,
+        reflection: str,
+        tags: Iterable[str] = (),
+        task_id: str | None = None,
+    ) -> dict:
+        """Validate and append one entry; return it."""
+        entry = add_mod.build_entry(
+            context, observation, reflection, list(tags), task_id
+        )
+        self.add_entries([entry])
+        return entry
+
+    def add_entries(self, entries: list[dict]) -> None:
+        """Validate and append complete entries with a single write per file."""
+        validator = storage.load_validator(self.schema_path)
+        for entry in entries:
+            validator.validate(entry)
+        with self._lock:
+            self.entries_dir.mkdir(parents=True, exist_ok=True)
+            add_mod.write_entries(self.entries_dir, entries, self.schema_path)
+            self.refresh(force=True)
+
+    def prune(
+        self, policy: prune_mod.RetentionPolicy, dry_run: bool = False
+    ) -> prune_mod.PrunePlan:
+        """Apply a retention policy like ``memory_cli.py prune``."""
+        with self._lock:
+            plan = prune_mod.plan_retention(self.entries_dir, policy)
+            if dry_run or not plan.entries:
+                return plan
+            prune_mod.apply_plan(plan, self.entries_dir)
+            for path in plan.rewrite:
+                self._files.pop(path, None)
+            self._stamp = None
+            self.refresh(force=True)
+            return plan
+
+    # Tasks and notes
+
+    def tasks(self, limit: int | None = None) -> list[dict]:
+        """Return the ``limit`` most recently added tasks, or all."""
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit must not be negative, got {limit}")
+        with self._lock:
+            tasks = self._tasks.sync()
+            return tasks[-limit:] if limit else list(tasks)
+
+    def task(self, task_id: str) -> dict | None:
+        with self._lock:
+            return next((t for t in self._tasks.sync() if t["id"] == task_id), None)
+
+    def add_task(self, description: str) -> dict:
+        return manage_tasks.add_task(description, task_file=self._tasks.path)
+
+    def update_task(
+        self,
+        task_id: str,
+        status: str | None = None,
+        description: str | None = None,
+    ) -> bool:
+        return manage_tasks.update_task(
+            task_id, status, description, task_file=self._tasks.path
+        )
+
+    def remove_task(self, task_id: str) -> bool:
+        return manage_tasks.remove_task(task_id, task_file=self._tasks.path)
+
+    def notes(self, limit: int | None = None) -> list[dict]:
+        """Return the ``limit`` most recently added notes, or all."""
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit must not be negative, got {limit}")
+        with self._lock:
+            notes = self._notes.sync()
+            return notes[-limit:] if limit else list(notes)
+
+    def add_note(self, content: str) -> dict:
+        return manage_notes.add_note(content, note_file=self._notes.path)
+
+    def remove_note(self, note_id: str) -> bool:
+        return manage_notes.remove_note(note_id, note_file=self._notes.path)
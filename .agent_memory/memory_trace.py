@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Opt-in timings and counters for CLI commands.
+
+Instrumented code calls ``phase``, ``add_time`` and ``count``, which do
+nothing unless ``traced`` is running, so the cost of an untraced call is one
+attribute check. Phase times are inclusive: a phase that runs inside another
+counts towards both. Time spent in a generator phase such as ``parse`` is
+only the time inside the generator, not in the code consuming it.
+
+A trace is one JSON object per command::
+
+    {"command": "query", "total_ms": 12.5,
+     "phases": {"list_files": {"ms": 0.4, "calls": 1}, ...},
+     "counters": {"files_opened": 3, "lines_read": 120, ...}}
+
+Set ``AGENT_MEMORY_TRACE=1`` (or ``stderr``) to write it to stderr, or to a
+file path to append one line per command to that file.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+TRACE_ENV = "AGENT_MEMORY_TRACE"
+STDERR = "stderr"
+
+active = False
+_phases: dict[str, list[float]] = {}
+_counters: dict[str, int] = {}
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        add_time(self.name, time.perf_counter() - self.start)
+
+
+_NULL = contextlib.nullcontext()
+
+
+def phase(name: str):
+    """Return a context manager timing its block as phase ``name``."""
+    return _Phase(name) if active else _NULL
+
+
+def add_time(name: str, seconds: float, calls: int = 1) -> None:
+    if not active:
+        return
+    entry = _phases.setdefault(name, [0.0, 0])
+    entry[0] += seconds
+    entry[1] += calls
+
+
+def count(name: str, n: int = 1) -> None:
+    if active:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def destination(profile: bool = False) -> str | None:
+    """Return where traces go: ``STDERR``, a file path, or ``None`` for off."""
+    value = os.environ.get(TRACE_ENV, "")
+    if value.lower() in ("", "0", "false", "no"):
+        return STDERR if profile else None
+    if value.lower() in ("1", "true", "yes", STDERR):
+        return STDERR
+    return value
+
+
+def _emit(report: dict, target: str) -> None:
+    line = json.dumps(report)
+    if target == STDERR:
+        print(line, file=sys.stderr)
+        return
+    with open(target, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+@contextlib.contextmanager
+def traced(
+    command: str, target: str, profile_path: Path | None = None
+) -> Iterator[None]:
+    """Record phases and counters of the block and emit them to ``target``.
+
+    With ``profile_path`` the block also runs under ``cProfile`` and the
+    statistics are written there for ``pstats`` or ``snakeviz``.
+    """
+    global active
+    _phases.clear()
+    _counters.clear()
+    profiler = None
+    if profile_path is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    active = True
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        total = time.perf_counter() - start
+        active = False
+        report = {
+            "command": command,
+            "total_ms": round(total * 1000, 3),
+            "phases": {
+                name: {"ms": round(seconds * 1000, 3), "calls": calls}
+                for name, (seconds, calls) in sorted(_phases.items())
+            },
+            "counters": dict(sorted(_counters.items())),
+        }
+        if profiler is not None:
+            profiler.dump_stats(str(profile_path))
+            report["profile"] = str(profile_path)
+        _emit(report, target)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Offline embedding similarity search over memory entries.
+
+Entries are embedded locally with signed feature hashing of word unigrams,
+word bigrams and character trigrams into a fixed number of dimensions, then
+L2-normalized, so no model download or network access is needed. Vectors are
+appended to ``index/vectors.f32`` (a row-major float32 matrix) with the
+matching index entry IDs in ``index/vectors.ids`` (int64), and searched by
+brute-force cosine similarity over a memory map of the matrix.
+
+NumPy is used when installed, imported on the first search; otherwise a pure
+Python fallback computes the same scores much more slowly.
+"""
+from __future__ import annotations
+
+import fcntl
+import functools
+import heapq
+import math
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+from array import array
+from pathlib import Path
+from itertools import islice
+from typing import Iterable, Iterator
+
+from memory_search import entry_fields, tokenize
+
+DIM = 256
+VECTORS_FILENAME = "vectors.f32"
+IDS_FILENAME = "vectors.ids"
+_ROW_BYTES = DIM * 4
+
+
+def _features(text: str) -> Iterable[str]:
+    tokens = tokenize(text)
+    for token in tokens:
+        yield "w:" + token
+        padded = f"<{token}>"
+        for i in range(len(padded) - 2):
+            yield "c:" + padded[i : i + 3]
+    for first, second in zip(tokens, tokens[1:]):
+        yield f"b:{first} {second}"
+
+
+def embed(text: str) -> array:
+    vec = array("f", bytes(_ROW_BYTES))
+    for feature in _features(text):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vec[h % DIM] += 1.0 if h & 0x80000000 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec))
+    if norm:
+        for i, v in enumerate(vec):
+            vec[i] = v / norm
+    return vec
+
+
+def embed_entry(entry: dict) -> array:
+    return embed(" ".join(entry_fields(entry)))
+
+
+def _paths(index_dir: Path) -> tuple[Path, Path]:
+    return index_dir / VECTORS_FILENAME, index_dir / IDS_FILENAME
+
+
+def remove_vectors(index_dir: Path) -> None:
+    for path in _paths(index_dir):
+        path.unlink(missing_ok=True)
+
+
+class PendingVectors:
+    """Embeddings staged during an index transaction and appended on commit.
+
+    Rows are spooled to a temporary file so that rebuilding a large index does
+    not hold every embedding in memory, and nothing reaches the vector files
+    if the transaction is rolled back.
+    """
+
+    def __init__(self) -> None:
+        self._rows = tempfile.TemporaryFile()
+        self._ids = array("q")
+
+    def add(self, entry_id: int, entry: dict) -> None:
+        self.add_vector(entry_id, embed_entry(entry))
+
+    def add_vector(self, entry_id: int, vec: array) -> None:
+        """Stage an embedding already computed with ``embed_entry``."""
+        if sys.byteorder != "little":
+            vec.byteswap()
+        self._rows.write(vec.tobytes())
+        self._ids.append(entry_id)
+
+    def commit(self, index_dir: Path) -> None:
+        if not self._ids:
+            return
+        ids = array("q", self._ids)
+        if sys.byteorder != "little":
+            ids.byteswap()
+        vec_path, ids_path = _paths(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        with ids_path.open("ab") as ids_file, vec_path.open("ab") as vec_file:
+            fcntl.flock(ids_file, fcntl.LOCK_EX)
+            try:
+                # Drop a half-written row left behind by an interrupted append
+                # so rows and IDs stay aligned.
+                rows = min(
+                    os.fstat(vec_file.fileno()).st_size // _ROW_BYTES,
+                    os.fstat(ids_file.fileno()).st_size // 8,
+                )
+                vec_file.truncate(rows * _ROW_BYTES)
+                ids_file.truncate(rows * 8)
+                self._rows.seek(0)
+                shutil.copyfileobj(self._rows, vec_file)
+                vec_file.flush()
+                ids_file.write(ids.tobytes())
+            finally:
+                fcntl.flock(ids_file, fcntl.LOCK_UN)
+        self._ids = array("q")
+        self._rows.seek(0)
+        self._rows.truncate()
+
+    def close(self) -> None:
+        self._rows.close()
+
+
+def vector_count(index_dir: Path) -> int:
+    vec_path, ids_path = _paths(index_dir)
+    if not vec_path.exists() or not ids_path.exists():
+        return 0
+    return min(vec_path.stat().st_size // _ROW_BYTES, ids_path.stat().st_size // 8)
+
+
+def _load_ids(ids_path: Path, rows: int) -> array:
+    ids = array("q")
+    with ids_path.open("rb") as f:
+        ids.frombytes(f.read(rows * 8))
+    if sys.byteorder != "little":
+        ids.byteswap()
+    return ids
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - exercised when NumPy is absent
+        return None
+    return numpy
+
+
+def iter_nearest(
+    index_dir: Path, text: str, first: int
+) -> Iterator[tuple[float, int]]:
+    """Yield ``(cosine similarity, entry_id)`` pairs, most similar first.
+
+    Only the ``first`` best rows are ranked up front; the rest are sorted if
+    the caller reads past them, for example because it skips the rows of
+    pruned entries.
+    """
+    vec_path, ids_path = _paths(index_dir)
+    rows = vector_count(index_dir)
+    if rows == 0:
+        return
+    ids = _load_ids(ids_path, rows)
+    query = embed(text)
+    numpy = _numpy()
+    if numpy is not None:
+        matrix = numpy.memmap(vec_path, dtype="<f4", mode="r", shape=(rows, DIM))
+        scores = matrix @ numpy.frombuffer(query.tobytes(), dtype=numpy.float32)
+        k = min(first, rows)
+        best = numpy.argpartition(-scores, k - 1)[:k]
+        ranked = sorted(best.tolist(), key=lambda i: -scores[i])
+    else:
+        # Pure Python fallback: only the query's non-zero dimensions contribute.
+        active = [(d, w) for d, w in enumerate(query) if w]
+        matrix = array("f")
+        with vec_path.open("rb") as f:
+            matrix.frombytes(f.read(rows * _ROW_BYTES))
+        if sys.byteorder != "little":
+            matrix.byteswap()
+        scores = [0.0] * rows
+        for d, w in active:
+            for i, v in enumerate(matrix[d::DIM]):
+                if v:
+                    scores[i] += w * v
+        ranked = heapq.nlargest(first, range(rows), key=scores.__getitem__)
+    for i in ranked:
+        yield float(scores[i]), ids[i]
+    if len(ranked) == rows:
+        return
+    if numpy is not None:
+        order = numpy.argsort(-scores, kind="stable").tolist()
+    else:
+        order = sorted(range(rows), key=lambda i: -scores[i])
+    seen = set(ranked)
+    for i in order:
+        if i not in seen:
+            yield float(scores[i]), ids[i]
+
+
+def nearest(index_dir: Path, text: str, top_k: int) -> list[tuple[float, int]]:
+    """Return the ``top_k`` best pairs of ``iter_nearest``."""
+    return list(islice(iter_nearest(index_dir, text, top_k), top_k))
+
+
+def rank(
+    entries: Iterable[dict], text: str, top_k: int
+) -> list[tuple[float, dict]]:
+    """Rank ``entries`` by similarity to ``text`` without the vector index."""
+    query = embed(text)
+    scored = (
+        (sum(a * b for a, b in zip(query, embed_entry(entry))), entry)
+        for entry in entries
+    )
+    return heapq.nlargest(top_k, scored, key=lambda s: s[0])
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Append-only operation logs for the task list and notes.
+
+A list of items such as ``tasks.json`` is stored as a snapshot plus a JSONL
+log next to it (``tasks.log.jsonl``) of the operations applied since the
+snapshot was written::
+
+    {"op": "add", "item": {"id": "...", ...}}
+    {"op": "update", "id": "...", "fields": {"status": "finished"}}
+    {"op": "remove", "id": "..."}
+
+Mutations append one line, and the current list is the snapshot with the log
+replayed on top. Once the log grows past ``COMPACT_BYTES`` the owner rewrites
+the snapshot and clears the log. Replaying an operation twice has no further
+effect, so a crash between those two steps loses nothing.
+"""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Callable
+
+COMPACT_BYTES = 64 * 1024
+
+
+def log_path(snapshot: Path) -> Path:
+    return snapshot.with_name(snapshot.stem + ".log.jsonl")
+
+
+def apply(items: list[dict], op: dict) -> None:
+    kind = op.get("op")
+    if kind == "add":
+        item = op["item"]
+        if all(i.get("id") != item.get("id") for i in items):
+            items.append(item)
+    elif kind == "update":
+        for item in items:
+            if item.get("id") == op["id"]:
+                item.update(op["fields"])
+                break
+    elif kind == "remove":
+        items[:] = [i for i in items if i.get("id") != op["id"]]
+
+
+def replay(items: list[dict], snapshot: Path) -> list[dict]:
+    """Apply the operations logged for ``snapshot`` to ``items`` in place."""
+    replay_from(items, snapshot)
+    return items
+
+
+def replay_from(items: list[dict], snapshot: Path, offset: int = 0) -> int:
+    """Apply the operations logged after byte ``offset``; return the new offset.
+
+    A last line without a newline is still being written, or was torn by a
+    crash and will be truncated by the next ``append``, so it is left unread.
+    """
+    try:
+        with log_path(snapshot).open("rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(op, dict):
+                    apply(items, op)
+    except FileNotFoundError:
+        return 0
+    return offset
+
+
+def contains(
+    snapshot: Path, item_id: str, load_snapshot: Callable[[], list[dict]]
+) -> bool:
+    """Return whether ``item_id`` is in the current list without replaying it.
+
+    The last logged add or remove of the item decides. Only if the log has
+    neither is the snapshot loaded with ``load_snapshot`` and searched.
+    """
+    needle = json.dumps(item_id).encode("utf-8")
+    present = None
+    try:
+        with log_path(snapshot).open("rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                if needle not in line:
+                    continue
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(op, dict):
+                    continue
+                if op.get("op") == "add" and op["item"].get("id") == item_id:
+                    present = True
+                elif op.get("op") == "remove" and op.get("id") == item_id:
+                    present = False
+    except FileNotFoundError:
+        pass
+    if present is None:
+        present = any(item.get("id") == item_id for item in load_snapshot())
+    return present
+
+
+def append(snapshot: Path, op: dict) -> int:
+    """Append ``op`` to the log of ``snapshot`` and return the log size.
+
+    Callers must hold ``atomic_files.locked(snapshot)``.
+    """
+    path = log_path(snapshot)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("ab+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                f.seek(0)
+                f.truncate(f.read().rfind(b"\n") + 1)
+                f.seek(0, os.SEEK_END)
+        f.write(json.dumps(op).encode("utf-8") + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def clear(snapshot: Path) -> None:
+    """Drop logged operations once they are part of the snapshot."""
+    log_path(snapshot).unlink(missing_ok=True)
@@ -1,26 +1,72 @@
 #!/usr/bin/env python3
-"""Prune agent memory entries by age or count."""
+"""Prune agent memory entries by age, count, size or per-tag/per-agent quota."""
 from __future__ import annotations
 
 import argparse
+import sqlite3
+import sys
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import NamedTuple
+
+import memory_index as index_mod
+from memory_storage import (
+    file_time_range,
+    is_segment,
+    iter_entry_files,
+    iter_located,
+    read_offsets,
+    remove_entry_file,
+    rewrite_entry_file,
+)
 
 DEFAULT_MEMORY_DIR = Path(__file__).resolve().parent / "entries"
 
 
-def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Delete old agent memory entries")
+class RetentionPolicy(NamedTuple):
+    """Limits on the entries to keep; ``None`` disables a limit."""
+
+    before: datetime | None = None
+    keep_last: int | None = None
+    max_bytes: int | None = None
+    max_per_tag: int | None = None
+    max_per_agent: int | None = None
+
+
+class PrunePlan(NamedTuple):
+    delete: list[Path]
+    rewrite: dict[Path, list[tuple[int, int]]]
+    entries: int
+    bytes: int
+
+
+def add_policy_arguments(parser: argparse.ArgumentParser) -> None:
     group = parser.add_mutually_exclusive_group()
     group.add_argument("--before", help="Delete entries before this ISO timestamp")
     group.add_argument(
         "--older-than", type=int, help="Delete entries older than N days"
     )
-    group.add_argument(
+    parser.add_argument(
         "--keep-last", type=int, help="Keep only the most recent N entries"
     )
     parser.add_argument(
-        "--dry-run", action="store_true", help="List files that would be deleted"
+        "--max-bytes",
+        type=int,
+        help="Keep only the most recent entries that fit in N bytes",
+    )
+    parser.add_argument(
+        "--max-per-tag", type=int, help="Keep at most N recent entries per tag"
+    )
+    parser.add_argument(
+        "--max-per-agent", type=int, help="Keep at most N recent entries per agent"
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Delete old agent memory entries")
+    add_policy_arguments(parser)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="List files that would be changed"
     )
     parser.add_argument(
         "--memory-dir",
@@ -31,41 +77,165 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     return parser.parse_args(argv)
 
 
+def _cutoff(args: argparse.Namespace) -> datetime | None:
+    if getattr(args, "before", None):
+        return datetime.fromisoformat(args.before)
+    if getattr(args, "older_than", None) is not None:
+        return datetime.utcnow() - timedelta(days=args.older_than)
+    return None
+
+
+def policy_from_args(args: argparse.Namespace) -> RetentionPolicy:
+    return RetentionPolicy(
+        before=_cutoff(args),
+        keep_last=getattr(args, "keep_last", None),
+        max_bytes=getattr(args, "max_bytes", None),
+        max_per_tag=getattr(args, "max_per_tag", None),
+        max_per_agent=getattr(args, "max_per_agent", None),
+    )
+
+
 def determine_files_to_delete(args: argparse.Namespace) -> list[Path]:
-    files = sorted(args.memory_dir.glob("*.jsonl"))
-    if args.keep_last is not None:
-        return files[: -args.keep_last]
-
-    if args.before:
-        cutoff = datetime.fromisoformat(args.before)
-    elif args.older_than is not None:
-        cutoff = datetime.utcnow() - timedelta(days=args.older_than)
-    else:
-        return []
+    """Return the files whose whole time span is older than the cutoff.
 
+    Only ``--before``/``--older-than`` are considered; see ``plan_retention``
+    for entry-level policies.
+    """
+    cutoff = _cutoff(args)
+    if cutoff is None:
+        return []
     to_delete = []
-    for f in files:
-        try:
-            ts = datetime.fromisoformat(f.stem)
-        except ValueError:
+    for f in iter_entry_files(args.memory_dir):
+        span = file_time_range(f)
+        if span is None:
             continue
-        if ts < cutoff:
+        # Segments cover a whole period and may only go once all of it is old.
+        if span[1] < cutoff:
             to_delete.append(f)
     return to_delete
 
 
-def main() -> None:
-    args = parse_args()
-    files_to_delete = determine_files_to_delete(args)
-    if not files_to_delete:
+def _line_count(path: Path) -> int:
+    if is_segment(path):
+        offsets = read_offsets(path)
+        if offsets:
+            return len(offsets)
+    with path.open("rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def plan_retention(entries_dir: Path, policy: RetentionPolicy) -> PrunePlan:
+    """Decide which entries ``policy`` expires in one newest-first pass.
+
+    Entries are kept newest first until a limit is reached: ``keep_last``
+    and ``max_bytes`` keep the most recent entries that fit and expire all
+    older ones, while a full tag or agent quota only expires that entry.
+    Files whose names show they end before ``policy.before`` are expired
+    without being read. Files left with no kept entry are deleted; the others
+    are rewritten without their expired lines.
+    """
+    delete: list[Path] = []
+    entries = 0
+    size = 0
+    if policy.before is not None:
+        for path in iter_entry_files(entries_dir):
+            span = file_time_range(path)
+            if span is not None and span[1] < policy.before:
+                delete.append(path)
+                entries += _line_count(path)
+                size += path.stat().st_size
+
+    kept: set[Path] = set()
+    dropped: dict[Path, list[tuple[int, int]]] = {}
+    tag_counts: dict[str, int] = {}
+    agent_counts: dict[str, int] = {}
+    count = 0
+    kept_bytes = 0
+    exhausted = False
+    for record, path, offset, length in iter_located(entries_dir, since=policy.before):
+        keep = not exhausted
+        if keep and policy.before is not None:
+            keep = datetime.fromisoformat(record["ts"]) >= policy.before
+        if keep and policy.keep_last is not None and count >= policy.keep_last:
+            keep, exhausted = False, True
+        if keep and policy.max_bytes is not None:
+            if kept_bytes + length > policy.max_bytes:
+                keep, exhausted = False, True
+        agent = record.get("agent")
+        tags = record.get("tags", [])
+        if keep and policy.max_per_agent is not None:
+            keep = agent_counts.get(agent, 0) < policy.max_per_agent
+        if keep and policy.max_per_tag is not None:
+            keep = all(tag_counts.get(t, 0) < policy.max_per_tag for t in tags)
+        if not keep:
+            dropped.setdefault(path, []).append((offset, length))
+            continue
+        kept.add(path)
+        count += 1
+        kept_bytes += length
+        agent_counts[agent] = agent_counts.get(agent, 0) + 1
+        for tag in tags:
+            tag_counts[tag] = tag_counts.get(tag, 0) + 1
+
+    rewrite = {}
+    for path, ranges in dropped.items():
+        entries += len(ranges)
+        if path in kept:
+            rewrite[path] = ranges
+            size += sum(length for _, length in ranges)
+        else:
+            delete.append(path)
+            size += path.stat().st_size
+    return PrunePlan(delete, rewrite, entries, size)
+
+
+def apply_plan(plan: PrunePlan, entries_dir: Path) -> int:
+    """Delete and rewrite the files of ``plan``; return the bytes reclaimed.
+
+    The index of ``entries_dir`` is updated straight away, since it still
+    points at the old offsets of the rewritten files.
+    """
+    reclaimed = 0
+    for path in plan.delete:
+        try:
+            reclaimed += path.stat().st_size
+        except FileNotFoundError:
+            continue
+        remove_entry_file(path)
+    for path, ranges in plan.rewrite.items():
+        reclaimed += rewrite_entry_file(path, ranges)
+    try:
+        index_mod.update_index(entries_dir, changed=[*plan.delete, *plan.rewrite])
+    except sqlite3.Error as e:
+        print(f"Failed to update index: {e}", file=sys.stderr)
+    return reclaimed
+
+
+def prune(entries_dir: Path, policy: RetentionPolicy, dry_run: bool) -> PrunePlan:
+    """Apply ``policy`` to ``entries_dir`` and print what was done."""
+    plan = plan_retention(entries_dir, policy)
+    if not plan.entries:
         print("No entries to delete")
-        return
-    for f in files_to_delete:
-        if args.dry_run:
+        return plan
+    if dry_run:
+        for f in plan.delete:
             print(f"Would delete {f}")
-        else:
-            f.unlink(missing_ok=True)
-            print(f"Deleted {f}")
+        for f, ranges in plan.rewrite.items():
+            print(f"Would remove {len(ranges)} entries from {f}")
+        print(f"Would delete {plan.entries} entries, reclaiming {plan.bytes} bytes")
+        return plan
+    reclaimed = apply_plan(plan, entries_dir)
+    for f in plan.delete:
+        print(f"Deleted {f}")
+    for f, ranges in plan.rewrite.items():
+        print(f"Removed {len(ranges)} entries from {f}")
+    print(f"Deleted {plan.entries} entries, reclaimed {reclaimed} bytes")
+    return plan
+
+
+def main() -> None:
+    args = parse_args()
+    prune(args.memory_dir, policy_from_args(args), args.dry_run)
 
 
 if __name__ == "__main__":
@@ -6,12 +6,13 @@ from __future__ import annotations
 
 import argparse
 import json
-import sys
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, Iterator, List
 
-from jsonschema import ValidationError, validate
+import memory_search as search_mod
+from memory_storage import iter_records
 
 DEFAULT_MEMORY_DIR = Path(__file__).resolve().parent / "entries"
 SCHEMA_PATH = Path(__file__).resolve().parent / "schema.json"
@@ -27,32 +28,62 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--last", type=int, help="Show only the N most recent entries")
     parser.add_argument(
         "--search",
-        help="Only include entries containing this term in context, observation, or reflection",
+        help="Only include entries containing this text in context, observation, "
+        "or reflection",
     )
+    parser.add_argument(
+        "--words",
+        action="store_true",
+        help="Treat --search as a word query "
+        "(words are ANDed; supports OR, prefix* and field:word)",
+    )
+    parser.add_argument("--task-id", help="Only include entries linked to this task")
     parser.add_argument(
         "--memory-dir",
         type=Path,
         default=DEFAULT_MEMORY_DIR,
         help="Path to memory entries directory",
     )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Validate every entry against the schema",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for parsing entry files (0 for one per CPU)",
+    )
     return parser.parse_args()
 
 
-def load_entries(memory_dir: Path) -> List[dict]:
-    entries: List[dict] = []
-    with SCHEMA_PATH.open("r", encoding="utf-8") as sf:
-        schema = json.load(sf)
-    for file in sorted(memory_dir.glob("*.jsonl")):
-        with file.open("r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    record = json.loads(line)
-                    validate(instance=record, schema=schema)
-                    entries.append(record)
-                except (json.JSONDecodeError, ValidationError) as e:
-                    print(f"Skipping invalid entry in {file}: {e}", file=sys.stderr)
-    entries.sort(key=lambda e: e["ts"], reverse=True)
-    return entries
+def iter_entries(
+    memory_dir: Path,
+    strict: bool = False,
+    since: str | None = None,
+    until: str | None = None,
+) -> Iterator[dict]:
+    """Lazily yield entries newest first, reading files only as needed.
+
+    ``since``/``until`` skip files and partitions outside the range; entries
+    still need ``filter_entries`` for an exact cut.
+    """
+    return iter_records(
+        memory_dir,
+        strict,
+        since=datetime.fromisoformat(since) if since else None,
+        until=datetime.fromisoformat(until) if until else None,
+    )
+
+
+def load_entries(
+    memory_dir: Path,
+    strict: bool = False,
+    since: str | None = None,
+    until: str | None = None,
+) -> List[dict]:
+    return list(iter_entries(memory_dir, strict, since, until))
 
 
 def filter_entries(
@@ -61,11 +92,14 @@ def filter_entries(
     since: str | None,
     until: str | None,
     search: str | None,
-) -> List[dict]:
-    result: List[dict] = []
+    task_id: str | None = None,
+    words: bool = False,
+) -> Iterator[dict]:
     since_dt = datetime.fromisoformat(since) if since else None
     until_dt = datetime.fromisoformat(until) if until else None
     for e in entries:
+        if task_id is not None and e.get("task_id") != task_id:
+            continue
         ts = datetime.fromisoformat(e["ts"])
         if since_dt and ts < since_dt:
             continue
@@ -73,26 +107,45 @@ def filter_entries(
             continue
         if tags and not set(tags).intersection(e.get("tags", [])):
             continue
-        if search:
-            haystack = " ".join(
-                [
-                    e.get("context", ""),
-                    e.get("observation", ""),
-                    e.get("reflection", ""),
-                ]
-            ).lower()
-            if search.lower() not in haystack:
-                continue
-        result.append(e)
-    return result
+        if search and not matches_search(e, search, words):
+            continue
+        yield e
+
+
+def matches_search(entry: dict, search: str, words: bool = False) -> bool:
+    if words:
+        return search_mod.matches(entry, search)
+    return search_mod.contains(entry, search)
 
 
 def main() -> None:
     args = parse_args()
-    entries = load_entries(args.memory_dir)
-    entries = filter_entries(entries, args.tags, args.since, args.until, args.search)
+    if args.jobs != 1:
+        import memory_parallel
+
+        entries = memory_parallel.iter_records(
+            args.memory_dir,
+            memory_parallel.resolve_jobs(args.jobs),
+            args.strict,
+            since=datetime.fromisoformat(args.since) if args.since else None,
+            until=datetime.fromisoformat(args.until) if args.until else None,
+            where=memory_parallel.Filter(
+                args.tags, args.since, args.until, args.search, args.task_id, args.words
+            ),
+        )
+    else:
+        entries = iter_entries(args.memory_dir, args.strict, args.since, args.until)
+        entries = filter_entries(
+            entries,
+            args.tags,
+            args.since,
+            args.until,
+            args.search,
+            args.task_id,
+            args.words,
+        )
     if args.last is not None:
-        entries = entries[: args.last]
+        entries = islice(entries, args.last)
     for entry in entries:
         print(json.dumps(entry, indent=2))
 
@@ -6,17 +6,16 @@ from __future__ import annotations
 
 import argparse
 import json
-import sys
 from collections import Counter
 from datetime import datetime
 from pathlib import Path
 from typing import Iterable, List
 
-from jsonschema import ValidationError, validate
+import memory_columns as columns
+from memory_storage import iter_records
 
 DEFAULT_MEMORY_DIR = Path(__file__).resolve().parent / "entries"
 DEFAULT_SUMMARY_DIR = Path(__file__).resolve().parent / "weekly_summaries"
-DEFAULT_SUMMARY_DIR.mkdir(parents=True, exist_ok=True)
 SCHEMA_PATH = Path(__file__).resolve().parent / "schema.json"
 
 
@@ -35,23 +34,48 @@ def parse_args() -> argparse.Namespace:
         type=Path,
         help="Output summary file (defaults to weekly_summaries)",
     )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Validate every entry against the schema",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for parsing entry files (0 for one per CPU)",
+    )
     return parser.parse_args()
 
 
-def load_entries(memory_dir: Path) -> List[dict]:
-    entries: List[dict] = []
-    with SCHEMA_PATH.open("r", encoding="utf-8") as sf:
-        schema = json.load(sf)
-    for file in sorted(memory_dir.glob("*.jsonl")):
-        with file.open("r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    record = json.loads(line)
-                    validate(instance=record, schema=schema)
-                    entries.append(record)
-                except (json.JSONDecodeError, ValidationError) as e:
-                    print(f"Skipping invalid entry in {file}: {e}", file=sys.stderr)
-    return entries
+def load_entries(
+    memory_dir: Path,
+    strict: bool = False,
+    since: str | None = None,
+    until: str | None = None,
+    jobs: int = 1,
+) -> List[dict]:
+    since_dt = datetime.fromisoformat(since) if since else None
+    until_dt = datetime.fromisoformat(until) if until else None
+    if jobs > 1:
+        import memory_parallel
+
+        return list(
+            memory_parallel.iter_records(
+                memory_dir,
+                jobs,
+                strict,
+                newest_first=False,
+                since=since_dt,
+                until=until_dt,
+                where=memory_parallel.Filter(since=since, until=until),
+            )
+        )
+    return list(
+        iter_records(
+            memory_dir, strict, newest_first=False, since=since_dt, until=until_dt
+        )
+    )
 
 
 def filter_entries(entries: Iterable[dict], since: str, until: str) -> List[dict]:
@@ -83,16 +107,38 @@ def summarize(entries: Iterable[dict], since: str, until: str) -> dict:
     }
 
 
+def summarize_range(
+    memory_dir: Path, since: str, until: str, jobs: int = 1
+) -> dict:
+    """Summarize by reading the entry files, for when the snapshot is unusable."""
+    entries = load_entries(memory_dir, False, since, until, jobs)
+    return summarize(filter_entries(entries, since, until), since, until)
+
+
 def main() -> None:
     args = parse_args()
-    entries = load_entries(args.memory_dir)
-    entries = filter_entries(entries, args.since, args.until)
-    summary = summarize(entries, args.since, args.until)
+    jobs = args.jobs
+    if jobs != 1:
+        import memory_parallel
+
+        jobs = memory_parallel.resolve_jobs(jobs)
+    if args.strict:
+        entries = load_entries(
+            args.memory_dir, args.strict, args.since, args.until, jobs
+        )
+        entries = filter_entries(entries, args.since, args.until)
+        summary = summarize(entries, args.since, args.until)
+    else:
+        try:
+            summary = columns.summarize(args.memory_dir, args.since, args.until, jobs)
+        except OSError:
+            summary = summarize_range(args.memory_dir, args.since, args.until, jobs)
     output_path = args.output
     if output_path is None:
         start = args.since.split("T")[0]
         end = args.until.split("T")[0]
         output_path = DEFAULT_SUMMARY_DIR / f"summary_{start}_to_{end}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
     with output_path.open("w", encoding="utf-8") as f:
         json.dump(summary, f, indent=2)
     print(f"Wrote summary to {output_path}")
@@ -0,0 +1,45 @@
+"""Fixtures and helpers shared by the tests.
+
+The directory above is put on ``sys.path`` so that tests can import the
+tools by name, which worker processes started for ``--jobs`` need as well.
+"""
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def make_entry(ts: str, i: int, **fields) -> dict:
+    """Return a valid entry numbered ``i``; ``fields`` replace the defaults."""
+    entry = {
+        "ts": ts,
+        "agent": "test",
+        "run_id": str(i),
+        "context": f"ctx {i}",
+        "observation": "obs",
+        "reflection": "refl",
+        "tags": ["odd"] if i % 2 else [],
+    }
+    entry.update(fields)
+    return entry
+
+
+def write_entry_file(entries_dir: Path, entry: dict) -> Path:
+    """Write ``entry`` to its own file, as older versions stored entries."""
+    path = entries_dir / f"{entry['ts']}.jsonl"
+    path.write_text(json.dumps(entry) + "\n")
+    return path
+
+
+@pytest.fixture
+def empty_memory_dir(tmp_path) -> Path:
+    """A memory directory with the schema and an empty ``entries/``."""
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    (tmp_path / "entries").mkdir()
+    return tmp_path
@@ -0,0 +1,34 @@
+import json
+
+from benchmarks import generate_history, run_benchmarks
+
+
+def test_generator_is_deterministic_and_ordered():
+    first = list(generate_history.iter_entries(300, seed=7))
+    assert first == list(generate_history.iter_entries(300, seed=7))
+    assert first != list(generate_history.iter_entries(300, seed=8))
+    assert [e["ts"] for e in first] == sorted(e["ts"] for e in first)
+    assert len({e["agent"] for e in first}) > 1
+    assert any(e["tags"] for e in first) and any("task_id" in e for e in first)
+
+
+def test_run_writes_comparable_results(tmp_path, capsys):
+    output = tmp_path / "result.json"
+    argv = [
+        "--entries", "200",
+        "--repeat", "1",
+        "--cache-dir", str(tmp_path / "cache"),
+        "--only", "query_last", "summarize", "prune", "task_mutations",
+        "--output", str(output),
+    ]
+    run_benchmarks.main(argv)
+    result = json.loads(output.read_text())
+    assert result["meta"]["entries"] == 200
+    assert sorted(result["results"]) == [
+        "prune", "query_last", "summarize", "task_mutations"
+    ]
+    assert all(r["median"] > 0 for r in result["results"].values())
+
+    run_benchmarks.main([*argv, "--baseline", str(output)])
+    out = capsys.readouterr().out
+    assert "task_mutations" in out.splitlines()[-1] and " ms  x" in out
@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Modules that only some commands need; none of them may load for task/note
+# listing, which agents run on every step.
+HEAVY_MODULES = {
+    "jsonschema",
+    "sqlite3",
+    "numpy",
+    "socketserver",
+    "add_memory_entry",
+    "query_memory_entries",
+    "summarize_memory_entries",
+    "prune_memory_entries",
+    "memory_index",
+    "memory_search",
+    "memory_storage",
+    "memory_vectors",
+    "memory_daemon",
+}
+# Import time allowed on top of a bare interpreter, in microseconds. argparse,
+# json, pathlib and logging account for most of it.
+IMPORT_BUDGET_US = 100_000
+
+
+def _import_times(*args: str) -> dict[str, int]:
+    env = dict(os.environ, AGENT_MEMORY_NO_DAEMON="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+@pytest.mark.parametrize("command", ["task", "note"])
+def test_list_commands_skip_heavy_imports(command, tmp_path):
+    baseline = _import_times("-c", "pass")
+    times = _import_times(
+        str(ROOT / "memory_cli.py"), command, "--memory-dir", str(tmp_path), "list"
+    )
+    assert not HEAVY_MODULES & times.keys()
+    assert ("manage_notes" if command == "note" else "manage_tasks") in times
+    extra = sum(us for name, us in times.items() if name not in baseline)
+    assert extra < IMPORT_BUDGET_US
+
+
+def test_importing_scripts_has_no_filesystem_side_effects(tmp_path):
+    code = (
+        "import sys; sys.path.insert(0, sys.argv[1]);"
+        "import summarize_memory_entries, weekly_rollup"
+    )
+    scratch = tmp_path / "copy"
+    scratch.mkdir()
+    for path in ROOT.glob("*.py"):
+        (scratch / path.name).write_text(path.read_text())
+    subprocess.run(
+        [sys.executable, "-B", "-c", code, str(scratch)], check=True, cwd=tmp_path
+    )
+    assert not any(p.is_dir() for p in scratch.iterdir())
@@ -0,0 +1,64 @@
+import multiprocessing
+import time
+from pathlib import Path
+
+import manage_notes
+import manage_tasks
+
+WORKERS = 8
+ROUNDS = 20
+
+
+def _slow(load):
+    def wrapper(path):
+        items = load(path)
+        time.sleep(0.001)
+        return items
+
+    return wrapper
+
+
+def _hammer(memory_dir: Path, worker: int, start) -> None:
+    # Widen the read-modify-write window so that races show up even on a
+    # single CPU; this only affects the forked worker process.
+    manage_tasks.load_tasks = _slow(manage_tasks.load_tasks)
+    manage_notes.load_notes = _slow(manage_notes.load_notes)
+    # Compact often so snapshot rewrites race with appends and reads too.
+    manage_tasks.op_log.COMPACT_BYTES = 2048
+    start.wait()
+    task_file = memory_dir / "tasks.json"
+    note_file = memory_dir / "notes.json"
+    for i in range(ROUNDS):
+        task = manage_tasks.add_task(f"w{worker}-{i}", task_file=task_file)
+        assert manage_tasks.update_task(task["id"], "in_progress", task_file=task_file)
+        note = manage_notes.add_note(f"w{worker}-{i}", note_file=note_file)
+        assert manage_tasks.remove_task(task["id"], task_file=task_file)
+        assert manage_notes.remove_note(note["id"], note_file=note_file)
+        # Unlocked readers must never see a partially written snapshot.
+        manage_tasks.load_tasks(task_file)
+        manage_notes.load_notes(note_file)
+    manage_tasks.add_task(f"w{worker}-final", task_file=task_file)
+    manage_notes.add_note(f"w{worker}-final", note_file=note_file)
+
+
+def test_parallel_writers_lose_no_updates(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    start = ctx.Event()
+    procs = [
+        ctx.Process(target=_hammer, args=(tmp_path, w, start)) for w in range(WORKERS)
+    ]
+    for p in procs:
+        p.start()
+    start.set()
+    for p in procs:
+        p.join(timeout=60)
+    assert [p.exitcode for p in procs] == [0] * WORKERS
+
+    expected = sorted(f"w{w}-final" for w in range(WORKERS))
+    tasks = manage_tasks.list_tasks(task_file=tmp_path / "tasks.json")
+    notes = manage_notes.list_notes(note_file=tmp_path / "notes.json")
+    assert sorted(t["description"] for t in tasks) == expected
+    assert sorted(n["content"] for n in notes) == expected
+    assert all(t["status"] == "open" for t in tasks)
+    assert not list(tmp_path.glob(".*.tmp"))
+    assert (tmp_path / "tasks.json").exists()
@@ -0,0 +1,85 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+import export_memory_markdown as export_mod
+import memory_storage
+from conftest import make_entry, write_entry_file
+
+
+def _add(entries_dir: Path, *timestamps: str) -> None:
+    entries = [make_entry(ts, i) for i, ts in enumerate(timestamps)]
+    memory_storage.append_entries(entries_dir, entries, period="daily")
+
+
+@pytest.fixture
+def entries_dir(empty_memory_dir):
+    entries_dir = empty_memory_dir / "entries"
+    _add(entries_dir, "2025-05-01T09:00:00", "2025-05-02T09:00:00")
+    write_entry_file(entries_dir, make_entry("2025-05-01T12:00:00", 5))
+    return entries_dir
+
+
+def _export(monkeypatch, capsys, entries_dir: Path, output: Path, *argv: str) -> str:
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["export", "--output", str(output), "--memory-dir", str(entries_dir), *argv],
+    )
+    export_mod.main()
+    return capsys.readouterr().out
+
+
+def _expected(entries_dir: Path) -> str:
+    return export_mod.entries_to_markdown(memory_storage.iter_records(entries_dir))
+
+
+def test_export_streams_oldest_first(entries_dir, tmp_path, monkeypatch, capsys):
+    output = tmp_path / "out" / "memory.md"
+    out = _export(monkeypatch, capsys, entries_dir, output)
+    assert out == f"Wrote 3 entries to {output}\n"
+    text = output.read_text()
+    assert text == _expected(entries_dir)
+    headers = [line for line in text.splitlines() if line.startswith("## ")]
+    assert headers == [
+        "## 2025-05-01T09:00:00 - ctx 0",
+        "## 2025-05-01T12:00:00 - ctx 5",
+        "## 2025-05-02T09:00:00 - ctx 1",
+    ]
+
+    _export(monkeypatch, capsys, entries_dir, output, "--last", "2")
+    assert output.read_text().startswith("## 2025-05-01T12:00:00 - ctx 5\n")
+
+
+def test_append_since_last(entries_dir, tmp_path, monkeypatch, capsys):
+    output = tmp_path / "memory.md"
+    out = _export(monkeypatch, capsys, entries_dir, output, "--append-since-last")
+    assert out == f"Appended 3 entries to {output}\n"
+    assert json.loads(export_mod.mark_path(output).read_text())["ts"] == (
+        "2025-05-02T09:00:00"
+    )
+
+    _add(entries_dir, "2025-05-01T10:00:00", "2025-05-03T08:00:00")
+    out = _export(monkeypatch, capsys, entries_dir, output, "--append-since-last")
+    # The entry older than the mark is not exported.
+    assert out == f"Appended 1 entries to {output}\n"
+    out = _export(monkeypatch, capsys, entries_dir, output, "--append-since-last")
+    assert out == f"Appended 0 entries to {output}\n"
+    last = "## 2025-05-03T08:00:00 - ctx 1\n\n- Observation: obs\n"
+    assert output.read_text().endswith(f"\n\n{last}- Reflection: refl\n- Tags: odd\n")
+
+    # An interrupted append leaves an unrecorded tail, which is cut off.
+    with output.open("a") as f:
+        f.write("\n## partial")
+    _add(entries_dir, "2025-05-04T08:00:00")
+    _export(monkeypatch, capsys, entries_dir, output, "--append-since-last")
+    assert "partial" not in output.read_text()
+    assert output.read_text().count("## ") == 5
+
+    # A full export replaces the file, so the mark no longer applies.
+    _export(monkeypatch, capsys, entries_dir, output)
+    assert not export_mod.mark_path(output).exists()
+    _export(monkeypatch, capsys, entries_dir, output, "--append-since-last")
+    assert output.read_text() == _expected(entries_dir)
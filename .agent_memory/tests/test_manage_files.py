@@ -1,3 +1,4 @@
+import json
 import logging
 from pathlib import Path
 import importlib.util
@@ -39,3 +40,93 @@ def test_load_with_corrupted_json_returns_empty_list_and_logs_warning(loader, fi
     assert record.levelno == logging.WARNING
     assert "Failed to decode JSON" in record.getMessage()
     assert str(file_path) in record.getMessage()
+
+
+def test_task_mutations_append_to_log_and_keep_history(tmp_path):
+    task_file = tmp_path / "tasks.json"
+    tasks = [manage_tasks.add_task(f"task {i}", task_file=task_file) for i in range(15)]
+    assert manage_tasks.update_task(tasks[0]["id"], "finished", task_file=task_file)
+    assert manage_tasks.remove_task(tasks[1]["id"], task_file=task_file)
+    assert not manage_tasks.remove_task("missing", task_file=task_file)
+
+    # Nothing is rewritten until the log is compacted.
+    assert not task_file.exists()
+    log = manage_tasks.op_log.log_path(task_file)
+    assert len(log.read_text().splitlines()) == 17
+
+    assert len(manage_tasks.list_tasks(task_file=task_file)) == 10
+    everything = manage_tasks.list_tasks(task_file=task_file, limit=None)
+    assert [t["description"] for t in everything][:2] == ["task 0", "task 2"]
+    assert everything[0]["status"] == "finished"
+
+    manage_tasks.save_tasks(everything, task_file)
+    assert not log.exists()
+    assert manage_tasks.list_tasks(task_file=task_file, limit=None) == everything
+
+
+def test_note_log_replay_tolerates_interrupted_writes(tmp_path):
+    note_file = tmp_path / "notes.json"
+    first = manage_notes.add_note("first", note_file=note_file)
+    manage_notes.save_notes(manage_notes.load_notes(note_file), note_file)
+    second = manage_notes.add_note("second", note_file=note_file)
+    log = manage_notes.op_log.log_path(note_file)
+    # A crash after writing the snapshot but before clearing the log, then a
+    # torn append.
+    with log.open("a", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "add", "item": first}) + "\n")
+        f.write('{"op": "remove", "id"')
+
+    assert manage_notes.load_notes(note_file) == [first, second]
+    assert manage_notes.remove_note(first["id"], note_file=note_file)
+    assert manage_notes.list_notes(note_file=note_file) == [second]
+
+
+def test_task_changes_check_existence_without_replaying(tmp_path, monkeypatch):
+    task_file = tmp_path / "tasks.json"
+    saved = manage_tasks.add_task("saved", task_file=task_file)
+    manage_tasks.save_tasks(manage_tasks.load_tasks(task_file), task_file)
+    logged = manage_tasks.add_task("logged", task_file=task_file)
+    monkeypatch.setattr(manage_tasks.op_log, "replay", None)
+
+    assert manage_tasks.update_task(saved["id"], "finished", task_file=task_file)
+    assert manage_tasks.update_task(logged["id"], "in_progress", task_file=task_file)
+    assert manage_tasks.remove_task(saved["id"], task_file=task_file)
+    assert not manage_tasks.update_task(saved["id"], "open", task_file=task_file)
+    assert not manage_tasks.remove_task(saved["id"], task_file=task_file)
+    # Mentioning an ID in a description does not make it exist.
+    manage_tasks.add_task(f"follow up on {saved['id']}", task_file=task_file)
+    assert not manage_tasks.remove_task(saved["id"], task_file=task_file)
+    assert not manage_tasks.remove_task("missing", task_file=task_file)
+
+    monkeypatch.undo()
+    tasks = manage_tasks.list_tasks(task_file=task_file, limit=None)
+    assert [(t["description"][:6], t["status"]) for t in tasks] == [
+        ("logged", "in_progress"),
+        ("follow", "open"),
+    ]
+
+
+def test_negative_limits_are_rejected(tmp_path, monkeypatch, capsys):
+    memory_cli = _load_module("memory_cli")
+    memory_store = _load_module("memory_store")
+    store = memory_store.MemoryStore(tmp_path)
+    for list_items in (
+        lambda: manage_tasks.list_tasks(task_file=tmp_path / "tasks.json", limit=-1),
+        lambda: manage_notes.list_notes(note_file=tmp_path / "notes.json", limit=-1),
+        lambda: store.tasks(limit=-1),
+        lambda: store.notes(limit=-1),
+    ):
+        with pytest.raises(ValueError):
+            list_items()
+
+    for command in ("task", "note"):
+        with pytest.raises(SystemExit):
+            memory_cli.main(
+                [command, "--memory-dir", str(tmp_path), "list", "--limit", "-1"]
+            )
+        assert "must not be negative" in capsys.readouterr().err
+    for module in (manage_tasks, manage_notes):
+        monkeypatch.setattr("sys.argv", ["manage", "list", "--limit", "-1"])
+        with pytest.raises(SystemExit):
+            module.parse_args()
+        assert "--limit must not be negative" in capsys.readouterr().err
@@ -0,0 +1,81 @@
+import gzip
+import json
+from datetime import datetime
+from pathlib import Path
+
+import memory_archive
+import memory_cli
+from conftest import make_entry, write_entry_file
+
+
+def _setup(memory_dir: Path, count: int) -> Path:
+    entries_dir = memory_dir / "entries"
+    for i in range(count):
+        tags = ["even" if i % 2 == 0 else "odd"]
+        write_entry_file(
+            entries_dir, make_entry(f"2025-05-{i + 1:02d}T12:00:00", i, tags=tags)
+        )
+    return entries_dir
+
+
+def _contexts(out: str) -> list[str]:
+    decoder = json.JSONDecoder()
+    found, pos, out = [], 0, out.strip()
+    while pos < len(out):
+        entry, pos = decoder.raw_decode(out, pos)
+        found.append(entry["context"])
+        pos = len(out) - len(out[pos:].lstrip())
+    return found
+
+
+def test_archive_moves_old_entries_and_query_can_include_them(empty_memory_dir, capsys):
+    entries_dir = _setup(empty_memory_dir, 6)
+    dir_args = ["--memory-dir", str(empty_memory_dir)]
+    memory_cli.main(["query", *dir_args])
+    capsys.readouterr()
+
+    memory_cli.main(["archive", "--before", "2025-05-04T00:00:00", *dir_args])
+    assert "Archived 3 entries" in capsys.readouterr().out
+    assert len(list(entries_dir.glob("*.jsonl"))) == 3
+    archive = empty_memory_dir / "archive" / "2025-05-01_2025-05-03.jsonl.gz"
+    with gzip.open(archive, "rt") as f:
+        assert len(f.read().splitlines()) == 3
+
+    memory_cli.main(["query", *dir_args])
+    assert _contexts(capsys.readouterr().out) == ["ctx 5", "ctx 4", "ctx 3"]
+
+    memory_cli.main(["query", "--include-archive", *dir_args])
+    assert _contexts(capsys.readouterr().out) == [f"ctx {i}" for i in range(5, -1, -1)]
+
+    memory_cli.main(
+        ["query", "--include-archive", "--tags", "even", "--last", "3", *dir_args]
+    )
+    assert _contexts(capsys.readouterr().out) == ["ctx 4", "ctx 2", "ctx 0"]
+
+
+def test_only_matching_blocks_are_decompressed(empty_memory_dir, monkeypatch):
+    entries_dir = _setup(empty_memory_dir, 9)
+    monkeypatch.setattr(memory_archive, "BLOCK_ENTRIES", 2)
+    count, path = memory_archive.archive_files(
+        entries_dir, sorted(entries_dir.glob("*.jsonl"))
+    )
+    assert count == 9
+    index = json.loads(path.with_name("2025-05-01_2025-05-09.idx.json").read_text())
+    assert [b["count"] for b in index["blocks"]] == [2, 2, 2, 2, 1]
+
+    decompressed = []
+    original = gzip.decompress
+    monkeypatch.setattr(
+        gzip, "decompress", lambda data: decompressed.append(len(data)) or original(data)
+    )
+    since = datetime(2025, 5, 4)
+    until = datetime(2025, 5, 5, 23)
+    found = list(memory_archive.iter_archived(entries_dir, since, until))
+    # Whole blocks come back; callers apply the exact time filter.
+    assert [e["context"] for e in found] == ["ctx 5", "ctx 4", "ctx 3", "ctx 2"]
+    assert len(decompressed) == 2
+
+    decompressed.clear()
+    oldest = list(memory_archive.iter_archived(entries_dir, newest_first=False))
+    assert [e["context"] for e in oldest] == [f"ctx {i}" for i in range(9)]
+    assert len(decompressed) == 5
@@ -0,0 +1,83 @@
+import asyncio
+import shutil
+import time
+
+import memory_async
+from conftest import ROOT
+
+N = 40
+
+
+def test_concurrent_coroutines_do_not_block_the_loop(tmp_path, monkeypatch):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    store = memory_async.AsyncMemoryStore(tmp_path, poll_interval=0)
+
+    writes = []
+    add_entries = store.store.add_entries
+
+    def slow_add_entries(entries):
+        writes.append(len(entries))
+        time.sleep(0.05)
+        add_entries(entries)
+
+    queries = []
+    query = store.store.query
+
+    def slow_query(*args):
+        queries.append(args)
+        time.sleep(0.05)
+        return query(*args)
+
+    monkeypatch.setattr(store.store, "add_entries", slow_add_entries)
+    monkeypatch.setattr(store.store, "query", slow_query)
+
+    async def main():
+        ticks = 0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        tick_task = asyncio.create_task(ticker())
+        async with store:
+            added = await asyncio.gather(
+                *(store.add(f"step {i}", "obs", "refl", ["perf"]) for i in range(N))
+            )
+            results = await asyncio.gather(
+                *(store.query(tags=["perf"], last=N) for _ in range(N))
+            )
+            task = await store.add_task("follow up")
+            tasks = await asyncio.gather(*(store.tasks() for _ in range(N)))
+        done.set()
+        await tick_task
+        return ticks, added, results, task, tasks
+
+    ticks, added, results, task, tasks = asyncio.run(main())
+
+    # Every coroutine finished, while the loop kept running in between.
+    assert ticks > 20
+    assert sum(writes) == N and len(writes) < N
+    assert len(queries) == 1
+    expected = sorted(e["ts"] for e in added)[::-1]
+    assert all([e["ts"] for e in r] == expected for r in results)
+    assert all(t == [task] for t in tasks)
+
+
+def test_invalid_entries_fail_only_their_caller(tmp_path):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+
+    async def main():
+        async with memory_async.AsyncMemoryStore(tmp_path) as store:
+            results = await asyncio.gather(
+                store.add("ok", "obs", "refl"),
+                store.add("bad", "obs", "refl", [1]),
+                return_exceptions=True,
+            )
+            return results, await store.query()
+
+    (good, bad), stored = asyncio.run(main())
+    assert isinstance(bad, ValueError)
+    assert stored == [good]
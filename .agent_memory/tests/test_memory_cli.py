@@ -65,3 +65,62 @@ def test_cli_add_with_and_without_task_id(tmp_path):
     with files[1].open() as f:
         entry = json.loads(f.readline())
     assert 'task_id' not in entry
+
+
+def test_profile_reports_phases_and_counters(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("AGENT_MEMORY_NO_DAEMON", "1")
+    shutil.copy(SCHEMA_PATH, tmp_path / 'schema.json')
+    for context in ('first', 'second'):
+        memory_cli.main(['add', context, 'obs', 'refl', '--memory-dir', str(tmp_path)])
+    capsys.readouterr()
+
+    memory_cli.main(['--profile', 'reindex', '--memory-dir', str(tmp_path)])
+    report = json.loads(capsys.readouterr().err.splitlines()[-1])
+    assert report['command'] == 'reindex'
+    assert report['counters']['lines_read'] == 2
+    assert report['phases']['parse']['calls'] == 2
+    assert {'index_sync', 'list_files', 'embed'} <= report['phases'].keys()
+
+    trace_file = tmp_path / 'trace.jsonl'
+    dump = tmp_path / 'query.prof'
+    monkeypatch.setenv("AGENT_MEMORY_TRACE", str(trace_file))
+    memory_cli.main([
+        '--profile-dump', str(dump), 'query', '--last', '1', '--memory-dir', str(tmp_path)
+    ])
+    memory_cli.main(['task', '--memory-dir', str(tmp_path), 'list'])
+    assert 'total_ms' not in capsys.readouterr().err
+    reports = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert [r['command'] for r in reports] == ['query', 'task']
+    assert reports[0]['counters']['index_rows'] == 1
+    assert reports[0]['profile'] == str(dump) and dump.stat().st_size > 0
+
+
+def test_task_show_and_query_task_id(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("AGENT_MEMORY_NO_DAEMON", "1")
+    shutil.copy(SCHEMA_PATH, tmp_path / 'schema.json')
+    memory_cli.main(['task', '--memory-dir', str(tmp_path), 'add', 'fix parser'])
+    task_id = capsys.readouterr().out.strip()
+    for i in range(6):
+        argv = ['add', f'ctx{i}', 'obs', 'refl', '--memory-dir', str(tmp_path)]
+        if i % 3 == 0:
+            argv += ['--task-id', task_id]
+        memory_cli.main(argv)
+    capsys.readouterr()
+
+    memory_cli.main(
+        ['--profile', 'task', '--memory-dir', str(tmp_path), 'show', task_id]
+    )
+    captured = capsys.readouterr()
+    shown = json.loads(captured.out)
+    assert shown['task']['description'] == 'fix parser'
+    assert [e['context'] for e in shown['entries']] == ['ctx0', 'ctx3']
+    # Only the linked entries are read back from disk.
+    report = json.loads(captured.err.splitlines()[-1])
+    assert report['counters']['files_opened'] == 2
+
+    memory_cli.main(['query', '--task-id', task_id, '--memory-dir', str(tmp_path)])
+    out = capsys.readouterr().out
+    assert out.count('"context"') == 2 and out.index('ctx3') < out.index('ctx0')
+
+    memory_cli.main(['task', '--memory-dir', str(tmp_path), 'show', 'missing'])
+    assert capsys.readouterr().out.strip() == 'Task not found'
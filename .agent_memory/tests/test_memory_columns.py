@@ -0,0 +1,117 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+import memory_columns
+import memory_storage
+import summarize_memory_entries as summary_mod
+from conftest import make_entry, write_entry_file
+
+SINCE = "2025-05-01T00:00:00"
+UNTIL = "2025-05-31T00:00:00"
+
+
+def _entry(ts: str, i: int) -> dict:
+    return make_entry(
+        ts,
+        i,
+        agent=f"agent-{i % 3}",
+        context=f"ctx {i}" + ("\0nul" if i == 7 else ""),
+        reflection=f"réflexion {i}",
+        tags=[["odd"], ["even", "x"], []][i % 3],
+    )
+
+
+@pytest.fixture
+def entries_dir(empty_memory_dir):
+    entries_dir = empty_memory_dir / "entries"
+    for i in range(12):
+        ts = f"2025-05-{1 + i % 4:02d}T{i:02d}:00:00"
+        write_entry_file(entries_dir, _entry(ts, i))
+    segment = [_entry(f"2025-05-{day:02d}T06:30:00", 20 + day) for day in range(1, 5)]
+    memory_storage.append_entries(entries_dir, segment, period="daily")
+    return entries_dir
+
+
+def _expected(entries_dir: Path, since: str, until: str) -> dict:
+    entries = summary_mod.load_entries(entries_dir)
+    entries = summary_mod.filter_entries(entries, since, until)
+    return summary_mod.summarize(entries, since, until)
+
+
+def _check(entries_dir: Path, since: str = SINCE, until: str = UNTIL) -> None:
+    with memory_columns.open_snapshot(entries_dir) as snapshot:
+        expected = _expected(entries_dir, since, until)
+        assert snapshot.summarize(since, until) == expected
+        assert snapshot.count_range(since, until) == expected["entry_count"]
+        assert snapshot.tag_counts(since, until) == expected["tag_counts"]
+
+
+@pytest.mark.parametrize(
+    "since, until",
+    [
+        (SINCE, UNTIL),
+        ("2025-05-02T03:00:00", "2025-05-03T06:30:00"),
+        ("2025-06-01T00:00:00", "2025-06-07T00:00:00"),
+    ],
+)
+def test_snapshot_matches_full_scan(entries_dir, since, until):
+    _check(entries_dir, since, until)
+    with memory_columns.open_snapshot(entries_dir, update=False) as snapshot:
+        assert snapshot.count == 16
+        assert sum(snapshot.agent_counts().values()) == 16
+
+
+def test_snapshot_follows_appends_and_rewrites(entries_dir, monkeypatch):
+    _check(entries_dir)
+    reads = []
+    parse = memory_columns._parse_file
+
+    def record(path, start):
+        reads.append((path.name, start))
+        return parse(path, start)
+
+    monkeypatch.setattr(memory_columns, "_parse_file", record)
+    # A late entry in an existing segment is read from the old end of file.
+    segment = memory_storage.append_entries(
+        entries_dir, [_entry("2025-05-02T00:30:00", 40)], period="daily"
+    )[0]
+    _check(entries_dir)
+    data = segment.read_bytes()
+    last = data.splitlines(keepends=True)[-1]
+    assert reads == [(segment.name, len(data) - len(last))]
+    reads.clear()
+    _check(entries_dir)
+    assert reads == []
+
+    write_entry_file(entries_dir, _entry("2025-05-01T00:10:00", 41))
+    _check(entries_dir)
+    (entries_dir / "2025-05-03T02:00:00.jsonl").unlink()
+    _check(entries_dir)
+    first = segment.read_bytes().splitlines(keepends=True)[0]
+    assert memory_storage.rewrite_entry_file(segment, [(0, len(first))]) == len(first)
+    _check(entries_dir)
+
+
+def test_parallel_sync_matches_sequential(entries_dir, tmp_path):
+    copy = tmp_path / "copy" / "entries"
+    shutil.copytree(entries_dir, copy)
+    memory_columns.sync(entries_dir)
+    memory_columns.sync(copy, jobs=2)
+    for name in memory_columns._FILES:
+        first = memory_columns.columns_dir(entries_dir) / name
+        second = memory_columns.columns_dir(copy) / name
+        assert first.read_bytes() == second.read_bytes()
+
+
+def test_interrupted_rewrite_rebuilds(entries_dir):
+    memory_columns.sync(entries_dir)
+    meta_path = memory_columns.columns_dir(entries_dir) / memory_columns.META_FILENAME
+    meta = json.loads(meta_path.read_text())
+    meta["partial"] = True
+    meta_path.write_text(json.dumps(meta))
+    with (memory_columns.columns_dir(entries_dir) / "ts.i64").open("ab") as f:
+        f.write(b"garbage")
+    _check(entries_dir)
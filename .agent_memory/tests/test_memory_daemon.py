@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import socket
+import threading
+
+import pytest
+
+import manage_notes
+import manage_tasks
+import memory_cli
+import memory_client
+import memory_daemon
+from conftest import ROOT
+
+
+def _start(tmp_path, handled):
+    def handler(argv, cwd):
+        handled.append(argv)
+        return memory_cli.run_argv(argv, cwd)
+
+    server = memory_daemon.make_server(memory_client.socket_path(tmp_path), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def test_cli_forwards_to_running_daemon(tmp_path, capsys):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    handled = []
+    server, thread = _start(tmp_path, handled)
+    try:
+        memory_cli.main(
+            ["add", "ctx", "obs", "refl", "--tags", "x", "--memory-dir", str(tmp_path)]
+        )
+        memory_cli.main(["task", "--memory-dir", str(tmp_path), "add", "write docs"])
+        capsys.readouterr()
+        memory_cli.main(["query", "--tags", "x", "--memory-dir", str(tmp_path)])
+        entry = json.loads(capsys.readouterr().out)
+        memory_cli.main(["task", "--memory-dir", str(tmp_path), "list"])
+        tasks = json.loads(capsys.readouterr().out)
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    assert [argv[0] for argv in handled] == ["add", "task", "query", "task"]
+    assert entry["context"] == "ctx"
+    assert tasks[0]["description"] == "write docs"
+    assert not memory_client.socket_path(tmp_path).exists()
+
+
+def test_daemon_applies_client_environment(tmp_path, monkeypatch):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    monkeypatch.setenv("CODEX_AGENT", "daemon")
+    server, thread = _start(tmp_path, [])
+    path = memory_client.socket_path(tmp_path)
+    try:
+        env = {"CODEX_AGENT": "planner", memory_cli.TRACE_ENV: None}
+        argv = ["add", "ctx", "obs", "refl", "--memory-dir", str(tmp_path)]
+        assert memory_client.request(path, argv, env=env)["code"] == 0
+        query = ["query", "--memory-dir", str(tmp_path)]
+        response = memory_client.request(path, query)
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    assert json.loads(response["stdout"])["agent"] == "planner"
+    assert os.environ["CODEX_AGENT"] == "daemon"
+
+
+def test_cli_does_not_rerun_after_daemon_failure(tmp_path, capsys):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    path = memory_client.socket_path(tmp_path)
+    path.parent.mkdir(parents=True)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen()
+
+    def accept_and_drop():
+        conn, _ = listener.accept()
+        conn.recv(65536)
+        conn.close()
+
+    thread = threading.Thread(target=accept_and_drop, daemon=True)
+    thread.start()
+    try:
+        argv = ["add", "ctx", "obs", "refl", "--memory-dir", str(tmp_path)]
+        with pytest.raises(SystemExit) as exc:
+            memory_cli.main(argv)
+    finally:
+        thread.join()
+        listener.close()
+    assert exc.value.code == 1
+    assert "No valid response from the memory daemon" in capsys.readouterr().err
+    assert not list((tmp_path / "entries").glob("**/*.jsonl"))
+
+
+def test_cli_falls_back_when_daemon_is_gone(tmp_path, capsys):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    path = memory_client.socket_path(tmp_path)
+    server = memory_daemon.make_server(path, memory_cli.run_argv)
+    server.socket.close()  # leaves a stale socket file behind
+
+    memory_cli.main(["add", "ctx", "obs", "refl", "--memory-dir", str(tmp_path)])
+    memory_cli.main(["query", "--memory-dir", str(tmp_path)])
+    assert json.loads(capsys.readouterr().out)["context"] == "ctx"
+
+    # A new daemon replaces the stale socket.
+    memory_daemon.make_server(path, memory_cli.run_argv).server_close()
+
+
+def test_daemon_caches_task_and_note_lists(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(memory_cli, "_stores", {})
+
+    def run(*argv):
+        memory_cli.run_argv([argv[0], "--memory-dir", str(tmp_path), *argv[1:]], "/")
+        return json.loads(capsys.readouterr().out)
+
+    manage_tasks.add_task("first", task_file=tmp_path / "tasks.json")
+    manage_notes.add_note("remember", note_file=tmp_path / "notes.json")
+    assert [t["description"] for t in run("task", "list")] == ["first"]
+    assert [n["content"] for n in run("note", "list")] == ["remember"]
+
+    # Later requests only replay the log lines appended since.
+    store = memory_cli._stores[tmp_path]
+    monkeypatch.setattr(type(store._tasks), "_reload", None)
+    second = manage_tasks.add_task("second", task_file=tmp_path / "tasks.json")
+    assert run("task", "list", "--limit", "1") == [second]
+    assert run("task", "show", second["id"])["task"] == second
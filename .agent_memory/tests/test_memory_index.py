@@ -0,0 +1,291 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+import memory_cli
+import memory_index
+import memory_search
+import memory_vectors
+import query_memory_entries as query_mod
+from conftest import ROOT
+
+
+def _write_entry(entries_dir: Path, ts: str, tags: list[str], **extra) -> None:
+    entry = {
+        "ts": ts,
+        "agent": "test",
+        "run_id": ts,
+        "context": f"ctx {ts}",
+        "observation": "obs",
+        "reflection": "refl",
+        "tags": tags,
+        **extra,
+    }
+    entries_dir.mkdir(parents=True, exist_ok=True)
+    with (entries_dir / f"{ts}.jsonl").open("a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+@pytest.fixture
+def memory_dir(tmp_path):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    entries_dir = tmp_path / "entries"
+    _write_entry(entries_dir, "2025-05-01T10:00:00", ["a"])
+    _write_entry(entries_dir, "2025-05-02T10:00:00", ["b"])
+    _write_entry(entries_dir, "2025-05-03T10:00:00", ["a", "b"])
+    return tmp_path
+
+
+def test_query_uses_index_and_orders_newest_first(memory_dir):
+    entries = list(memory_index.query_entries(memory_dir / "entries", last=2))
+    assert [e["ts"] for e in entries] == ["2025-05-03T10:00:00", "2025-05-02T10:00:00"]
+    assert memory_index.index_path(memory_dir / "entries").exists()
+
+
+def test_query_filters_by_tag_and_time_range(memory_dir):
+    entries = list(
+        memory_index.query_entries(
+            memory_dir / "entries", tags=["a"], since="2025-05-02T00:00:00"
+        )
+    )
+    assert [e["ts"] for e in entries] == ["2025-05-03T10:00:00"]
+
+
+def test_index_picks_up_new_and_removed_files(memory_dir):
+    entries_dir = memory_dir / "entries"
+    assert len(list(memory_index.query_entries(entries_dir))) == 3
+    _write_entry(entries_dir, "2025-05-04T10:00:00", [])
+    (entries_dir / "2025-05-01T10:00:00.jsonl").unlink()
+    assert memory_index.rebuild_index(entries_dir) == 3
+    entries = list(memory_index.query_entries(entries_dir))
+    assert entries[0]["ts"] == "2025-05-04T10:00:00"
+    assert entries[-1]["ts"] == "2025-05-02T10:00:00"
+
+
+def test_cli_add_updates_index(memory_dir, capsys):
+    memory_cli.main(["reindex", "--memory-dir", str(memory_dir)])
+    assert "Indexed 3 entries" in capsys.readouterr().out
+    memory_cli.main(["add", "new", "obs", "refl", "--memory-dir", str(memory_dir)])
+    memory_cli.main(["query", "--last", "1", "--memory-dir", str(memory_dir)])
+    out = capsys.readouterr().out
+    assert json.loads(out)["context"] == "new"
+
+
+def test_changed_files_are_indexed_without_listing(memory_dir, monkeypatch):
+    entries_dir = memory_dir / "entries"
+    memory_index.update_index(entries_dir)
+    _write_entry(entries_dir, "2025-05-02T10:00:00", ["c"])
+    _write_entry(entries_dir, "2025-05-04T10:00:00", [])
+    monkeypatch.setattr(memory_index.storage, "iter_entry_files", None)
+    memory_index.update_index(
+        entries_dir, changed=[entries_dir / "2025-05-02T10:00:00.jsonl"]
+    )
+    monkeypatch.undo()
+    conn = memory_index.connect(entries_dir)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 4
+    finally:
+        conn.close()
+    # The next query still lists the directory and finds the other new file.
+    assert len(list(memory_index.query_entries(entries_dir))) == 5
+
+
+def test_kept_connection_follows_rebuilds(memory_dir, monkeypatch):
+    entries_dir = memory_dir / "entries"
+    monkeypatch.setattr(memory_index, "_kept", {})
+    assert len(list(memory_index.query_entries(entries_dir))) == 3
+    (conn,) = [conn for _, conn in memory_index._kept.values()]
+    assert len(list(memory_index.query_entries(entries_dir, last=1))) == 1
+    assert [conn for _, conn in memory_index._kept.values()] == [conn]
+
+    # Another process rebuilding the index replaces the database file.
+    shutil.copy(memory_index.index_path(entries_dir), memory_dir / "copy")
+    memory_index.index_path(entries_dir).unlink()
+    shutil.copy(memory_dir / "copy", memory_index.index_path(entries_dir))
+    _write_entry(entries_dir, "2025-05-04T10:00:00", [])
+    assert len(list(memory_index.query_entries(entries_dir))) == 4
+    assert [conn for _, conn in memory_index._kept.values()] != [conn]
+    memory_index._forget(memory_index.index_path(entries_dir))
+
+
+@pytest.mark.parametrize(
+    "search, expected",
+    [
+        ("parser timeout", ["2025-06-01T00:00:00"]),
+        ("parser OR cache", ["2025-06-03T00:00:00", "2025-06-01T00:00:00"]),
+        ("time*", ["2025-06-02T00:00:00", "2025-06-01T00:00:00"]),
+        ("context:parser", ["2025-06-01T00:00:00"]),
+        ("reflection:parser", []),
+        ("tags:perf", ["2025-06-03T00:00:00"]),
+        ("pars", []),
+    ],
+)
+def test_word_search_index_matches_scan(tmp_path, search, expected):
+    _check_search(tmp_path, search, expected, words=True)
+
+
+@pytest.mark.parametrize(
+    "search, expected",
+    [
+        ("pars", ["2025-06-01T00:00:00"]),
+        ("PARSER hit", ["2025-06-01T00:00:00"]),
+        ("med ou", ["2025-06-02T00:00:00"]),
+        ("d a c", ["2025-06-03T00:00:00"]),
+        ("-06-0", ["2025-06-03T00:00:00", "2025-06-02T00:00:00"]),
+        ("perf", []),
+        ("timeout twice", []),
+        (" a ", ["2025-06-03T00:00:00", "2025-06-01T00:00:00"]),
+        # Nothing to look up in the index, so every entry is checked.
+        ("-", ["2025-06-03T00:00:00", "2025-06-02T00:00:00"]),
+    ],
+)
+def test_substring_search_index_matches_scan(tmp_path, search, expected):
+    _check_search(tmp_path, search, expected, words=False)
+
+
+def _check_search(tmp_path, search, expected, words):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    entries_dir = tmp_path / "entries"
+    _write_entry(
+        entries_dir, "2025-06-01T00:00:00", [], context="Parser", observation="hit a timeout"
+    )
+    _write_entry(entries_dir, "2025-06-02T00:00:00", [], observation="timed out twice")
+    _write_entry(entries_dir, "2025-06-03T00:00:00", ["perf"], reflection="add a cache")
+
+    indexed = memory_index.query_entries(entries_dir, search=search, words=words)
+    assert [e["ts"] for e in indexed] == expected
+    first = memory_index.query_entries(entries_dir, search=search, last=1, words=words)
+    assert [e["ts"] for e in first] == expected[:1]
+
+    scanned = query_mod.filter_entries(
+        query_mod.load_entries(entries_dir), None, None, None, search, words=words
+    )
+    assert [e["ts"] for e in scanned] == expected
+
+
+def test_prune_removes_entries_from_search_index(memory_dir, capsys):
+    entries_dir = memory_dir / "entries"
+    assert len(list(memory_index.query_entries(entries_dir, search="ctx"))) == 3
+    memory_cli.main(["prune", "--keep-last", "1", "--memory-dir", str(memory_dir)])
+    conn = memory_index.connect(entries_dir)
+    try:
+        entry_ids = {row[0] for row in conn.execute("SELECT entry_id FROM postings")}
+        assert len(entry_ids) == 1
+    finally:
+        conn.close()
+
+
+def test_recall_ranks_by_bm25_and_matches_scan(tmp_path, capsys):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    entries_dir = tmp_path / "entries"
+    _write_entry(entries_dir, "2025-06-01T00:00:00", [], context="parser crash on unicode")
+    _write_entry(
+        entries_dir,
+        "2025-06-02T00:00:00",
+        ["parser"],
+        context="parser rewrite",
+        observation="parser is faster",
+    )
+    _write_entry(entries_dir, "2025-06-03T00:00:00", [], context="deploy scripts")
+    _write_entry(entries_dir, "2025-06-04T00:00:00", [], context="parser removed")
+    assert len(memory_index.recall_entries(entries_dir, "parser", top_k=5)) == 3
+    (entries_dir / "2025-06-04T00:00:00.jsonl").unlink()
+
+    ranked = memory_index.recall_entries(entries_dir, "how is the parser", top_k=2)
+    assert [e["ts"] for _, e in ranked] == ["2025-06-02T00:00:00", "2025-06-01T00:00:00"]
+    assert ranked[0][0] > ranked[1][0]
+
+    scanned = memory_search.rank(query_mod.load_entries(entries_dir), "how is the parser", 2)
+    assert [round(s, 6) for s, _ in scanned] == [round(s, 6) for s, _ in ranked]
+
+    memory_cli.main(["recall", "deploy", "--top-k", "1", "--memory-dir", str(tmp_path)])
+    out = json.loads(capsys.readouterr().out)
+    assert out["context"] == "deploy scripts"
+    assert out["score"] > 0
+
+
+def _corrupt_in_place(path: Path) -> None:
+    """Break ``path``'s JSON without changing what the index checks."""
+    st = path.stat()
+    path.write_bytes(b"[" + path.read_bytes()[1:])
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def test_recall_keeps_scores_with_their_entries_when_one_is_unreadable(tmp_path):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    entries_dir = tmp_path / "entries"
+    _write_entry(entries_dir, "2025-06-01T00:00:00", [], context="parser parser parser")
+    _write_entry(entries_dir, "2025-06-02T00:00:00", [], context="parser parser")
+    _write_entry(entries_dir, "2025-06-03T00:00:00", [], context="parser")
+    ranked = memory_index.recall_entries(entries_dir, "parser", top_k=3)
+    scores = {e["ts"]: score for score, e in ranked}
+
+    _corrupt_in_place(entries_dir / "2025-06-01T00:00:00.jsonl")
+    ranked = memory_index.recall_entries(entries_dir, "parser", top_k=3)
+    assert [(score, e["ts"]) for score, e in ranked] == [
+        (scores["2025-06-02T00:00:00"], "2025-06-02T00:00:00"),
+        (scores["2025-06-03T00:00:00"], "2025-06-03T00:00:00"),
+    ]
+
+
+def test_similar_uses_vector_index_and_skips_pruned_rows(tmp_path, capsys):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    entries_dir = tmp_path / "entries"
+    _write_entry(entries_dir, "2025-06-01T00:00:00", [], context="tokenizer handles unicode")
+    _write_entry(entries_dir, "2025-06-02T00:00:00", [], context="deploy pipeline fixed")
+    _write_entry(entries_dir, "2025-06-03T00:00:00", [], context="unicode tokenizer bug")
+
+    ranked = memory_index.similar_entries(entries_dir, "unicode tokenizer", top_k=2)
+    assert {e["ts"] for _, e in ranked} == {"2025-06-01T00:00:00", "2025-06-03T00:00:00"}
+
+    index_dir = memory_index.index_path(entries_dir).parent
+    assert memory_vectors.vector_count(index_dir) == 3
+
+    (entries_dir / "2025-06-03T00:00:00.jsonl").unlink()
+    memory_cli.main(["similar", "unicode tokenizer", "--top-k", "1", "--memory-dir", str(tmp_path)])
+    out = json.loads(capsys.readouterr().out)
+    assert out["ts"] == "2025-06-01T00:00:00"
+    assert 0 < out["similarity"] <= 1
+
+
+def test_similar_keeps_scores_aligned_and_rejects_top_k_below_one(tmp_path, capsys):
+    shutil.copy(ROOT / "schema.json", tmp_path / "schema.json")
+    entries_dir = tmp_path / "entries"
+    _write_entry(entries_dir, "2025-06-01T00:00:00", [], context="unicode tokenizer")
+    _write_entry(
+        entries_dir, "2025-06-02T00:00:00", [], context="unicode tokenizer bug"
+    )
+    _write_entry(entries_dir, "2025-06-03T00:00:00", [], context="unicode parser")
+    ranked = memory_index.similar_entries(entries_dir, "unicode tokenizer", top_k=3)
+    scores = {e["ts"]: score for score, e in ranked}
+    assert memory_index.similar_entries(entries_dir, "unicode tokenizer", top_k=0) == []
+
+    _corrupt_in_place(entries_dir / "2025-06-01T00:00:00.jsonl")
+    ranked = memory_index.similar_entries(entries_dir, "unicode tokenizer", top_k=3)
+    assert ranked == [(scores[e["ts"]], e) for _, e in ranked]
+    assert len(ranked) == 2
+
+    for command in ("similar", "recall"):
+        with pytest.raises(SystemExit):
+            memory_cli.main([command, "unicode", "--top-k", "0"])
+        assert "must be at least 1" in capsys.readouterr().err
+
+
+def test_nearest_pure_python_fallback_agrees(tmp_path, monkeypatch):
+    pending = memory_vectors.PendingVectors()
+    for i, text in enumerate(["parser error", "deploy fixed", "parser crash"]):
+        pending.add(i + 1, {"context": text})
+    pending.commit(tmp_path)
+    pending.close()
+
+    expected = memory_vectors.nearest(tmp_path, "parser", top_k=2)
+    monkeypatch.setattr(memory_vectors, "_numpy", lambda: None)
+    fallback = memory_vectors.nearest(tmp_path, "parser", top_k=2)
+    assert [i for _, i in fallback] == [i for _, i in expected]
+    assert set(i for _, i in fallback) == {1, 3}
+    # Reading past the first candidates continues in order.
+    ranked = list(memory_vectors.iter_nearest(tmp_path, "parser", first=1))
+    assert ranked[:2] == fallback and [i for _, i in ranked[2:]] == [2]
@@ -0,0 +1,84 @@
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import memory_cli
+import memory_parallel
+import memory_storage
+from conftest import make_entry, write_entry_file
+
+
+def _entry(ts: str, i: int) -> dict:
+    return make_entry(
+        ts,
+        i,
+        observation="timeout" if i % 3 else "obs",
+        tags=["odd"] if i % 2 else ["even"],
+    )
+
+
+@pytest.fixture
+def memory_dir(empty_memory_dir):
+    entries_dir = empty_memory_dir / "entries"
+    # Per-entry files and segments covering the same days, so shards overlap.
+    for i in range(24):
+        ts = f"2025-05-{1 + i % 6:02d}T{i:02d}:00:00"
+        write_entry_file(entries_dir, _entry(ts, i))
+    segment = [
+        _entry(f"2025-05-{day:02d}T{hour:02d}:00:00", 100 + day * 10 + hour)
+        for day in range(2, 6)
+        for hour in (3, 9, 9, 21)
+    ]
+    memory_storage.append_entries(entries_dir, segment, period="daily")
+    return empty_memory_dir
+
+
+@pytest.mark.parametrize("newest_first", [True, False])
+@pytest.mark.parametrize(
+    "where",
+    [None, memory_parallel.Filter(["odd"], "2025-05-02T05:00:00", None, "timeout")],
+)
+def test_parallel_loader_matches_sequential(memory_dir, newest_first, where):
+    entries_dir = memory_dir / "entries"
+
+    def load(jobs):
+        located = memory_parallel.iter_located(
+            entries_dir, jobs, newest_first=newest_first, where=where
+        )
+        return list(located)
+
+    sequential = load(1)
+    assert load(3) == sequential
+    assert len(sequential) == (40 if where is None else 15)
+
+
+def _index_rows(memory_dir: Path) -> list:
+    conn = sqlite3.connect(memory_dir / "index" / "entries.sqlite3")
+    try:
+        return [
+            list(conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2"))
+            for table in ("files", "entries", "entry_tags", "postings", "term_stats")
+        ]
+    finally:
+        conn.close()
+
+
+def test_jobs_option_gives_same_index_and_summary(memory_dir, monkeypatch, capsys):
+    monkeypatch.setenv("AGENT_MEMORY_NO_DAEMON", "1")
+    results = []
+    for jobs in ("1", "2"):
+        shutil.rmtree(memory_dir / "weekly_summaries", ignore_errors=True)
+        output = memory_dir / f"summary-{jobs}.json"
+        memory_cli.main(["reindex", "--jobs", jobs, "--memory-dir", str(memory_dir)])
+        memory_cli.main([
+            "summarize",
+            "--since", "2025-05-01T00:00:00",
+            "--until", "2025-05-04T12:00:00",
+            "--jobs", jobs, "--output", str(output), "--memory-dir", str(memory_dir),
+        ])
+        vectors = (memory_dir / "index" / "vectors.f32").read_bytes()
+        results.append((_index_rows(memory_dir), vectors, output.read_text()))
+    assert results[0] == results[1]
+    assert "Indexed 40 entries" in capsys.readouterr().out
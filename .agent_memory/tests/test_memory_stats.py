@@ -0,0 +1,89 @@
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import memory_cli
+import memory_index
+import memory_stats
+import memory_storage
+from conftest import make_entry, write_entry_file
+
+
+@pytest.fixture
+def memory_dir(empty_memory_dir, monkeypatch):
+    monkeypatch.setenv("AGENT_MEMORY_NO_DAEMON", "1")
+    entries_dir = empty_memory_dir / "entries"
+    entries = [
+        make_entry(ts, i, agent=agent, tags=tags)
+        for i, (ts, agent, tags) in enumerate([
+            ("2025-05-01T09:00:00", "planner", ["perf", "db"]),
+            ("2025-05-01T23:30:00", "coder", ["perf", "perf"]),
+            ("2025-05-02T08:00:00", "coder", ["db", "perf", "retry"]),
+            ("2025-05-03T12:00:00", "planner", []),
+        ])
+    ]
+    for entry in entries[:2]:
+        write_entry_file(entries_dir, entry)
+    memory_storage.append_entries(entries_dir, entries[2:], period="daily")
+    return empty_memory_dir
+
+
+def _stats(memory_dir: Path, capsys, *argv: str) -> dict:
+    memory_cli.main(["stats", *argv, "--memory-dir", str(memory_dir)])
+    return json.loads(capsys.readouterr().out)
+
+
+def _scanned(memory_dir: Path, since=None, until=None, tag=None, top=None) -> dict:
+    entries = memory_storage.iter_records(memory_dir / "entries")
+    totals = memory_stats.scan(entries, since, until, tag)
+    return memory_stats.report(totals, since, until, tag, top)
+
+
+def test_stats_counts_tags_agents_and_days(memory_dir, capsys):
+    report = _stats(memory_dir, capsys, "--tag", "perf")
+    assert report == _scanned(memory_dir, tag="perf")
+    assert report["entries"] == 4
+    assert report["tags"] == {"perf": 3, "db": 2, "retry": 1}
+    assert report["agents"] == {"coder": 2, "planner": 2}
+    assert report["days"]["2025-05-01"] == {"coder": 1, "planner": 1}
+    assert report["cooccurring"] == {"db": 2, "retry": 1}
+
+    # Whole days are counted, whatever the time of day in the bounds.
+    report = _stats(
+        memory_dir, capsys, "--since", "2025-05-01T12:00:00", "--until", "2025-05-02",
+        "--top", "1",
+    )
+    assert report["since"] == "2025-05-01" and report["entries"] == 3
+    assert report["tags"] == {"perf": 3}
+    assert "cooccurring" not in report
+
+
+def test_stats_follow_add_and_prune(memory_dir, capsys):
+    _stats(memory_dir, capsys)
+    memory_cli.main([
+        "add", "ctx", "obs", "refl", "--tags", "perf", "db",
+        "--memory-dir", str(memory_dir),
+    ])
+    memory_cli.main([
+        "prune", "--before", "2025-05-02T00:00:00", "--memory-dir", str(memory_dir)
+    ])
+    capsys.readouterr()
+    report = _stats(memory_dir, capsys, "--tag", "db")
+    assert report == _scanned(memory_dir, tag="db")
+    assert report["entries"] == 3
+    conn = sqlite3.connect(memory_index.index_path(memory_dir / "entries"))
+    try:
+        days = {row[0] for row in conn.execute("SELECT day FROM tag_days")}
+    finally:
+        conn.close()
+    assert "2025-05-01" not in days
+
+
+def test_stats_fall_back_to_scanning(memory_dir, capsys):
+    # A directory where the database should be cannot be opened.
+    memory_index.index_path(memory_dir / "entries").mkdir(parents=True)
+    report = _stats(memory_dir, capsys, "--since", "2025-05-02", "--tag", "db")
+    assert report == _scanned(memory_dir, "2025-05-02", None, "db")
+    assert report["entries"] == 2
@@ -0,0 +1,244 @@
+import json
+from itertools import islice
+from pathlib import Path
+
+import pytest
+
+import export_memory_markdown as export_mod
+import memory_cli
+import memory_storage
+import query_memory_entries as query_mod
+import summarize_memory_entries as summary_mod
+from conftest import make_entry, write_entry_file
+
+
+def _parse_printed(out: str) -> list[dict]:
+    decoder = json.JSONDecoder()
+    entries, pos = [], 0
+    out = out.strip()
+    while pos < len(out):
+        entry, pos = decoder.raw_decode(out, pos)
+        entries.append(entry)
+        pos = len(out) - len(out[pos:].lstrip())
+    return entries
+
+
+def _setup(memory_dir: Path, timestamps: list[str]) -> Path:
+    entries_dir = memory_dir / "entries"
+    for i, ts in enumerate(timestamps):
+        write_entry_file(entries_dir, make_entry(ts, i))
+    return entries_dir
+
+
+def test_compact_moves_entries_into_daily_segments(empty_memory_dir, capsys):
+    dir_args = ["--memory-dir", str(empty_memory_dir)]
+    entries_dir = _setup(
+        empty_memory_dir,
+        ["2025-05-01T10:00:00", "2025-05-01T12:00:00", "2025-05-02T09:00:00"],
+    )
+    memory_cli.main(["compact", *dir_args])
+    assert "Compacted 3 entries from 3 files into 2 segments" in capsys.readouterr().out
+
+    assert list(entries_dir.glob("*.jsonl")) == []
+    segment = entries_dir / "segments" / "2025-05-01.jsonl"
+    lines = segment.read_bytes().splitlines(keepends=True)
+    offsets = memory_storage.read_offsets(segment)
+    assert list(offsets) == [0, len(lines[0])]
+    assert memory_storage.load_layout(entries_dir)["layout"] == "segments"
+
+    for loader in (query_mod.load_entries, summary_mod.load_entries, export_mod.load_entries):
+        assert len(loader(entries_dir)) == 3
+
+
+def test_add_appends_to_segment_and_index_sees_it(empty_memory_dir, capsys):
+    dir_args = ["--memory-dir", str(empty_memory_dir)]
+    entries_dir = _setup(empty_memory_dir, ["2025-05-01T10:00:00"])
+    memory_cli.main(["compact", "--period", "weekly", *dir_args])
+    memory_cli.main(["add", "first", "obs", "refl", *dir_args])
+    memory_cli.main(["add", "second", "obs", "refl", *dir_args])
+    capsys.readouterr()
+
+    segments = sorted((entries_dir / "segments").glob("*.jsonl"))
+    assert segments[0].name == "2025-W18.jsonl"
+    assert len(segments[-1].read_text().splitlines()) == 2
+
+    memory_cli.main(["query", "--last", "2", *dir_args])
+    out = capsys.readouterr().out
+    assert [e["context"] for e in _parse_printed(out)] == ["second", "first"]
+
+
+def test_sealed_entries_skip_validation_unless_strict_or_tampered(monkeypatch):
+    line = memory_storage.seal_entry(make_entry("2025-05-01T10:00:00", 1))
+    assert '"_chk": "' in line
+
+    def fail(*args, **kwargs):
+        raise AssertionError("validator should not be used")
+
+    monkeypatch.setattr(memory_storage, "load_validator", fail)
+    record = memory_storage.parse_line(line)
+    assert "_chk" not in record
+    assert record["context"] == "ctx 1"
+
+    monkeypatch.undo()
+    tampered = line.replace('"obs"', "5")
+    with pytest.raises(memory_storage.InvalidEntryError):
+        memory_storage.parse_line(tampered)
+    legacy = json.dumps({"ts": "2025-05-01T10:00:00"})
+    with pytest.raises(memory_storage.InvalidEntryError):
+        memory_storage.parse_line(legacy)
+    assert memory_storage.parse_line(line, strict=True)["agent"] == "test"
+
+
+def test_iter_records_is_ordered_and_stops_reading_early(empty_memory_dir, monkeypatch):
+    entries_dir = _setup(
+        empty_memory_dir,
+        ["2025-05-01T10:00:00", "2025-05-03T10:00:00", "2025-05-02T10:00:00"],
+    )
+    memory_storage.append_entries(
+        entries_dir,
+        [make_entry("2025-05-02T12:00:00", 3), make_entry("2025-05-02T08:00:00", 4)],
+    )
+
+    opened = []
+    original = memory_storage.iter_file_records
+
+    def tracking(path, strict=False):
+        opened.append(path.name)
+        return original(path, strict)
+
+    monkeypatch.setattr(memory_storage, "iter_file_records", tracking)
+    newest = list(islice(memory_storage.iter_records(entries_dir), 1))
+    assert newest[0]["ts"] == "2025-05-03T10:00:00"
+    assert opened == ["2025-05-03T10:00:00.jsonl"]
+
+    ordered = [e["ts"] for e in memory_storage.iter_records(entries_dir, newest_first=False)]
+    assert ordered == sorted(ordered)
+    assert len(ordered) == 5
+
+
+def test_add_batch_validates_fills_defaults_and_writes_segments(
+    empty_memory_dir, capsys
+):
+    dir_args = ["--memory-dir", str(empty_memory_dir)]
+    entries_dir = _setup(empty_memory_dir, ["2025-05-01T09:00:00"])
+    batch = empty_memory_dir / "batch.jsonl"
+    bare = {"context": "bare", "observation": "o", "reflection": "r"}
+    lines = [
+        json.dumps(make_entry("2025-05-02T10:00:00", 1)),
+        json.dumps({**bare, "ts": "2025-05-02T11:00:00"}),
+        "",
+        json.dumps({"context": "missing fields"}),
+        "{not json",
+        json.dumps({**bare, "ts": "2025-05-03T08:00:00", "_chk": "stale"}),
+    ]
+    batch.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    memory_cli.main(["add-batch", "--from", str(batch), *dir_args])
+    captured = capsys.readouterr()
+    assert captured.out.startswith("Added 3 entries in ")
+    assert "line 4:" in captured.err and "line 5:" in captured.err
+
+    segments = sorted(p.name for p in (entries_dir / "segments").glob("*.jsonl"))
+    assert segments == ["2025-05-02.jsonl", "2025-05-03.jsonl"]
+
+    memory_cli.main(["query", *dir_args])
+    entries = _parse_printed(capsys.readouterr().out)
+    assert [e["ts"] for e in entries] == [
+        "2025-05-03T08:00:00",
+        "2025-05-02T11:00:00",
+        "2025-05-02T10:00:00",
+        "2025-05-01T09:00:00",
+    ]
+    filled = entries[:2]
+    assert filled[0]["run_id"] == filled[1]["run_id"]
+    assert filled[0]["tags"] == [] and "_chk" not in filled[0]
+    # Every written line passes full schema validation.
+    assert len(list(query_mod.iter_entries(entries_dir, True))) == 4
+
+
+def test_add_batch_stores_offset_timestamps_as_naive_utc(empty_memory_dir, capsys):
+    dir_args = ["--memory-dir", str(empty_memory_dir)]
+    entries_dir = _setup(empty_memory_dir, ["2025-05-01T09:00:00"])
+    batch = empty_memory_dir / "batch.jsonl"
+    lines = [
+        json.dumps(make_entry("2025-05-02T10:00:00+02:00", 1)),
+        json.dumps(make_entry("2025-05-03T10:00:00Z", 2)),
+    ]
+    batch.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    memory_cli.main(["add-batch", "--from", str(batch), *dir_args])
+
+    stored = [e["ts"] for e in query_mod.iter_entries(entries_dir, True)]
+    assert sorted(stored) == [
+        "2025-05-01T09:00:00",
+        "2025-05-02T08:00:00",
+        "2025-05-03T10:00:00",
+    ]
+
+    output = empty_memory_dir / "summary.json"
+    memory_cli.main(
+        [
+            "summarize",
+            "--since", "2025-05-01T00:00:00",
+            "--until", "2025-05-03T23:59:59",
+            "--strict",
+            "--output", str(output),
+            *dir_args,
+        ]
+    )
+    assert json.loads(output.read_text())["entry_count"] == 3
+    memory_cli.main(["prune", "--older-than", "1", *dir_args])
+    capsys.readouterr()
+    assert list(query_mod.iter_entries(entries_dir, True)) == []
+
+
+def test_partitioned_layout_skips_files_outside_time_range(empty_memory_dir, capsys):
+    dir_args = ["--memory-dir", str(empty_memory_dir)]
+    timestamps = [
+        "2024-12-31T23:00:00",
+        "2025-04-30T10:00:00",
+        "2025-05-01T10:00:00",
+        "2025-05-02T10:00:00",
+        "2025-05-02T18:00:00",
+    ]
+    entries_dir = _setup(empty_memory_dir, timestamps)
+    memory_cli.main(["partition", *dir_args])
+    assert "Moved 5 entry files" in capsys.readouterr().out
+    assert not list(entries_dir.glob("*.jsonl"))
+    assert (entries_dir / "2025" / "05" / "02" / "2025-05-02T18:00:00.jsonl").exists()
+
+    # New entries go straight into their partition and show up in the index.
+    memory_cli.main(["add", "ctx", "obs", "refl", *dir_args])
+    assert len(list(entries_dir.glob("[0-9]*/*/*/*.jsonl"))) == 6
+    memory_cli.main(["query", "--last", "1", *dir_args])
+    assert _parse_printed(capsys.readouterr().out)[0]["context"] == "ctx"
+
+    since = memory_storage.datetime.fromisoformat("2025-05-02T00:00:00")
+    until = memory_storage.datetime.fromisoformat("2025-05-02T12:00:00")
+    days = list(memory_storage.iter_partitions(entries_dir, since, until))
+    assert days == [entries_dir / "2025" / "05" / "02"]
+
+    opened = []
+    original = memory_storage.iter_file_records
+
+    def tracking(path, strict=False):
+        opened.append(path.name)
+        return original(path, strict)
+
+    memory_storage.iter_file_records = tracking
+    try:
+        window = (since.isoformat(), until.isoformat())
+        entries = query_mod.filter_entries(
+            query_mod.iter_entries(entries_dir, False, *window), None, *window, None
+        )
+        assert [e["ts"] for e in entries] == ["2025-05-02T10:00:00"]
+    finally:
+        memory_storage.iter_file_records = original
+    assert opened == ["2025-05-02T10:00:00.jsonl"]
+
+    window = ("2025-04-30T00:00:00", "2025-05-01T23:59:59")
+    assert len(summary_mod.load_entries(entries_dir, False, *window)) == 2
+    assert len(export_mod.load_entries(entries_dir, False, *window)) == 2
+
+    # Pruning removes emptied partitions.
+    memory_cli.main(["prune", "--before", "2025-01-01T00:00:00", *dir_args])
+    assert not (entries_dir / "2024").exists()
@@ -0,0 +1,89 @@
+from pathlib import Path
+
+import manage_tasks
+import memory_cli
+import memory_storage
+import memory_store
+import query_memory_entries as query_mod
+import summarize_memory_entries as summary_mod
+from conftest import make_entry, write_entry_file
+
+
+def _entry(ts: str, i: int, tags: list[str]) -> dict:
+    observation = "timeout" if "perf" in tags else "obs"
+    return make_entry(ts, i, observation=observation, tags=tags)
+
+
+def _setup(memory_dir: Path) -> Path:
+    entries_dir = memory_dir / "entries"
+    for day in range(1, 6):
+        tags = ["perf"] if day % 2 else ["docs"]
+        write_entry_file(entries_dir, _entry(f"2025-05-0{day}T12:00:00", day, tags))
+    return entries_dir
+
+
+def test_store_queries_match_cli_and_pick_up_external_changes(
+    empty_memory_dir, monkeypatch
+):
+    entries_dir = _setup(empty_memory_dir)
+    store = memory_store.MemoryStore(empty_memory_dir, poll_interval=0)
+
+    def scan(tags=None, since=None, until=None, search=None):
+        return list(
+            query_mod.filter_entries(
+                query_mod.load_entries(entries_dir), tags, since, until, search
+            )
+        )
+
+    assert store.query() == scan()
+    assert store.query(tags=["perf"], last=2) == scan(["perf"])[:2]
+    window = ("2025-05-02T00:00:00", "2025-05-04T12:00:00")
+    assert store.query(since=window[0], until=window[1]) == scan(None, *window)
+    assert store.query(search="timeout") == scan(search="timeout")
+    since, until = "2025-05-01T00:00:00", "2025-05-03T23:59:59"
+    assert store.summarize(since, until) == summary_mod.summarize_range(
+        entries_dir, since, until
+    )
+
+    # Cached entries are not re-read from disk.
+    monkeypatch.setattr(memory_store.storage, "parse_line", None)
+    assert len(store.query(last=3)) == 3
+    monkeypatch.undo()
+
+    # Changes made by other writers show up once the stamp changes.
+    memory_storage.append_entries(
+        entries_dir, [_entry("2025-05-06T00:00:00", 6, ["perf"])], period="daily"
+    )
+    assert store.query(last=1)[0]["ts"] == "2025-05-06T00:00:00"
+    memory_storage.append_entries(
+        entries_dir, [_entry("2025-04-30T00:00:00", 0, [])], period="daily"
+    )
+    assert store.query()[-1]["ts"] == "2025-04-30T00:00:00"
+    memory_cli.main(
+        ["prune", "--keep-last", "3", "--memory-dir", str(empty_memory_dir)]
+    )
+    assert len(store) == 3
+
+    entry = store.add("own", "obs", "refl", ["perf"], task_id="t1")
+    assert store.query(tags=["perf"], last=1) == [entry]
+    assert store.query(task_id="t1") == [entry]
+
+
+def test_store_tasks_and_notes_follow_the_op_log(tmp_path):
+    store = memory_store.MemoryStore(tmp_path)
+    task = store.add_task("write docs")
+    other = manage_tasks.add_task("external", task_file=tmp_path / "tasks.json")
+    assert [t["id"] for t in store.tasks()] == [task["id"], other["id"]]
+
+    assert store.update_task(task["id"], status="finished")
+    assert store.task(task["id"])["status"] == "finished"
+    manage_tasks.save_tasks(
+        manage_tasks.load_tasks(tmp_path / "tasks.json"), tmp_path / "tasks.json"
+    )
+    assert store.remove_task(other["id"])
+    assert store.tasks() == [dict(task, status="finished")]
+
+    note = store.add_note("prefer segments")
+    assert store.notes(limit=1) == [note]
+    assert store.remove_note(note["id"])
+    assert store.notes() == []
@@ -0,0 +1,118 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+import memory_cli
+import memory_index
+import memory_storage
+import memory_store
+import prune_memory_entries as prune_mod
+from conftest import make_entry, write_entry_file
+
+
+def _setup(memory_dir: Path, entries: list[tuple[str, str, list[str]]]) -> Path:
+    entries_dir = memory_dir / "entries"
+    for i, (ts, agent, tags) in enumerate(entries):
+        write_entry_file(entries_dir, make_entry(ts, i, agent=agent, tags=tags))
+    return entries_dir
+
+
+def test_keep_last_counts_entries_and_rewrites_segments(
+    empty_memory_dir, capsys
+):
+    timestamps = [f"2025-05-0{day}T{hour}:00:00" for day in (1, 2) for hour in (10, 11, 12)]
+    entries_dir = _setup(empty_memory_dir, [(ts, "test", []) for ts in timestamps])
+    memory_cli.main(["compact", "--memory-dir", str(empty_memory_dir)])
+    segment = entries_dir / "segments" / "2025-05-01.jsonl"
+    size = segment.stat().st_size
+    assert len(list(memory_index.query_entries(entries_dir))) == 6
+    capsys.readouterr()
+
+    memory_cli.main(
+        ["prune", "--keep-last", "4", "--memory-dir", str(empty_memory_dir)]
+    )
+    out = capsys.readouterr().out
+    assert f"Removed 2 entries from {segment}" in out
+    assert f"reclaimed {size - segment.stat().st_size} bytes" in out
+
+    lines = segment.read_bytes().splitlines(keepends=True)
+    assert [json.loads(line)["ts"] for line in lines] == [timestamps[2]]
+    assert list(memory_storage.read_offsets(segment)) == [0]
+    remaining = [e["ts"] for e in memory_index.query_entries(entries_dir)]
+    assert remaining == timestamps[:1:-1]
+
+    # Appends after a rewrite land in the new file.
+    memory_storage.append_entries(entries_dir, [json.loads(lines[0])], period="daily")
+    assert len(segment.read_bytes().splitlines()) == 2
+
+
+def test_quotas_and_byte_budget_keep_newest_entries(empty_memory_dir):
+    entries_dir = _setup(
+        empty_memory_dir,
+        [
+            ("2025-05-01T00:00:00", "a", ["x"]),
+            ("2025-05-02T00:00:00", "b", ["x", "y"]),
+            ("2025-05-03T00:00:00", "a", ["y"]),
+            ("2025-05-04T00:00:00", "a", ["x"]),
+        ],
+    )
+
+    def expired(**policy):
+        plan = prune_mod.plan_retention(entries_dir, prune_mod.RetentionPolicy(**policy))
+        assert not plan.rewrite
+        return sorted(path.stem[:10] for path in plan.delete)
+
+    assert expired(max_per_agent=2) == ["2025-05-01"]
+    assert expired(max_per_tag=1) == ["2025-05-01", "2025-05-02"]
+    size = (entries_dir / "2025-05-04T00:00:00.jsonl").stat().st_size
+    assert expired(max_bytes=size * 2) == ["2025-05-01", "2025-05-02"]
+    assert expired(before=datetime(2025, 5, 3), keep_last=1) == [
+        "2025-05-01",
+        "2025-05-02",
+        "2025-05-03",
+    ]
+
+    plan = prune_mod.plan_retention(entries_dir, prune_mod.RetentionPolicy(keep_last=2))
+    assert prune_mod.apply_plan(plan, entries_dir) == plan.bytes
+    assert len(memory_storage.iter_entry_files(entries_dir)) == 2
+
+
+def test_prune_script_keeps_index_and_store_current(empty_memory_dir, monkeypatch):
+    monkeypatch.setenv("AGENT_MEMORY_NO_DAEMON", "1")
+    timestamps = ("2025-05-01T11:00:00", "2025-05-02T10:00:00")
+    entries_dir = _setup(empty_memory_dir, [(ts, "test", []) for ts in timestamps])
+    # A legacy per-entry file holding two entries.
+    legacy = entries_dir / "2025-05-01T10:00:00.jsonl"
+    second = entries_dir / "2025-05-01T11:00:00.jsonl"
+    entry = json.loads(second.read_text())
+    entry.update(ts="2025-05-01T10:00:00", run_id="legacy")
+    legacy.write_text(json.dumps(entry) + "\n" + second.read_text())
+    second.unlink()
+    store = memory_store.MemoryStore(empty_memory_dir, poll_interval=0)
+    assert len(list(memory_index.query_entries(entries_dir))) == 3
+    assert len(store.query()) == 3
+
+    monkeypatch.setattr(
+        "sys.argv", ["prune", "--keep-last", "2", "--memory-dir", str(entries_dir)]
+    )
+    prune_mod.main()
+    expected = ["2025-05-02T10:00:00", "2025-05-01T11:00:00"]
+    assert [e["ts"] for e in memory_index.query_entries(entries_dir)] == expected
+    assert [e["ts"] for e in store.query()] == expected
+
+
+def test_index_picks_up_rewrites_it_was_not_told_about(empty_memory_dir):
+    timestamps = ("2025-05-01T10:00:00", "2025-05-02T10:00:00")
+    entries_dir = _setup(empty_memory_dir, [(ts, "test", []) for ts in timestamps])
+    segment_entries = [
+        {**json.loads(path.read_text()), "ts": f"2025-05-03T1{i}:00:00"}
+        for i, path in enumerate(sorted(entries_dir.glob("*.jsonl")))
+    ]
+    memory_storage.append_entries(entries_dir, segment_entries, period="daily")
+    assert len(list(memory_index.query_entries(entries_dir))) == 4
+
+    segment = next((entries_dir / "segments").glob("*.jsonl"))
+    first = segment.read_bytes().splitlines(keepends=True)[0]
+    memory_storage.rewrite_entry_file(segment, [(0, len(first))])
+    remaining = [e["ts"][:10] for e in memory_index.query_entries(entries_dir)]
+    assert remaining == ["2025-05-03", "2025-05-02", "2025-05-01"]
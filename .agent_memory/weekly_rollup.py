@@ -7,18 +7,14 @@ import argparse
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
-from types import SimpleNamespace
 
-from summarize_memory_entries import (
-    load_entries,
-    filter_entries,
-    summarize,
-)
-from prune_memory_entries import determine_files_to_delete
+import memory_columns as columns
+from memory_archive import archive_files
+from prune_memory_entries import RetentionPolicy, plan_retention, prune
+from summarize_memory_entries import summarize_range
 
 DEFAULT_ENTRIES_DIR = Path(__file__).resolve().parent / "entries"
 DEFAULT_SUMMARY_DIR = Path(__file__).resolve().parent / "weekly_summaries"
-DEFAULT_SUMMARY_DIR.mkdir(parents=True, exist_ok=True)
 
 
 def last_week_range() -> tuple[str, str]:
@@ -57,17 +53,24 @@ def parse_args() -> argparse.Namespace:
     prune.add_argument(
         "--dry-run", action="store_true", help="List files that would be deleted"
     )
+    prune.add_argument(
+        "--archive",
+        action="store_true",
+        help="Move pruned entries into the compressed archive instead of deleting",
+    )
     return parser.parse_args()
 
 
 def run_summary(memory_dir: Path, summary_dir: Path) -> Path:
     since, until = last_week_range()
-    entries = load_entries(memory_dir)
-    entries = filter_entries(entries, since, until)
-    summary = summarize(entries, since, until)
+    try:
+        summary = columns.summarize(memory_dir, since, until)
+    except OSError:
+        summary = summarize_range(memory_dir, since, until)
     output = (
         summary_dir / f"summary_{since.split('T')[0]}_to_{until.split('T')[0]}.json"
     )
+    summary_dir.mkdir(parents=True, exist_ok=True)
     with output.open("w", encoding="utf-8") as f:
         json.dump(summary, f, indent=2)
     print(f"Wrote summary to {output}")
@@ -75,29 +78,41 @@ def run_summary(memory_dir: Path, summary_dir: Path) -> Path:
 
 
 def run_prune(
-    memory_dir: Path, older_than: int | None, keep_last: int | None, dry_run: bool
+    memory_dir: Path,
+    older_than: int | None,
+    keep_last: int | None,
+    dry_run: bool,
+    archive: bool = False,
 ) -> None:
     if older_than is None and keep_last is None:
         return
-    args = SimpleNamespace(
-        before=None, older_than=older_than, keep_last=keep_last, memory_dir=memory_dir
-    )
-    files = determine_files_to_delete(args)
+    before = None
+    if older_than is not None:
+        before = datetime.utcnow() - timedelta(days=older_than)
+    policy = RetentionPolicy(before=before, keep_last=keep_last)
+    if not archive:
+        prune(memory_dir, policy, dry_run)
+        return
+    # Archives are built from whole files, so files that still hold entries
+    # to keep are left for a later run.
+    files = plan_retention(memory_dir, policy).delete
     if not files:
-        print("No entries to delete")
+        print("No entries to archive")
+        return
+    if dry_run:
+        for f in files:
+            print(f"Would archive {f}")
         return
-    for f in files:
-        if dry_run:
-            print(f"Would delete {f}")
-        else:
-            f.unlink(missing_ok=True)
-            print(f"Deleted {f}")
+    count, path = archive_files(memory_dir, files)
+    print(f"Archived {count} entries into {path}")
 
 
 def main() -> None:
     args = parse_args()
     run_summary(args.memory_dir, args.summary_dir)
-    run_prune(args.memory_dir, args.older_than, args.keep_last, args.dry_run)
+    run_prune(
+        args.memory_dir, args.older_than, args.keep_last, args.dry_run, args.archive
+    )
 
 
 if __name__ == "__main__":